@@ -1,30 +1,46 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from app.calendar_service import CalendarService
-from app.vector_store import VectorStore
+from app.vector_store import get_vector_store
 from app.user_tendency import UserTendency
 import json
 import os
-from starlette.middleware.base import BaseHTTPMiddleware
+from app.prompts import compile_prompts
 from app.llm_rag import LLMService, ConversationHistory
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from datetime import datetime
+from contextlib import asynccontextmanager
 from zoneinfo import ZoneInfo
-from langchain_community.vectorstores import FAISS
-
-class UserMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.url.path in ["/sync-calendar", "/chat", "/init-chat", "/emotion", "/sync-tendency"]:
-            body = await request.json()
-            request.state.user_id = body.get("user_id")
-        
-        response = await call_next(request)
-        return response
-
-app = FastAPI()
-app.add_middleware(UserMiddleware)
+from app.metrics import REGISTRY, CONTENT_TYPE_LATEST, MetricsMiddleware, record_cache
+from app.json_cache import json_cache, not_modified
+from app.responses import FastJSONResponse, CompressionMiddleware, json_dumps
+from app.llm_scheduler import llm_scheduler, INTERACTIVE
+from app.index_warmup import IndexWarmup
+from app.nightly_jobs import NightlyJobs
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 인덱스 워밍업/어제 일정 기록 생성은 백그라운드 스레드에서 진행하고 서버는 바로 요청을 받음
+    index_warmup.start()
+    llm_service.agenda.start_nightly(active_user_ids)
+    # 대화 로그 압축/지난 날짜 인덱스 합치기는 어제 일정 기록 생성과 별도 스레드에서 실행
+    history_nightly.start(active_user_ids)
+    # 지난 실행에서 저장하지 못한 대화 기록 복구 + 저장 스레드 시작
+    conversation_history.writer.start()
+    yield
+    llm_service.agenda.stop()
+    history_nightly.stop()
+    conversation_history.writer.close()
+    # 메모리에만 반영된 대화 인덱스 저장
+    conversation_history.index_store.close()
+
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -34,21 +50,79 @@ app.add_middleware(
 )
 
 calendar_service = CalendarService()
-vector_store = VectorStore()
-conversation_history = ConversationHistory(
-    embeddings=vector_store.embeddings,
-    text_splitter=vector_store.text_splitter
-)
-llm_service = LLMService()
+# 서비스 객체는 가볍게 생성되고 모델 클라이언트/langchain은 첫 요청 때 준비됨
+vector_store = get_vector_store()
+conversation_history = ConversationHistory(vector_store)
+llm_service = LLMService(vector_store)
 user_tendency = UserTendency()
+# 대화 기록 야간 작업 (HISTORY_NIGHTLY_ENABLED, AGENDA_PRECOMPUTE_ENABLED와 무관)
+history_nightly = NightlyJobs("history-nightly")
+history_nightly.add(conversation_history.compact_day)
+history_nightly.add(conversation_history.merge_history_days)
 
 ACTIVE_USERS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'active_users.json')
 os.makedirs(os.path.dirname(ACTIVE_USERS_PATH), exist_ok=True)  # data 폴더 생성
 
+def active_user_ids():
+    if json_cache.stat(ACTIVE_USERS_PATH) is None:
+        return []
+    return [u['user_id'] for u in json_cache.get(ACTIVE_USERS_PATH).data if u.get('user_id')]
+
+# 최근 활성 사용자의 인덱스와 모델 클라이언트를 미리 준비해 아침 첫 대화가 느리지 않도록 함
+index_warmup = IndexWarmup(
+    ACTIVE_USERS_PATH,
+    embeddings=lambda: vector_store.embeddings,
+    # 모델 클라이언트/프롬프트 템플릿도 백그라운드에서 미리 생성
+    prepare=lambda: (llm_service.llm, compile_prompts()),
+)
+
+# 파일 기반 조회 응답: 파일 버전으로 ETag/Last-Modified를 만들고 변경이 없으면 304 반환
+# 파싱 결과와 직렬화된 바디는 파일이 바뀔 때까지 메모리에 재사용
+def file_json_response(request: Request, path: str, build):
+    version = json_cache.stat(path)
+    if version is None:
+        return None
+
+    variant = f"{request.url.path}?{request.url.query}"
+    etag = version.etag(variant)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": version.last_modified,
+        "Cache-Control": "no-cache",
+    }
+    if not_modified(request.headers, version, etag):
+        record_cache("conditional_get", True)
+        return Response(status_code=304, headers=headers)
+    record_cache("conditional_get", False)
+
+    entry = json_cache.get(path, version)
+    body = entry.rendered.get(variant)
+    if body is None:
+        body = json_dumps(build(entry.data))
+        if len(entry.rendered) >= 32:
+            entry.rendered.clear()
+        entry.rendered[variant] = body
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/warmup-status")
+async def warmup_status():
+    return {
+        "message": "워밍업 상태 조회 성공",
+        **index_warmup.progress(),
+        "daily_agenda": llm_service.agenda.last_run,
+    }
+
 class TokenRequest(BaseModel):
     token: str
     user_id: str
 
+class UserRequest(BaseModel):
+    user_id: str
+
 class ChatRequest(BaseModel):
     user_id: str
     message: str = None
@@ -65,6 +139,16 @@ class EmotionRequest(BaseModel):
     event_summary: str  
     emotion_score: int
 
+class EmotionUpdate(BaseModel):
+    event_id: Optional[str] = None
+    event_date: Optional[str] = None
+    event_summary: Optional[str] = None
+    emotion_score: int
+
+class EmotionBatchRequest(BaseModel):
+    user_id: str
+    updates: List[EmotionUpdate]
+
 class TendencyRequest(BaseModel):
     token: str
     user_id: str
@@ -91,6 +175,7 @@ async def sync_calendar(token_request: TokenRequest):
 
         with open(ACTIVE_USERS_PATH, 'w') as f:
             json.dump(active_users, f)
+        json_cache.invalidate(ACTIVE_USERS_PATH)
             
         user_info = {}
         if events and isinstance(events[0], dict):
@@ -126,10 +211,13 @@ async def update_active_status(request: ActiveUserRequest):
             })
         else:
             active_users = [u for u in active_users if u['user_id'] != request.user_id]
+            # 세션 종료: 미저장 대화 인덱스를 바로 저장
+            conversation_history.end_session(request.user_id)
         
         print(f"업데이트 후 활성 사용자: {active_users}")
         with open(ACTIVE_USERS_PATH, 'w') as f:
             json.dump(active_users, f)
+        json_cache.invalidate(ACTIVE_USERS_PATH)
         
         return {"message": "상태 업데이트 성공"}
     except Exception as e:
@@ -139,15 +227,15 @@ async def update_active_status(request: ActiveUserRequest):
         )
 
 @app.post("/init-chat")
-async def init_chat(request: Request):
+async def init_chat(user_request: UserRequest):
     try:
-        user_id = request.state.user_id
+        user_id = user_request.user_id
         now = datetime.now(ZoneInfo("Asia/Seoul"))
         today = now.strftime("%Y%m%d")
         user_history_path = os.path.join("data", "faiss", user_id, "history", today)
         
         if not os.path.exists(user_history_path):
-            bot_question = llm_service.ask_about_event(user_id)
+            bot_question = llm_service.ask_about_event(user_id, conversation_history)
             return {"message": bot_question}
         return {"message": None}
 
@@ -159,18 +247,22 @@ async def init_chat(request: Request):
         )
 
 @app.post("/chat")
-async def chat_endpoint(chat_request: ChatRequest, request: Request):
+async def chat_endpoint(chat_request: ChatRequest):
     try:
-        user_id = request.state.user_id
+        user_id = chat_request.user_id
         user_input = chat_request.message
         
         if not user_input:
             raise ValueError("사용자 메시지가 비어있습니다.")
             
-        bot_response = llm_service.generate_answer_with_similarity(
-            user_input, 
-            conversation_history, 
-            user_id
+        # LLM 호출은 스케줄러 슬롯을 받아 전용 스레드에서 실행 (대화는 최우선)
+        bot_response = await llm_scheduler.run(
+            llm_service.generate_answer_with_similarity,
+            user_input,
+            conversation_history,
+            user_id,
+            user_id=user_id,
+            priority=INTERACTIVE,
         )
         
         return {"message": bot_response}
@@ -184,10 +276,11 @@ async def chat_endpoint(chat_request: ChatRequest, request: Request):
 
 # 대화 기록 삭제 엔드포인트 추가
 @app.post("/clear-chat-history")
-async def clear_chat_history(request: Request):
+async def clear_chat_history(user_request: UserRequest):
     try:
-        user_id = request.state.user_id
+        user_id = user_request.user_id
         conversation_history.delete_conversation_history(user_id)
+        llm_service.prefetch.discard(user_id)
         return {"message": "대화 기록이 삭제되었습니다."}
     except Exception as e:
         raise HTTPException(
@@ -235,6 +328,31 @@ async def update_emotion(emotion_request: EmotionRequest):
             detail=f"감정 상태 업데이트 실패: {str(e)}"
         )
 
+# 여러 일정의 감정 점수를 한 번에 업데이트
+@app.post("/emotion/batch")
+async def update_emotion_batch(batch_request: EmotionBatchRequest):
+    user_id = batch_request.user_id
+    print(f"감정 일괄 업데이트 요청: user_id={user_id}, {len(batch_request.updates)}건")
+
+    for update in batch_request.updates:
+        if not update.event_id and not (update.event_date and update.event_summary):
+            raise HTTPException(status_code=400, detail="event_id 또는 event_date/event_summary가 필요합니다.")
+
+    try:
+        result = vector_store.update_event_emotions(
+            user_id, [update.model_dump() for update in batch_request.updates]
+        )
+    except Exception as e:
+        print(f"감정 일괄 업데이트 실패: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"감정 업데이트 실패: {str(e)}")
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="일정 데이터를 찾을 수 없습니다.")
+    if result["updated"] == 0 and batch_request.updates:
+        raise HTTPException(status_code=404, detail="해당 일정을 찾을 수 없습니다.")
+
+    return {"message": "감정 상태가 업데이트되었습니다.", **result}
+
 @app.post("/sync-tendency")
 async def sync_tendency(tendency_request : TendencyRequest):
     try:
@@ -319,6 +437,7 @@ async def sync_tendency(tendency_request : TendencyRequest):
             # 업데이트한 데이터를 다시 파일에 저장
             with open(tendency_file_path, 'w', encoding='utf-8') as f:
                 json.dump(updated_tendency, f, ensure_ascii=False, indent=2)
+            json_cache.invalidate(tendency_file_path)
 
             # 최종 events에 업데이트된 데이터를 사용
             events = [
@@ -334,6 +453,7 @@ async def sync_tendency(tendency_request : TendencyRequest):
             os.makedirs(os.path.dirname(tendency_file_path), exist_ok=True)
             with open(tendency_file_path, 'w', encoding='utf-8') as f:
                 json.dump(new_user_data[0]["user_tendency"], f, ensure_ascii=False, indent=2)
+            json_cache.invalidate(tendency_file_path)
             print("새 성향 데이터를 저장했습니다.")
 
         print(f"Retrieved events: {len(events)}")  # 이벤트 개수 로깅
@@ -373,6 +493,7 @@ async def sync_tendency(tendency_request : TendencyRequest):
 
         with open(ACTIVE_USERS_PATH, 'w') as f:
             json.dump(active_users, f)
+        json_cache.invalidate(ACTIVE_USERS_PATH)
 
         print(f"Sync completed successfully for user: {tendency_request.user_id}")
         return {
@@ -388,33 +509,61 @@ async def sync_tendency(tendency_request : TendencyRequest):
 
 # 일정 조회
 @app.get("/get-calendar")
-async def get_calendar(user_id: str):
+async def get_calendar(user_id: str, request: Request, since: Optional[int] = None):
     try:
+        # since가 주어지면 해당 리비전 이후 변경분만 반환
+        if since is not None:
+            changes = vector_store.change_feed.changes_since(user_id, since)
+            return {"message": "일정 변경분 조회 성공", "since": since, **changes}
+
         # 저장된 일정 데이터를 가져오기
         calendar_path = os.path.join("data", "faiss", user_id, "schedule", "events.json")
 
-        if not os.path.exists(calendar_path):
+        response = file_json_response(
+            request, calendar_path, lambda events: {"message": "일정 조회 성공", "events": events}
+        )
+        if response is None:
             raise HTTPException(status_code=404, detail="사용자의 일정 데이터를 찾을 수 없습니다.")
 
-        with open(calendar_path, 'r', encoding='utf-8') as f:
-            events = json.load(f)
-
-        return {"message": "일정 조회 성공", "events": events}
+        return response
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"일정 조회 실패: {str(e)}")
 
+# 기간별 일정 조회 (시작 시각 기준, cursor로 페이지 이어받기)
+@app.get("/events")
+async def get_events(
+    user_id: str,
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    calendar: Optional[str] = None,
+    cursor: int = 0,
+    limit: int = 100,
+):
+    try:
+        result = vector_store.event_store.query(
+            user_id, start=from_, end=to, calendar=calendar, cursor=cursor, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"잘못된 기간 형식입니다: {str(e)}")
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="사용자의 일정 데이터를 찾을 수 없습니다.")
+
+    return {"message": "일정 조회 성공", **result}
+
 # 등록된 사용자 목록 조회
 @app.get("/get-active-users")
-async def get_active_users():
+async def get_active_users(request: Request):
     try:
-        if os.path.exists(ACTIVE_USERS_PATH):
-            with open(ACTIVE_USERS_PATH, 'r', encoding='utf-8') as f:
-                active_users = json.load(f)
-        else:
-            active_users = []
+        response = file_json_response(
+            request, ACTIVE_USERS_PATH,
+            lambda active_users: {"message": "활성 사용자 조회 성공", "active_users": active_users}
+        )
+        if response is None:
+            return {"message": "활성 사용자 조회 성공", "active_users": []}
 
-        return {"message": "활성 사용자 조회 성공", "active_users": active_users}
+        return response
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"활성 사용자 조회 실패: {str(e)}")
@@ -430,8 +579,7 @@ async def get_chat_history(user_id: str):
         if not os.path.exists(user_history_path):
             return {"message": "대화 기록 없음", "chat_history": []}
 
-        with open(user_history_path, 'r', encoding='utf-8') as f:
-            chat_history = json.load(f)
+        chat_history = conversation_history.get_conversations(user_id, today)
 
         return {"message": "대화 기록 조회 성공", "chat_history": chat_history}
 
@@ -440,23 +588,24 @@ async def get_chat_history(user_id: str):
 
 
 @app.get("/get-tendency-mode") #(formatted 형태 조회)
-async def get_tendency(user_id: str, mode: str = "formatted"):
+async def get_tendency(user_id: str, request: Request, mode: str = "formatted"):
     try:
         tendency_path = os.path.join("data", "faiss", f"{user_id}_tendency", "events.json")
 
-        if not os.path.exists(tendency_path):
-            raise HTTPException(status_code=404, detail="사용자의 성향 데이터를 찾을 수 없습니다.")
+        def build(user_tendency):
+            # `mode`에 따라 반환할 데이터 결정
+            if mode == "formatted":
+                return {"message": "사용자 성향 조회 성공", "user_tendency": user_tendency["events"]}
+            elif mode == "original":
+                return {"message": "사용자 성향 조회 성공", "user_tendency": user_tendency["original_events"]}
+            else:
+                raise HTTPException(status_code=400, detail="올바른 mode 값을 입력하세요 (formatted/original)")
 
-        with open(tendency_path, "r", encoding="utf-8") as f:
-            user_tendency = json.load(f)
+        response = file_json_response(request, tendency_path, build)
+        if response is None:
+            raise HTTPException(status_code=404, detail="사용자의 성향 데이터를 찾을 수 없습니다.")
 
-        # `mode`에 따라 반환할 데이터 결정
-        if mode == "formatted":
-            return {"message": "사용자 성향 조회 성공", "user_tendency": user_tendency["events"]}
-        elif mode == "original":
-            return {"message": "사용자 성향 조회 성공", "user_tendency": user_tendency["original_events"]}
-        else:
-            raise HTTPException(status_code=400, detail="올바른 mode 값을 입력하세요 (formatted/original)")
+        return response
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"사용자 성향 조회 실패: {str(e)}")
@@ -464,75 +613,79 @@ async def get_tendency(user_id: str, mode: str = "formatted"):
 
 # 사용자 성향 조회 (Key 값 추가 시, 특정 키값에 대한 조회 가능)
 @app.get("/get-tendency")
-async def get_tendency(user_id: str, key: str = None):
+async def get_tendency(user_id: str, request: Request, key: str = None):
     try:
         tendency_path = os.path.join("data", "faiss", f"{user_id}_tendency", "events.json")
 
-        if not os.path.exists(tendency_path):
-            raise HTTPException(status_code=404, detail="사용자의 성향 데이터를 찾을 수 없습니다.")
+        def build(user_tendency):
+            # 데이터가 'events' 배열 안에 존재하는 경우 첫 번째 항목 반환
+            if isinstance(user_tendency, dict) and "original_events" in user_tendency:
+                if isinstance(user_tendency["original_events"], list) and len(user_tendency["original_events"]) > 0:
+                    user_tendency_key = user_tendency["original_events"][0]  # 첫 번째 데이터 반환
+                else:
+                    raise HTTPException(status_code=404, detail="성향 데이터가 존재하지 않습니다.")
 
-        with open(tendency_path, 'r', encoding='utf-8') as f:
-            user_tendency = json.load(f)
 
-        # 데이터가 'events' 배열 안에 존재하는 경우 첫 번째 항목 반환
-        if isinstance(user_tendency, dict) and "original_events" in user_tendency:
-            if isinstance(user_tendency["original_events"], list) and len(user_tendency["original_events"]) > 0:
-                user_tendency_key = user_tendency["original_events"][0]  # 첫 번째 데이터 반환
-            else:
-                raise HTTPException(status_code=404, detail="성향 데이터가 존재하지 않습니다.")
+                # 특정 키값만 조회하는 경우
+                if key:
+                    if key in user_tendency_key["user_tendency"]:
+                        return {"message": "사용자 성향 조회 성공", "value": user_tendency_key["user_tendency"][key]}
+                    else:
+                        raise HTTPException(status_code=404, detail=f"'{key}'에 대한 데이터가 없습니다.")
 
+                return {"message": "사용자 성향 조회 성공", "user_tendency": user_tendency_key["user_tendency"]}
 
-            # 특정 키값만 조회하는 경우
-            if key:
-                if key in user_tendency_key["user_tendency"]:
-                    return {"message": "사용자 성향 조회 성공", "value": user_tendency_key["user_tendency"][key]}
-                else:
-                    raise HTTPException(status_code=404, detail=f"'{key}'에 대한 데이터가 없습니다.")
+        response = file_json_response(request, tendency_path, build)
+        if response is None:
+            raise HTTPException(status_code=404, detail="사용자의 성향 데이터를 찾을 수 없습니다.")
 
-            return {"message": "사용자 성향 조회 성공", "user_tendency": user_tendency_key["user_tendency"]}
+        return response
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"사용자 성향 조회 실패: {str(e)}")
 
 # 사용자 성향 조회 API (특정 키값, 중첩된(traits) 세부키 키도 조회 가능)
 @app.get("/get-tendency-sub")
-async def get_tendency(user_id: str, key: str = "traits", sub_key: str = None):
+async def get_tendency(user_id: str, request: Request, key: str = "traits", sub_key: str = None):
     try:
         tendency_path = os.path.join("data", "faiss", f"{user_id}_tendency", "events.json")
 
-        if not os.path.exists(tendency_path):
-            raise HTTPException(status_code=404, detail="사용자의 성향 데이터를 찾을 수 없습니다.")
-
-        with open(tendency_path, 'r', encoding='utf-8') as f:
-            user_tendency = json.load(f)
-
+        def build(user_tendency):
             # 데이터가 'events' 배열 안에 존재하는 경우 첫 번째 항목 반환
             if isinstance(user_tendency, dict) and "original_events" in user_tendency:
                 if isinstance(user_tendency["original_events"], list) and len(user_tendency["original_events"]) > 0:
                     user_tendency_key = user_tendency["original_events"][0]  # 첫 번째 데이터 반환
                 else:
                     raise HTTPException(status_code=404, detail="성향 데이터가 존재하지 않습니다.")
+            else:
+                raise HTTPException(status_code=404, detail="성향 데이터가 존재하지 않습니다.")
 
-        # 특정 키값 조회 (1차 필터링)
-        if key:
-            result = user_tendency_key["user_tendency"].get(key, None)
+            # 특정 키값 조회 (1차 필터링)
+            if key:
+                result = user_tendency_key["user_tendency"].get(key, None)
+
+                if result is None:
+                    raise HTTPException(status_code=404, detail=f"'{key}'에 대한 데이터가 없습니다.")
 
-            if result is None:
-                raise HTTPException(status_code=404, detail=f"'{key}'에 대한 데이터가 없습니다.")
+                # 중첩된 키 (sub_key) 조회
+                if sub_key:
+                    if isinstance(result, dict):
+                        sub_value = result.get(sub_key, None)
+                        if sub_value is None:
+                            raise HTTPException(status_code=404, detail=f"'{key}' 안에 '{sub_key}' 데이터가 없습니다.")
+                        return {"message": "사용자 성향 조회 성공", "value": sub_value}
+                    else:
+                        raise HTTPException(status_code=400, detail=f"'{key}'는 중첩된 데이터가 아닙니다.")
 
-            # 중첩된 키 (sub_key) 조회
-            if sub_key:
-                if isinstance(result, dict):
-                    sub_value = result.get(sub_key, None)
-                    if sub_value is None:
-                        raise HTTPException(status_code=404, detail=f"'{key}' 안에 '{sub_key}' 데이터가 없습니다.")
-                    return {"message": "사용자 성향 조회 성공", "value": sub_value}
-                else:
-                    raise HTTPException(status_code=400, detail=f"'{key}'는 중첩된 데이터가 아닙니다.")
+                return {"message": "사용자 성향 조회 성공", "value": result}
 
-            return {"message": "사용자 성향 조회 성공", "value": result}
+            return {"message": "사용자 성향 조회 성공", "user_tendency": user_tendency["original_events"]}
+
+        response = file_json_response(request, tendency_path, build)
+        if response is None:
+            raise HTTPException(status_code=404, detail="사용자의 성향 데이터를 찾을 수 없습니다.")
 
-        return {"message": "사용자 성향 조회 성공", "user_tendency": user_tendency["original_events"]}
+        return response
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"사용자 성향 조회 실패: {str(e)}")
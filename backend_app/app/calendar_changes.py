@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+from zoneinfo import ZoneInfo
+
+from app.json_cache import json_cache
+
+# 삭제된 일정(tombstone)을 보관하는 최대 개수, 넘으면 오래된 것부터 정리
+CHANGE_FEED_MAX_TOMBSTONES = int(os.getenv("CHANGE_FEED_MAX_TOMBSTONES", 1000))
+
+
+class CalendarChangeFeed:
+    """사용자별 일정 변경 이력(리비전) 관리
+
+    일정이 추가/수정/삭제되거나 감정 점수가 바뀔 때마다 리비전을 1씩 올리고,
+    각 일정에 마지막으로 바뀐 리비전을 기록한다. 클라이언트는 마지막으로 받은
+    리비전 이후의 변경분만 받아간다.
+    """
+
+    def __init__(self, base_index_path: str = "data/faiss"):
+        self.base_index_path = base_index_path
+        self._locks = defaultdict(threading.Lock)
+
+    def _get_feed_path(self, user_id: str) -> str:
+        # schedule 인덱스 디렉터리는 동기화 때마다 새로 만들어지므로 그 밖에 보관
+        return os.path.join(self.base_index_path, user_id, "calendar_changes.json")
+
+    @staticmethod
+    def event_key(event: Dict) -> str:
+        calendar_id = event.get("calendar_info", {}).get("id", "")
+        event_id = event.get("id") or f"{event.get('summary', '')}@{event.get('start', '')}"
+        return f"{calendar_id}:{event_id}"
+
+    @staticmethod
+    def _event_hash(event: Dict) -> str:
+        payload = json.dumps(event, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _load(self, user_id: str) -> Dict:
+        entry = json_cache.get(self._get_feed_path(user_id))
+        if entry is None:
+            return {"revision": 0, "min_revision": 0, "events": {}}
+        # 캐시된 객체를 직접 수정하지 않도록 복사
+        data = entry.data
+        return {
+            "revision": data.get("revision", 0),
+            "min_revision": data.get("min_revision", 0),
+            "events": dict(data.get("events", {})),
+        }
+
+    def _save(self, user_id: str, feed: Dict):
+        feed_path = self._get_feed_path(user_id)
+        os.makedirs(os.path.dirname(feed_path), exist_ok=True)
+        feed["updated_at"] = datetime.now(ZoneInfo("Asia/Seoul")).isoformat()
+        tmp_path = feed_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(feed, f, ensure_ascii=False)
+        os.replace(tmp_path, feed_path)
+        json_cache.invalidate(feed_path)
+
+    def _prune_tombstones(self, feed: Dict):
+        tombstones = sorted(
+            (entry["rev"], key) for key, entry in feed["events"].items() if entry.get("deleted")
+        )
+        overflow = len(tombstones) - CHANGE_FEED_MAX_TOMBSTONES
+        if overflow <= 0:
+            return
+        for rev, key in tombstones[:overflow]:
+            del feed["events"][key]
+            # 정리된 tombstone 이전 리비전부터는 변경분을 보장할 수 없음
+            feed["min_revision"] = max(feed["min_revision"], rev)
+
+    def _apply(self, feed: Dict, key: str, event: Dict = None):
+        feed["revision"] += 1
+        if event is None:
+            feed["events"][key] = {"rev": feed["revision"], "deleted": True}
+        else:
+            feed["events"][key] = {"rev": feed["revision"], "hash": self._event_hash(event), "event": event}
+
+    # 전체 동기화 결과 반영 (새 일정/변경된 일정/사라진 일정)
+    def record_sync(self, user_id: str, events: List[Dict]) -> int:
+        with self._locks[user_id]:
+            feed = self._load(user_id)
+            seen = set()
+            for event in events:
+                key = self.event_key(event)
+                seen.add(key)
+                current = feed["events"].get(key)
+                if current and not current.get("deleted") and current.get("hash") == self._event_hash(event):
+                    continue
+                self._apply(feed, key, event)
+
+            for key, entry in list(feed["events"].items()):
+                if key not in seen and not entry.get("deleted"):
+                    self._apply(feed, key)
+
+            self._prune_tombstones(feed)
+            self._save(user_id, feed)
+            return feed["revision"]
+
+    # 일부 일정 변경 반영 (감정 점수 업데이트 등)
+    def record_upserts(self, user_id: str, events: List[Dict]) -> int:
+        with self._locks[user_id]:
+            feed = self._load(user_id)
+            changed = False
+            for event in events:
+                key = self.event_key(event)
+                current = feed["events"].get(key)
+                if current and not current.get("deleted") and current.get("hash") == self._event_hash(event):
+                    continue
+                self._apply(feed, key, event)
+                changed = True
+            if changed:
+                self._save(user_id, feed)
+            return feed["revision"]
+
+    # since 이후 변경분 조회
+    def changes_since(self, user_id: str, since: int) -> Dict:
+        entry = json_cache.get(self._get_feed_path(user_id))
+        feed = entry.data if entry else {"revision": 0, "min_revision": 0, "events": {}}
+        revision = feed.get("revision", 0)
+
+        # 보관 범위를 벗어난 리비전이면 전체 일정을 다시 내려준다
+        full = since <= 0 or since < feed.get("min_revision", 0) or since > revision
+        events = []
+        deleted = []
+        for key, item in feed.get("events", {}).items():
+            if full:
+                if not item.get("deleted"):
+                    events.append({"id": key, "revision": item["rev"], "event": item["event"]})
+            elif item["rev"] > since:
+                if item.get("deleted"):
+                    deleted.append(key)
+                else:
+                    events.append({"id": key, "revision": item["rev"], "event": item["event"]})
+
+        events.sort(key=lambda x: x["event"].get("start", ""))
+        return {"revision": revision, "full": full, "events": events, "deleted": deleted}
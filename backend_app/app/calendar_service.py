@@ -1,5 +1,3 @@
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from datetime import datetime, timedelta
 from typing import  Dict
 from fastapi import HTTPException
@@ -7,6 +5,8 @@ from zoneinfo import ZoneInfo
 import os
 import json
 
+from app.metrics import track_upstream
+
 class CalendarService:
     def __init__(self):
         self.calendar_service = None
@@ -14,6 +14,10 @@ class CalendarService:
         
     #Google API 서비스
     def _initialize_services(self, token: str):
+        # google API 클라이언트는 import가 무거워 실제로 호출할 때 로드
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+
         try:
             credentials = Credentials(
                 token,
@@ -23,18 +27,20 @@ class CalendarService:
                     'https://www.googleapis.com/auth/userinfo.email'      # 이메일
                 ]
             )
-            self.calendar_service = build('calendar', 'v3', credentials=credentials)
-            self.people_service = build('people', 'v1', credentials=credentials)
+            with track_upstream("google", "discovery.build"):
+                self.calendar_service = build('calendar', 'v3', credentials=credentials)
+                self.people_service = build('people', 'v1', credentials=credentials)
         except Exception as e:
             raise HTTPException(status_code=401, detail="Invalid token")
 
     def get_user_info(self, token: str) -> Dict:
         self._initialize_services(token)
         try:
-            profile = self.people_service.people().get(
-                resourceName='people/me',
-                personFields='names,emailAddresses,genders,birthdays,photos'
-            ).execute()
+            with track_upstream("google", "people.get"):
+                profile = self.people_service.people().get(
+                    resourceName='people/me',
+                    personFields='names,emailAddresses,genders,birthdays,photos'
+                ).execute()
             user_info = {
                 'name': profile.get('names', [{}])[0].get('displayName', ''),
                 'email': profile.get('emailAddresses', [{}])[0].get('value', ''),
@@ -69,18 +75,20 @@ class CalendarService:
             
             print(f"일정 조회 기간: {past} ~ {future}")
             
-            calendar_list = self.calendar_service.calendarList().list().execute()             
+            with track_upstream("google", "calendarList.list"):
+                calendar_list = self.calendar_service.calendarList().list().execute()
             for calendar_item in calendar_list['items']:
                 calendar_id = calendar_item['id']   
-                events_result = self.calendar_service.events().list(
-                    calendarId=calendar_id,
-                    timeMin=past,
-                    timeMax=future,
-                    maxResults=2500,
-                    singleEvents=True,
-                    orderBy='startTime',
-                    fields='items(id,summary,description,location,start,end,attendees,hangoutLink,recurrence,reminders,status,created,updated,guestsCanSeeOtherGuests)'
-                ).execute()
+                with track_upstream("google", "events.list"):
+                    events_result = self.calendar_service.events().list(
+                        calendarId=calendar_id,
+                        timeMin=past,
+                        timeMax=future,
+                        maxResults=2500,
+                        singleEvents=True,
+                        orderBy='startTime',
+                        fields='items(id,summary,description,location,start,end,attendees,hangoutLink,recurrence,reminders,status,created,updated,guestsCanSeeOtherGuests)'
+                    ).execute()
                 
                 for event in events_result.get('items', []):
                     event['calendar_info'] = {
@@ -0,0 +1,170 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+# tiktoken은 설치되어 있을 때만 사용 (없으면 글자 수로 추정)
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 검색 질의에 붙일 대화 맥락의 최대 토큰 수
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1000))
+# 원문 그대로 유지할 최근 턴 수 (그 이전 턴은 요약으로 넘김)
+CONTEXT_WINDOW_TURNS = int(os.getenv("CONTEXT_WINDOW_TURNS", 6))
+# 누적 요약의 최대 토큰 수 (넘으면 오래된 줄부터 버림)
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", 300))
+# 요약 한 줄에 남길 질문/답변 길이(글자)
+CONTEXT_SUMMARY_LINE_CHARS = int(os.getenv("CONTEXT_SUMMARY_LINE_CHARS", 60))
+# 메모리에 대화 세션을 유지할 최대 사용자 수 (넘으면 가장 오래 안 쓴 사용자부터 제거)
+CONTEXT_MAX_USERS = int(os.getenv("CONTEXT_MAX_USERS", 1000))
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    # 인코딩 파일을 처음 한 번 내려받으므로, 실패하면(오프라인 등) 이후로는 추정치 사용
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    _encoding = tiktoken.get_encoding("cl100k_base") if tiktoken is not None else False
+                except Exception as e:
+                    print(f"tiktoken 인코딩 로드 실패, 글자 수로 토큰 추정: {str(e)}")
+                    _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """토큰 수 (tiktoken을 쓸 수 없으면 한글 기준 대략 글자 수로 추정)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def trim_to_tokens(text: str, budget: int, keep_end: bool = False) -> str:
+    """budget 토큰 안으로 자름 (keep_end면 뒤쪽을 남김)"""
+    if budget <= 0:
+        return ""
+    if count_tokens(text) <= budget:
+        return text
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[-budget:] if keep_end else text[:budget]
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[-budget:] if keep_end else tokens[:budget])
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+class _Session:
+    def __init__(self, date: str):
+        self.date = date
+        self.turns: List[Dict] = []
+        self.summary_lines: List[str] = []
+        self.summary_tokens = 0
+
+
+class ContextBuilder:
+    """사용자별 오늘 대화 세션 (최근 턴 창 + 누적 요약) 과 토큰 예산 안의 맥락 생성
+
+    최근 CONTEXT_WINDOW_TURNS 턴만 원문으로 들고 있고, 창에서 밀려난 턴은 질문/답변을
+    줄인 한 줄로 요약에 붙인다. 요약도 CONTEXT_SUMMARY_TOKENS를 넘으면 오래된 줄부터
+    버리므로 사용자당 메모리와 맥락 길이는 대화가 길어져도 일정하다. 사용자 수는
+    CONTEXT_MAX_USERS로 제한한다 (LRU).
+    """
+
+    def __init__(
+        self,
+        window_turns: int = CONTEXT_WINDOW_TURNS,
+        summary_tokens: int = CONTEXT_SUMMARY_TOKENS,
+        max_users: int = CONTEXT_MAX_USERS,
+    ):
+        self.window_turns = window_turns
+        self.summary_tokens = summary_tokens
+        self.max_users = max_users
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _session(self, user_id: str, date: str) -> _Session:
+        # _lock을 잡은 상태에서 호출, 날짜가 바뀌면 새 세션
+        session = self._sessions.get(user_id)
+        if session is None or session.date != date:
+            session = self._sessions[user_id] = _Session(date)
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_users:
+            self._sessions.popitem(last=False)
+        return session
+
+    def add(self, user_id: str, record: Dict):
+        """턴 추가 (창을 넘은 턴은 요약으로 이동)"""
+        with self._lock:
+            session = self._session(user_id, record["date"])
+            session.turns.append(record)
+            while len(session.turns) > self.window_turns:
+                self._summarize(session, session.turns.pop(0))
+
+    def _summarize(self, session: _Session, turn: Dict):
+        line = (
+            f"- {_shorten(turn.get('bot_question'), CONTEXT_SUMMARY_LINE_CHARS)}"
+            f" → {_shorten(turn.get('user_answer'), CONTEXT_SUMMARY_LINE_CHARS)}"
+        )
+        session.summary_lines.append(line)
+        session.summary_tokens += count_tokens(line) + 1
+        while session.summary_tokens > self.summary_tokens and len(session.summary_lines) > 1:
+            session.summary_tokens -= count_tokens(session.summary_lines.pop(0)) + 1
+
+    def turns(self, user_id: str, date: str) -> List[Dict]:
+        """date 세션의 최근 턴 원문"""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None or session.date != date:
+                return []
+            return list(session.turns)
+
+    def build(self, user_id: str, date: str, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+        """요약 + 최근 턴을 budget 토큰 안으로 구성 (최근 턴 우선, 남는 만큼 요약)"""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None or session.date != date:
+                return ""
+            turns = list(session.turns)
+            summary = "\n".join(session.summary_lines)
+
+        # 최근 턴부터 예산 안에서 채움
+        recent = []
+        remaining = budget
+        for turn in reversed(turns):
+            text = f"Bot: {turn['bot_question']} User: {turn['user_answer']}"
+            tokens = count_tokens(text) + 1
+            if tokens > remaining:
+                if not recent:
+                    # 가장 최근 턴 하나가 예산보다 길면 뒤쪽(답변)을 남기고 자름
+                    recent.append(trim_to_tokens(text, remaining, keep_end=True))
+                    remaining = 0
+                break
+            recent.append(text)
+            remaining -= tokens
+        recent.reverse()
+
+        parts = []
+        header = "이전 대화 요약:\n"
+        remaining -= count_tokens(header) + 1
+        if summary and remaining > 0:
+            # 요약은 최근 줄을 남기고 자름
+            parts.append(header + trim_to_tokens(summary, remaining, keep_end=True))
+        parts.extend(recent)
+        return " ".join(parts)
+
+    def pop(self, user_id: str):
+        with self._lock:
+            self._sessions.pop(user_id, None)
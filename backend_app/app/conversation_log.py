@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+from typing import Dict, Iterator, List
+
+LOG_FILE = "conversations.jsonl"
+# 이전 형식 (하루치 대화를 매번 통째로 다시 쓰던 JSON)
+LEGACY_FILE = "conversations.json"
+# 배치마다 fsync (끄면 프로세스 종료에는 안전하지만 OS 장애 시 마지막 배치 유실 가능)
+CONVERSATION_LOG_FSYNC = os.getenv("CONVERSATION_LOG_FSYNC", "true").lower() == "true"
+
+_lock = threading.Lock()
+
+
+def compact_record(record: Dict) -> Dict:
+    """로그 한 줄에 저장할 필드만 남김 (metadata 중복 제거)"""
+    return {
+        "bot_question": record.get("bot_question"),
+        "user_answer": record.get("user_answer"),
+        "timestamp": record.get("timestamp"),
+        "event_info": record.get("event_info"),
+        "emotion": record.get("emotion"),
+    }
+
+
+def _read_legacy(history_dir: str) -> List[Dict]:
+    legacy_path = os.path.join(history_dir, LEGACY_FILE)
+    if not os.path.exists(legacy_path):
+        return []
+    with open(legacy_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("conversations", [])
+
+
+def iter_conversations(history_dir: str) -> Iterator[Dict]:
+    """하루치 대화를 한 줄씩 읽어 반환 (이전 형식 파일이 있으면 먼저 반환)"""
+    for conversation in _read_legacy(history_dir):
+        yield conversation
+
+    log_path = os.path.join(history_dir, LOG_FILE)
+    if not os.path.exists(log_path):
+        return
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # 쓰기 도중 중단된 줄은 건너뜀 (다음 압축 때 제거)
+                continue
+
+
+def append_conversations(history_dir: str, records: List[Dict]):
+    """대화 턴을 로그 끝에 추가 (배치당 한 번 fsync)"""
+    if not records:
+        return
+    os.makedirs(history_dir, exist_ok=True)
+    with _lock:
+        if os.path.exists(os.path.join(history_dir, LEGACY_FILE)):
+            _compact(history_dir)
+
+        log_path = os.path.join(history_dir, LOG_FILE)
+        lines = "".join(json.dumps(compact_record(record), ensure_ascii=False) + "\n" for record in records)
+        with open(log_path, "ab") as f:
+            # 이전 쓰기가 줄 중간에 끊겼으면 줄을 바꿔 새 기록이 섞이지 않도록 함
+            if f.tell() > 0:
+                with open(log_path, "rb") as tail:
+                    tail.seek(-1, os.SEEK_END)
+                    if tail.read(1) != b"\n":
+                        lines = "\n" + lines
+            f.write(lines.encode("utf-8"))
+            f.flush()
+            if CONVERSATION_LOG_FSYNC:
+                os.fsync(f.fileno())
+
+
+def _compact(history_dir: str) -> int:
+    conversations = [compact_record(conversation) for conversation in iter_conversations(history_dir)]
+    log_path = os.path.join(history_dir, LOG_FILE)
+    tmp_path = log_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(conversation, ensure_ascii=False) + "\n" for conversation in conversations))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, log_path)
+    legacy_path = os.path.join(history_dir, LEGACY_FILE)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+    return len(conversations)
+
+
+def compact_conversations(history_dir: str) -> int:
+    """이전 형식 파일을 합치고 손상된 줄을 제거해 로그를 다시 씀 (대화 수 반환)"""
+    if not os.path.isdir(history_dir):
+        return 0
+    with _lock:
+        return _compact(history_dir)
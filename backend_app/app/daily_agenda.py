@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+try:
+    from app.json_cache import json_cache
+    from app.metrics import record_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from json_cache import json_cache
+    from metrics import record_cache
+
+KST = ZoneInfo("Asia/Seoul")
+# 매일 이 시각(KST)에 활성 사용자의 어제 일정 기록을 미리 만들어 둠
+AGENDA_PRECOMPUTE_TIME = os.getenv("AGENDA_PRECOMPUTE_TIME", "00:05")
+AGENDA_PRECOMPUTE_WORKERS = int(os.getenv("AGENDA_PRECOMPUTE_WORKERS", 8))
+AGENDA_PRECOMPUTE_ENABLED = os.getenv("AGENDA_PRECOMPUTE_ENABLED", "true").lower() == "true"
+
+
+def yesterday_kst() -> str:
+    return (datetime.now(KST) - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+class DailyAgenda:
+    """사용자별 '어제 일정' 기록 (대화 시작 시 물어볼 일정 순서 + 첫 질문)
+
+    기록은 {base}/{user}/daily_agenda.json 하나이며, 날짜와 원본(event_store.json
+    또는 schedule 인덱스)의 파일 버전이 같을 때만 유효하다. 동기화나 감정 점수
+    변경으로 원본이 바뀌면 다음 조회 때 다시 만든다.
+    """
+
+    def __init__(self, vector_store, question_for: Callable[[Dict], str], empty_message: str):
+        self.vector_store = vector_store
+        self.question_for = question_for
+        self.empty_message = empty_message
+        self.base_index_path = vector_store.base_index_path
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_run = {}
+
+    def _get_record_path(self, user_id: str) -> str:
+        return os.path.join(self.base_index_path, user_id, "daily_agenda.json")
+
+    def _source_version(self, user_id: str) -> Optional[str]:
+        version = json_cache.stat(self.vector_store.event_store._get_store_path(user_id))
+        if version is not None:
+            return f"events:{version.tag}"
+        version = json_cache.stat(os.path.join(self.base_index_path, user_id, "schedule", "index.pkl"))
+        if version is not None:
+            return f"schedule:{version.tag}"
+        return None
+
+    def _events_for_day(self, user_id: str, day: str) -> Optional[List[Dict]]:
+        # 시작 시각 순으로 정렬된 일정 저장소에서 해당 날짜 구간만 읽음
+        events = self.vector_store.event_store.range_events(user_id, day, day)
+        if events is not None:
+            return events
+
+        # 일정 저장소가 없는 예전 데이터는 schedule 인덱스에서 직접 추림
+        schedule_faiss = self.vector_store.load_index(user_id)
+        if schedule_faiss is None:
+            return None
+        events = [
+            doc.metadata.get("original_event", {})
+            for doc in schedule_faiss.docstore._dict.values()
+            if doc.metadata.get("original_event", {}).get("start", "").startswith(day)
+        ]
+        events.sort(key=lambda x: x.get("start", ""))
+        return events
+
+    def build(self, user_id: str, day: str = None) -> Optional[Dict]:
+        """day(기본: 어제) 기록을 만들어 저장, 일정 데이터가 없으면 None"""
+        day = day or yesterday_kst()
+        source = self._source_version(user_id)
+        if source is None:
+            return None
+        events = self._events_for_day(user_id, day)
+        if events is None:
+            return None
+
+        record = {
+            "date": day,
+            "source": source,
+            "events": events,
+            "question": self.question_for(events[0]) if events else self.empty_message,
+            "created_at": datetime.now(KST).isoformat(),
+        }
+        record_path = self._get_record_path(user_id)
+        tmp_path = record_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, record_path)
+        json_cache.invalidate(record_path)
+        return record
+
+    def get(self, user_id: str, day: str = None) -> Optional[Dict]:
+        """미리 만든 기록을 반환 (없거나 오래됐으면 지금 만듦)"""
+        day = day or yesterday_kst()
+        entry = json_cache.get(self._get_record_path(user_id))
+        if entry is not None and entry.data.get("date") == day and entry.data.get("source") == self._source_version(user_id):
+            record_cache("daily_agenda", True)
+            return entry.data
+        record_cache("daily_agenda", False)
+        return self.build(user_id, day)
+
+    def precompute(self, user_ids: List[str], day: str = None) -> Dict:
+        """여러 사용자의 기록을 병렬로 생성"""
+        day = day or yesterday_kst()
+        started = time.time()
+
+        def build_one(user_id):
+            try:
+                return self.get(user_id, day) is not None
+            except Exception as e:
+                print(f"어제 일정 기록 생성 실패 ({user_id}): {str(e)}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=AGENDA_PRECOMPUTE_WORKERS, thread_name_prefix="agenda") as executor:
+            results = list(executor.map(build_one, user_ids))
+
+        self.last_run = {
+            "date": day,
+            "users": len(user_ids),
+            "built": sum(results),
+            "elapsed_seconds": round(time.time() - started, 3),
+            "finished_at": datetime.now(KST).isoformat(),
+        }
+        print(f"어제 일정 기록 생성 완료: {self.last_run}")
+        return self.last_run
+
+    def _next_run(self, now: datetime) -> datetime:
+        hour, minute = (int(value) for value in AGENDA_PRECOMPUTE_TIME.split(":"))
+        run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return run_at
+
+    def _loop(self, get_user_ids: Callable[[], List[str]]):
+        # 기동 직후 한 번 실행해 재시작 전에 놓친 기록을 채움 (이미 유효한 기록은 건너뜀)
+        while not self._stop.is_set():
+            try:
+                self.precompute(get_user_ids())
+            except Exception as e:
+                print(f"어제 일정 기록 생성 오류: {str(e)}")
+            now = datetime.now(KST)
+            self._stop.wait((self._next_run(now) - now).total_seconds())
+
+    def start_nightly(self, get_user_ids: Callable[[], List[str]]) -> bool:
+        """매일 AGENDA_PRECOMPUTE_TIME에 실행되는 백그라운드 스레드 시작"""
+        if not AGENDA_PRECOMPUTE_ENABLED or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(get_user_ids,), name="daily-agenda", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,138 @@
+import json
+import os
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+try:
+    from app.json_cache import json_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from json_cache import json_cache
+
+KST = ZoneInfo("Asia/Seoul")
+EVENTS_PAGE_MAX_LIMIT = int(os.getenv("EVENTS_PAGE_MAX_LIMIT", 500))
+
+
+def _time_key(value: str) -> str:
+    """일정 시각을 KST 기준 정렬 가능한 문자열로 변환 (종일 일정은 날짜만)"""
+    if "T" not in value:
+        return value[:10]
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=KST)
+    return dt.astimezone(KST).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _date_only(value: str) -> bool:
+    return "T" not in value
+
+
+def _normalize_bound(value: str) -> str:
+    # YYYYMMDD 형식도 허용
+    if len(value) == 8 and value.isdigit():
+        value = f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return _time_key(value)
+
+
+class EventStore:
+    """사용자별 시작 시각 순으로 정렬된 일정 저장소
+
+    동기화 시점에 한 번 정렬해 저장해두고, 조회 시에는 이진 탐색으로
+    기간에 해당하는 구간만 읽는다.
+    """
+
+    def __init__(self, base_index_path: str = "data/faiss"):
+        self.base_index_path = base_index_path
+
+    def _get_store_path(self, user_id: str) -> str:
+        # schedule 인덱스 디렉터리는 동기화 때마다 새로 만들어지므로 그 밖에 보관
+        return os.path.join(self.base_index_path, user_id, "event_store.json")
+
+    # 동기화/감정 점수 변경 후 저장소 재구성
+    def build(self, user_id: str, events: List[Dict], texts: List[str]):
+        records = []
+        for event, text in zip(events, texts):
+            start = event.get("start", "")
+            try:
+                key = _time_key(start) if start else ""
+            except ValueError:
+                key = start
+            calendar_info = event.get("calendar_info", {})
+            records.append({
+                "key": key,
+                "calendar": calendar_info.get("summary", ""),
+                "calendar_id": calendar_info.get("id", ""),
+                "text": text,
+                "event": event,
+            })
+        records.sort(key=lambda x: x["key"])
+
+        store_path = self._get_store_path(user_id)
+        os.makedirs(os.path.dirname(store_path), exist_ok=True)
+        store_data = {
+            "keys": [record.pop("key") for record in records],
+            "records": records,
+            "updated_at": datetime.now(KST).isoformat(),
+        }
+        tmp_path = store_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(store_data, f, ensure_ascii=False)
+        os.replace(tmp_path, store_path)
+        json_cache.invalidate(store_path)
+
+    def _scan(self, user_id: str, start: str, end: str, calendar: str, cursor: int, limit: int):
+        entry = json_cache.get(self._get_store_path(user_id))
+        if entry is None:
+            return None, None
+
+        keys = entry.data["keys"]
+        records = entry.data["records"]
+
+        lo = bisect_left(keys, _normalize_bound(start)) if start else 0
+        hi = len(keys)
+        if end:
+            end_key = _normalize_bound(end)
+            if _date_only(end_key):
+                end_key = (datetime.strptime(end_key, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+            hi = bisect_left(keys, end_key)
+
+        found = []
+        index = max(lo, cursor)
+        while index < hi and len(found) < limit:
+            record = records[index]
+            index += 1
+            if calendar and calendar not in (record["calendar"], record["calendar_id"]):
+                continue
+            found.append(record)
+        return found, (index if index < hi else None)
+
+    # 기간 조회 (start 이상, end 미만 / end가 날짜만 있으면 그 날 포함)
+    def query(
+        self,
+        user_id: str,
+        start: str = None,
+        end: str = None,
+        calendar: str = None,
+        cursor: int = 0,
+        limit: int = 100,
+    ) -> Optional[Dict]:
+        limit = max(1, min(limit, EVENTS_PAGE_MAX_LIMIT))
+        records, next_cursor = self._scan(user_id, start, end, calendar, cursor, limit)
+        if records is None:
+            return None
+        return {"events": [record["event"] for record in records], "next_cursor": next_cursor}
+
+    # 기간 내 일정의 포맷팅된 텍스트 (리포트/페르소나 로더용), 저장소가 없으면 None
+    def range_texts(self, user_id: str, start: str, end: str) -> Optional[List[str]]:
+        records, _ = self._scan(user_id, start, end, None, 0, float("inf"))
+        if records is None:
+            return None
+        return [record["text"] for record in records]
+
+    # 기간 내 일정 원본 (시작 시각 순), 저장소가 없으면 None
+    def range_events(self, user_id: str, start: str, end: str) -> Optional[List[Dict]]:
+        records, _ = self._scan(user_id, start, end, None, 0, float("inf"))
+        if records is None:
+            return None
+        return [record["event"] for record in records]
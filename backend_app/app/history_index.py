@@ -0,0 +1,374 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from app.index_cache import index_cache
+    from app.json_cache import json_cache
+    from app.metrics import FAISS_SAVE_SECONDS, HISTORY_INDEX_DIRTY_TURNS
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from index_cache import index_cache
+    from json_cache import json_cache
+    from metrics import FAISS_SAVE_SECONDS, HISTORY_INDEX_DIRTY_TURNS
+
+# 저장하지 않은 턴이 이 수 이상이면 바로 저장
+HISTORY_INDEX_FLUSH_TURNS = int(os.getenv("HISTORY_INDEX_FLUSH_TURNS", 20))
+# 마지막 저장 후 이 시간(초)이 지난 변경은 타이머가 저장
+HISTORY_INDEX_FLUSH_INTERVAL = float(os.getenv("HISTORY_INDEX_FLUSH_INTERVAL", 60))
+# 저장 전 변경을 메모리에 들고 있을 최대 인덱스 수 (넘으면 가장 오래 안 쓴 것부터 저장)
+HISTORY_INDEX_POOL_SIZE = int(os.getenv("HISTORY_INDEX_POOL_SIZE", 64))
+
+
+def search_with_cosine(index, vector: List[float], k: int, filter: Callable[[Dict], bool] = None, fetch_k: int = 20):
+    """FAISS 인덱스에서 가까운 문서 검색, (문서, 질의와의 코사인 유사도) 목록
+
+    후보 벡터는 인덱스에 저장된 것을 꺼내 쓰므로 문서를 다시 임베딩하지 않는다.
+    filter가 있으면 fetch_k개 후보 중 조건에 맞는 것만 남긴다.
+    """
+    import numpy as np
+
+    query = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+    fetch = min(index.index.ntotal, k if filter is None else max(fetch_k, k))
+    if fetch <= 0:
+        return []
+    _, indices = index.index.search(query, fetch)
+    query_norm = float(np.linalg.norm(query))
+    results = []
+    for i in indices[0]:
+        if i == -1:
+            continue
+        doc = index.docstore.search(index.index_to_docstore_id[int(i)])
+        if filter is not None and not filter(doc.metadata):
+            continue
+        stored = index.index.reconstruct(int(i))
+        norm = float(np.linalg.norm(stored)) * query_norm
+        results.append((doc, float(stored @ query[0]) / norm if norm else 0.0))
+        if len(results) >= k:
+            break
+    return results
+
+
+class _DirtyIndex:
+    def __init__(self, user_id: str, index):
+        self.user_id = user_id
+        self.index = index
+        self.turns = 0
+        self.since = time.monotonic()
+
+
+class HistoryIndexStore:
+    """사용자별 대화 기록 FAISS 인덱스 풀
+
+    인덱스 읽기/쓰기는 사용자별 락으로 직렬화하므로 서로 다른 사용자의 임베딩/
+    저장은 동시에 진행되고, 같은 사용자의 검색과 추가는 섞이지 않는다.
+    턴이 추가되면 인덱스를 메모리에서만 갱신하고 dirty로 표시한다. 저장은 미저장
+    턴 수가 HISTORY_INDEX_FLUSH_TURNS에 이르거나 HISTORY_INDEX_FLUSH_INTERVAL이
+    지났을 때, dirty 인덱스가 HISTORY_INDEX_POOL_SIZE를 넘을 때(LRU), 그리고 세션
+    종료/서버 종료 시 flush()로 한다. 저장된 인덱스는 index_cache(LRU, 크기 한도)가
+    들고 있다. 저장 전에 프로세스가 죽어도 턴은 대화 로그에 남아 있으므로 호출하는
+    쪽이 다시 채운다.
+    """
+
+    def __init__(
+        self,
+        embeddings: Callable[[], object],
+        flush_turns: int = HISTORY_INDEX_FLUSH_TURNS,
+        flush_interval: float = HISTORY_INDEX_FLUSH_INTERVAL,
+        pool_size: int = HISTORY_INDEX_POOL_SIZE,
+    ):
+        self.embeddings = embeddings
+        self.flush_turns = flush_turns
+        self.flush_interval = flush_interval
+        self.pool_size = pool_size
+        self._dirty: "OrderedDict[str, _DirtyIndex]" = OrderedDict()
+        # _dirty/_user_locks 자체만 보호 (임베딩/저장 중에는 잡지 않음)
+        self._lock = threading.Lock()
+        self._user_locks: Dict[str, threading.RLock] = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _key(index_path: str) -> str:
+        return os.path.abspath(index_path)
+
+    def user_lock(self, user_id: str) -> threading.RLock:
+        """사용자 인덱스를 읽거나 바꾸는 동안 잡는 락 (여러 단계를 묶을 때 호출하는 쪽도 사용)"""
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.RLock()
+            return lock
+
+    def _get(self, index_path: str):
+        with self._lock:
+            entry = self._dirty.get(self._key(index_path))
+            if entry is not None:
+                self._dirty.move_to_end(self._key(index_path))
+                return entry.index
+        return index_cache.get(index_path, self.embeddings(), "history")
+
+    def get(self, user_id: str, index_path: str):
+        """저장 전 변경이 있으면 메모리 인덱스, 없으면 디스크(캐시)에서 로드 (없으면 None)"""
+        with self.user_lock(user_id):
+            return self._get(index_path)
+
+    def is_dirty(self, index_path: str) -> bool:
+        with self._lock:
+            return self._key(index_path) in self._dirty
+
+    def add(self, user_id: str, index_path: str, documents: List, turns: int):
+        """문서를 메모리 인덱스에 추가하고 dirty로 표시 (기준을 넘으면 바로 저장)"""
+        from langchain_community.vectorstores import FAISS
+
+        self._ensure_timer()
+        key = self._key(index_path)
+        with self.user_lock(user_id):
+            with self._lock:
+                entry = self._dirty.get(key)
+            if entry is None:
+                index = index_cache.get(index_path, self.embeddings(), "history")
+                if index is None:
+                    index = FAISS.from_documents(documents, self.embeddings())
+                else:
+                    index.add_documents(documents)
+                entry = _DirtyIndex(user_id, index)
+                with self._lock:
+                    self._dirty[key] = entry
+            else:
+                entry.index.add_documents(documents)
+                with self._lock:
+                    self._dirty.move_to_end(key)
+            entry.turns += turns
+            self._update_gauge()
+            if entry.turns >= self.flush_turns:
+                self._save(key, entry)
+        self._evict()
+        return entry.index
+
+    def search(self, user_id: str, index_path: str, vector: List[float], k: int) -> List[Tuple[object, float]]:
+        """한 날짜 인덱스에서 검색, (문서, 코사인 유사도) 목록"""
+        with self.user_lock(user_id):
+            index = self._get(index_path)
+            if index is None:
+                return []
+            return search_with_cosine(index, vector, k)
+
+    def delete(self, user_id: str, index_path: str) -> bool:
+        """인덱스 폴더와 미저장 변경을 함께 삭제 (없었으면 False)"""
+        with self.user_lock(user_id):
+            self.discard(index_path)
+            index_cache.invalidate(index_path)
+            if not os.path.exists(index_path):
+                return False
+            shutil.rmtree(index_path)
+            return True
+
+    def _save(self, key: str, entry: _DirtyIndex):
+        # 사용자 락을 잡은 상태에서 호출
+        os.makedirs(key, exist_ok=True)
+        with FAISS_SAVE_SECONDS.time(kind="history"):
+            entry.index.save_local(key)
+        index_cache.put(key, entry.index, "history")
+        with self._lock:
+            if self._dirty.get(key) is entry:
+                del self._dirty[key]
+        self._update_gauge()
+        print(f"대화 기록 인덱스 저장: {key} ({entry.turns}턴)")
+
+    def _flush_entry(self, key: str, entry: _DirtyIndex) -> bool:
+        with self.user_lock(entry.user_id):
+            with self._lock:
+                if self._dirty.get(key) is not entry:
+                    # 그 사이에 저장/삭제됨
+                    return False
+            try:
+                self._save(key, entry)
+                return True
+            except Exception as e:
+                # 다음 flush 때 다시 시도 (턴은 대화 로그에 남아 있음)
+                print(f"대화 기록 인덱스 저장 실패: {key} ({str(e)})")
+                return False
+
+    def flush(self, path_prefix: str = None, older_than: float = None) -> int:
+        """dirty 인덱스 저장 (path_prefix 아래만 / older_than초 이상 지난 것만), 저장한 수 반환"""
+        prefix = self._key(path_prefix) if path_prefix else None
+        now = time.monotonic()
+        with self._lock:
+            targets = [
+                (key, entry)
+                for key, entry in self._dirty.items()
+                if (prefix is None or key == prefix or key.startswith(prefix + os.sep))
+                and (older_than is None or now - entry.since >= older_than)
+            ]
+        return sum(self._flush_entry(key, entry) for key, entry in targets)
+
+    def _evict(self):
+        # 풀 크기를 넘으면 가장 오래 안 쓴 dirty 인덱스부터 저장해 index_cache로 넘김
+        while True:
+            with self._lock:
+                if len(self._dirty) <= self.pool_size:
+                    return
+                key, entry = next(iter(self._dirty.items()))
+            if not self._flush_entry(key, entry):
+                return
+
+    def discard(self, path_prefix: str):
+        """삭제된 대화 기록의 미저장 변경을 버림"""
+        prefix = self._key(path_prefix)
+        with self._lock:
+            for key in list(self._dirty):
+                if key == prefix or key.startswith(prefix + os.sep):
+                    del self._dirty[key]
+        self._update_gauge()
+
+    def _update_gauge(self):
+        with self._lock:
+            HISTORY_INDEX_DIRTY_TURNS.set(sum(entry.turns for entry in self._dirty.values()))
+
+    def _ensure_timer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="history-index-flush", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        interval = max(1.0, self.flush_interval / 4)
+        while not self._stop.wait(interval):
+            self.flush(older_than=self.flush_interval)
+
+    def close(self):
+        """타이머를 멈추고 남은 변경을 모두 저장"""
+        self._stop.set()
+        self.flush()
+
+
+class RollingHistoryIndex:
+    """사용자별로 지난 날짜의 대화 인덱스를 하나로 합친 인덱스 ({user}/history_rolling)
+
+    문서마다 metadata["date"](YYYYMMDD)를 달아 두고 기간으로 걸러 검색한다.
+    합치기는 야간 작업에서 하며, 날짜 인덱스에 저장된 벡터를 그대로 옮기므로
+    다시 임베딩하지 않는다. 날짜별로 옮긴 문서 수는 합친 인덱스 자신의 문서
+    metadata에서 세므로 인덱스와 어긋나지 않고, 합친 뒤에 늦게 추가된 턴도 다음
+    합치기 때 이어서 옮긴다. merged_days.json은 검색 때 매번 세지 않으려고 인덱스
+    저장 뒤에 같이 쓰는 사본이다. 날짜 인덱스와 같은 사용자별 락(user_lock)으로
+    합치기와 검색을 직렬화한다.
+    """
+
+    def __init__(self, base_index_path: str, embeddings: Callable[[], object], user_lock: Callable[[str], object]):
+        self.base_index_path = base_index_path
+        self.embeddings = embeddings
+        self.user_lock = user_lock
+
+    def get_path(self, user_id: str) -> str:
+        return os.path.join(self.base_index_path, user_id, "history_rolling")
+
+    def _manifest_path(self, user_id: str) -> str:
+        return os.path.join(self.get_path(user_id), "merged_days.json")
+
+    def merged_days(self, user_id: str) -> Dict[str, int]:
+        """합친 날짜별 문서 수"""
+        entry = json_cache.get(self._manifest_path(user_id))
+        return dict(entry.data) if entry is not None and entry.data else {}
+
+    @staticmethod
+    def _count_days(rolling) -> Optional[Dict[str, int]]:
+        # 합친 인덱스의 문서 metadata로 날짜별 문서 수를 셈 (벡터와 문서 목록이 어긋나면 None)
+        if rolling.index.ntotal != len(rolling.index_to_docstore_id):
+            return None
+        counts: Dict[str, int] = {}
+        for _id in rolling.index_to_docstore_id.values():
+            day = rolling.docstore.search(_id).metadata.get("date", "")
+            counts[day] = counts.get(day, 0) + 1
+        return counts
+
+    def _write_manifest(self, user_id: str, manifest: Dict[str, int]):
+        manifest_path = self._manifest_path(user_id)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+        json_cache.invalidate(manifest_path)
+
+    def merge(self, user_id: str, before: str) -> int:
+        """before(YYYYMMDD) 이전 날짜 인덱스의 새 문서를 합침, 옮긴 문서 수 반환"""
+        from langchain_community.vectorstores import FAISS
+
+        history_root = os.path.join(self.base_index_path, user_id, "history")
+        if not os.path.isdir(history_root):
+            return 0
+
+        with self.user_lock(user_id):
+            rolling_path = self.get_path(user_id)
+            rolling = index_cache.get(rolling_path, self.embeddings(), "history")
+            manifest = {} if rolling is None else self._count_days(rolling)
+            if manifest is None:
+                # 저장 도중 중단되어 파일끼리 어긋난 인덱스는 날짜 인덱스에서 다시 만듦
+                print(f"합친 대화 인덱스가 손상되어 다시 만듭니다: {rolling_path}")
+                index_cache.invalidate(rolling_path)
+                rolling, manifest = None, {}
+
+            moved = 0
+            try:
+                for day in sorted(os.listdir(history_root)):
+                    if not (len(day) == 8 and day.isdigit()) or day >= before:
+                        continue
+                    day_index = index_cache.get(os.path.join(history_root, day), self.embeddings(), "history")
+                    if day_index is None:
+                        continue
+                    total = day_index.index.ntotal
+                    start = manifest.get(day, 0)
+                    if total <= start:
+                        continue
+
+                    ids = [day_index.index_to_docstore_id[i] for i in range(start, total)]
+                    docs = [day_index.docstore.search(_id) for _id in ids]
+                    vectors = day_index.index.reconstruct_n(start, total - start)
+                    metadatas = [dict(doc.metadata, date=day) for doc in docs]
+                    pairs = list(zip([doc.page_content for doc in docs], vectors.tolist()))
+                    if rolling is None:
+                        rolling = FAISS.from_embeddings(pairs, self.embeddings(), metadatas=metadatas)
+                    else:
+                        rolling.add_embeddings(pairs, metadatas=metadatas)
+                    manifest[day] = total
+                    moved += len(docs)
+
+                if moved:
+                    # 임시 디렉터리에 저장한 뒤 파일을 바꿔 넣어, 중간에 실패해도 기존 인덱스가 남게 함
+                    tmp_path = rolling_path + ".tmp"
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    with FAISS_SAVE_SECONDS.time(kind="history"):
+                        rolling.save_local(tmp_path)
+                    os.makedirs(rolling_path, exist_ok=True)
+                    for name in ("index.faiss", "index.pkl"):
+                        os.replace(os.path.join(tmp_path, name), os.path.join(rolling_path, name))
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    index_cache.put(rolling_path, rolling, "history")
+            except Exception:
+                # 캐시의 인덱스에 저장하지 못한 문서가 더해졌을 수 있으므로 버리고 디스크에서 다시 읽게 함
+                index_cache.invalidate(rolling_path)
+                raise
+
+            if rolling is not None and manifest != self.merged_days(user_id):
+                self._write_manifest(user_id, manifest)
+            return moved
+
+    def search(self, user_id: str, vector: List[float], k: int, since: str = None) -> List[Tuple[object, float]]:
+        """합쳐진 대화에서 검색 (since(YYYYMMDD) 이후 날짜만), (문서, 코사인 유사도) 목록"""
+        with self.user_lock(user_id):
+            rolling = index_cache.get(self.get_path(user_id), self.embeddings(), "history")
+            if rolling is None:
+                return []
+            if since is None:
+                return search_with_cosine(rolling, vector, k)
+            # 기간 필터는 가까운 후보를 넉넉히 뽑은 뒤 거름
+            return search_with_cosine(
+                rolling, vector, k, filter=lambda metadata: metadata.get("date", "") >= since, fetch_k=max(20, k * 20)
+            )
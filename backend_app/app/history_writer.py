@@ -0,0 +1,213 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+try:
+    from app.metrics import HISTORY_WRITE_PENDING, HISTORY_WRITE_BATCH_SECONDS, HISTORY_WRITE_FAILURES_TOTAL
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import HISTORY_WRITE_PENDING, HISTORY_WRITE_BATCH_SECONDS, HISTORY_WRITE_FAILURES_TOTAL
+
+# 한 번에 저장할 최대 턴 수와, 첫 턴이 들어온 뒤 배치를 모으는 최대 대기 시간(초)
+HISTORY_WRITE_BATCH = int(os.getenv("HISTORY_WRITE_BATCH", 32))
+HISTORY_WRITE_INTERVAL = float(os.getenv("HISTORY_WRITE_INTERVAL", 0.5))
+# 저장 실패 시 재시도 간격(초)
+HISTORY_WRITE_RETRY_DELAY = float(os.getenv("HISTORY_WRITE_RETRY_DELAY", 5))
+# 스풀 파일 fsync 여부 (끄면 프로세스 종료에는 안전하지만 OS 장애 시 일부 유실 가능)
+HISTORY_SPOOL_FSYNC = os.getenv("HISTORY_SPOOL_FSYNC", "true").lower() == "true"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PartialPersistError(Exception):
+    """배치의 일부 턴만 저장하지 못했을 때 persist가 던지는 예외 (failed: 저장하지 못한 턴)"""
+
+    def __init__(self, failed: List[Dict], message: str):
+        super().__init__(message)
+        self.failed = failed
+
+
+class HistoryWriteBehind:
+    """대화 턴 저장을 응답 경로 밖으로 미루는 write-behind 큐
+
+    submit()은 턴을 스풀 파일(JSONL)에 추가한 뒤 바로 반환하고, 백그라운드
+    스레드가 모인 턴을 persist(batch)로 한 번에 저장한다. 스풀은 프로세스별
+    파일이며, 저장이 끝난 턴을 뺀 나머지만 남도록 다시 쓴다. persist가
+    PartialPersistError를 던지면 저장하지 못한 턴만 다시 시도한다.
+    재시도하는 턴과 다음 기동 때 스풀에서 복구한 턴은 이미 저장됐을 수 있으므로
+    recovered 표시를 붙여 persist 쪽에서 저장된 턴을 건너뛸 수 있게 한다.
+    """
+
+    def __init__(self, persist: Callable[[List[Dict]], None], spool_dir: str):
+        self.persist = persist
+        self.spool_dir = spool_dir
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.spool_path = os.path.join(self.spool_dir, f"history_spool.{os.getpid()}.jsonl")
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._start_lock = threading.Lock()
+        self._pending = 0
+        # 스풀에 남아 있어야 하는 (아직 저장되지 않은) 턴, 순번 -> 스풀 한 줄
+        self._unsaved: "OrderedDict[int, str]" = OrderedDict()
+        self._seq = 0
+        self._thread = None
+        self._stopping = False
+        self._recovered = False
+
+    def _spool(self, lines: List[str]):
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            if HISTORY_SPOOL_FSYNC:
+                os.fsync(f.fileno())
+
+    def _rewrite_spool(self):
+        # _lock을 잡은 상태에서 호출, 저장되지 않은 턴만 남김
+        tmp_path = self.spool_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(self._unsaved.values()))
+            f.flush()
+            if HISTORY_SPOOL_FSYNC:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    def _add(self, record: Dict, line: str):
+        # _lock을 잡은 상태에서 호출, 스풀 순서와 큐 순서를 맞추기 위해 큐에도 락 안에서 넣음
+        self._seq += 1
+        self._unsaved[self._seq] = line
+        self._pending += 1
+        HISTORY_WRITE_PENDING.set(self._pending)
+        self._queue.put((self._seq, record))
+
+    def start(self):
+        """남은 스풀 복구 후 저장 스레드 시작"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if not self._recovered:
+                self._recovered = True
+                self._recover()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    def _recover(self):
+        # 종료된 프로세스(이전 기동 포함)의 스풀을 가져와 다시 저장
+        recovered = []
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "history_spool.*.jsonl"))):
+            try:
+                pid = int(os.path.basename(path).split(".")[1])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        recovered.append(json.loads(line))
+                    except ValueError:
+                        print(f"손상된 스풀 항목 무시: {path}")
+            if path != self.spool_path:
+                os.remove(path)
+
+        if recovered:
+            with self._lock:
+                # 자기 스풀은 새로 쓰고, 가져온 항목은 저장 완료 전까지 다시 기록해 둠
+                for record in recovered:
+                    self._add(dict(record, recovered=True), json.dumps(record, ensure_ascii=False) + "\n")
+                self._rewrite_spool()
+            print(f"저장되지 않은 대화 기록 {len(recovered)}건 복구")
+
+    def submit(self, record: Dict):
+        """턴을 스풀에 기록하고 저장 큐에 넣음 (디스크/임베딩 작업은 기다리지 않음)"""
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        # 스풀 기록과 미저장 목록 추가를 한 번에 해야 저장 스레드가 스풀을 다시 쓸 때 유실되지 않음
+        with self._lock:
+            self._spool([line])
+            self._add(record, line)
+
+    def _next_batch(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + HISTORY_WRITE_INTERVAL
+        while len(batch) < HISTORY_WRITE_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return [item for item in batch if item is not None]
+
+    def _saved(self, items: List[tuple]):
+        # 저장한 턴은 스풀에서 제거 (다음 기동 때 다시 저장되지 않도록)
+        with self._lock:
+            self._pending -= len(items)
+            HISTORY_WRITE_PENDING.set(self._pending)
+            if items:
+                for seq, _ in items:
+                    self._unsaved.pop(seq, None)
+                self._rewrite_spool()
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            while batch:
+                try:
+                    with HISTORY_WRITE_BATCH_SECONDS.time():
+                        self.persist([record for _, record in batch])
+                    break
+                except Exception as e:
+                    HISTORY_WRITE_FAILURES_TOTAL.inc()
+                    failed = batch
+                    if isinstance(e, PartialPersistError):
+                        # 저장된 턴은 바로 스풀에서 빼고, 실패한 턴만 다시 시도
+                        failed_ids = {id(record) for record in e.failed}
+                        failed = [item for item in batch if id(item[1]) in failed_ids]
+                        self._saved([item for item in batch if id(item[1]) not in failed_ids])
+                    # 실패 도중 일부가 저장됐을 수 있으므로 재시도 때는 저장된 턴을 건너뛰게 함
+                    batch = [(seq, dict(record, recovered=True)) for seq, record in failed]
+                    print(f"대화 기록 {len(batch)}건 저장 실패, {HISTORY_WRITE_RETRY_DELAY}초 후 재시도: {str(e)}")
+                    if self._stopping:
+                        # 종료 중이면 스풀에 남겨 다음 기동 때 복구
+                        return
+                    time.sleep(HISTORY_WRITE_RETRY_DELAY)
+
+            self._saved(batch)
+            with self._lock:
+                if self._stopping and self._pending == 0:
+                    return
+
+    def flush(self, timeout: float = None) -> bool:
+        """대기 중인 턴이 모두 저장될 때까지 대기"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout: float = 10):
+        """남은 턴을 저장하고 스레드 종료 (시간 안에 못 끝내면 스풀에 남김)"""
+        self.flush(timeout)
+        with self._lock:
+            self._stopping = True
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    from app.metrics import FAISS_LOAD_SECONDS, INDEX_CACHE_BYTES, INDEX_CACHE_EVICTIONS_TOTAL, record_cache
+    from app.json_cache import FileVersion, json_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import FAISS_LOAD_SECONDS, INDEX_CACHE_BYTES, INDEX_CACHE_EVICTIONS_TOTAL, record_cache
+    from json_cache import FileVersion, json_cache
+
+# 메모리에 유지할 FAISS 인덱스 총 크기 (디스크의 index.faiss + index.pkl 크기 기준)
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+INDEX_FILES = ("index.faiss", "index.pkl")
+
+
+class CachedIndex:
+    def __init__(self, index, version: Tuple[FileVersion, ...], size: int, kind: str):
+        self.index = index
+        self.version = version
+        self.size = size
+        self.kind = kind
+
+
+class FaissIndexCache:
+    """디스크의 FAISS 인덱스를 파일 버전 기준으로 메모리에 캐시 (LRU, 크기 한도)
+
+    파일이 바뀌면(mtime/크기) 다음 조회 때 다시 로드한다. 캐시된 인덱스는
+    여러 요청이 함께 읽으므로 수정하는 쪽은 저장 후 put()으로 버전을 갱신한다.
+    """
+
+    def __init__(self, max_bytes: int = INDEX_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedIndex]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(index_path: str) -> str:
+        return os.path.abspath(index_path)
+
+    @staticmethod
+    def version(index_path: str) -> Optional[Tuple[FileVersion, ...]]:
+        versions = []
+        for name in INDEX_FILES:
+            version = json_cache.stat(os.path.join(index_path, name))
+            if version is None:
+                return None
+            versions.append(version)
+        return tuple(versions)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def contains(self, index_path: str) -> bool:
+        version = self.version(index_path)
+        with self._lock:
+            entry = self._entries.get(self._key(index_path))
+            return entry is not None and version is not None and entry.version == version
+
+    def get(self, index_path: str, embeddings, kind: str):
+        """인덱스 반환 (없으면 None), 캐시에 없거나 파일이 바뀌었으면 디스크에서 로드"""
+        version = self.version(index_path)
+        if version is None:
+            return None
+
+        key = self._key(index_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                record_cache("faiss_index", True)
+                return entry.index
+
+        record_cache("faiss_index", False)
+        from langchain_community.vectorstores import FAISS
+
+        with FAISS_LOAD_SECONDS.time(kind=kind):
+            index = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+        self._store(key, CachedIndex(index, version, sum(v.size for v in version), kind))
+        return index
+
+    def put(self, index_path: str, index, kind: str):
+        """방금 저장한 인덱스를 현재 파일 버전으로 등록 (다시 로드하지 않도록)"""
+        version = self.version(index_path)
+        if version is None:
+            return
+        self._store(self._key(index_path), CachedIndex(index, version, sum(v.size for v in version), kind))
+
+    def _store(self, key: str, entry: CachedIndex):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            # 가장 오래 안 쓴 인덱스부터 내보냄 (방금 넣은 것은 유지)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                INDEX_CACHE_EVICTIONS_TOTAL.inc(kind=evicted.kind)
+            INDEX_CACHE_BYTES.set(self._bytes)
+
+    def invalidate(self, index_path: str):
+        with self._lock:
+            entry = self._entries.pop(self._key(index_path), None)
+            if entry is not None:
+                self._bytes -= entry.size
+                INDEX_CACHE_BYTES.set(self._bytes)
+
+
+index_cache = FaissIndexCache()
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+try:
+    from app.index_cache import index_cache, FaissIndexCache, INDEX_CACHE_MAX_BYTES
+    from app.json_cache import json_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from index_cache import index_cache, FaissIndexCache, INDEX_CACHE_MAX_BYTES
+    from json_cache import json_cache
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# 최근 활성 사용자 중 미리 올릴 최대 인원
+WARMUP_MAX_USERS = int(os.getenv("WARMUP_MAX_USERS", 50))
+# 워밍업으로 채울 최대 메모리 (나머지 캐시 공간은 실제 요청용으로 남김)
+WARMUP_MAX_BYTES = int(os.getenv("WARMUP_MAX_BYTES", INDEX_CACHE_MAX_BYTES // 2))
+
+
+class IndexWarmup:
+    """서버 기동 후 최근 활성 사용자의 일정/성향/오늘 대화 인덱스를 미리 메모리에 로드
+
+    백그라운드 스레드에서 실행되므로 서버 준비(요청 수신)를 막지 않는다.
+    진행 상황은 progress()로 확인한다.
+    """
+
+    def __init__(
+        self,
+        active_users_path: str,
+        embeddings: Callable,
+        base_index_path: str = "data/faiss",
+        cache: FaissIndexCache = index_cache,
+        max_users: int = WARMUP_MAX_USERS,
+        max_bytes: int = WARMUP_MAX_BYTES,
+        prepare: Callable = None,
+    ):
+        self.active_users_path = active_users_path
+        # 임베딩 클라이언트는 워밍업 스레드에서 처음 만들도록 함수로 받음
+        self.embeddings = embeddings
+        self.base_index_path = base_index_path
+        self.cache = cache
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.prepare = prepare
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {"state": "idle"}
+
+    def _recent_users(self) -> List[str]:
+        # 활성 사용자 목록은 최근에 갱신된 사용자가 뒤에 추가됨
+        if json_cache.stat(self.active_users_path) is None:
+            return []
+        active_users = json_cache.get(self.active_users_path).data or []
+        user_ids = []
+        for user in reversed(active_users):
+            user_id = user.get("user_id") if isinstance(user, dict) else None
+            if user_id and user_id not in user_ids:
+                user_ids.append(user_id)
+        return user_ids[:self.max_users]
+
+    def _targets(self, user_id: str) -> List[Tuple[str, str]]:
+        # 대화 경로는 직접 계산 (ConversationHistory의 경로 함수는 폴더를 만들어 /init-chat 판단이 바뀜)
+        today = datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d")
+        user_path = os.path.join(self.base_index_path, user_id)
+        return [
+            ("schedule", os.path.join(user_path, "schedule")),
+            ("tendency", os.path.join(user_path, "tendency")),
+            ("history", os.path.join(user_path, "history", today)),
+            ("history", os.path.join(user_path, "history_rolling")),
+        ]
+
+    def _update(self, **values):
+        with self._lock:
+            self._status.update(values)
+
+    def progress(self) -> Dict:
+        with self._lock:
+            return dict(self._status)
+
+    def start(self) -> bool:
+        """워밍업 스레드 시작 (이미 실행 중이거나 비활성화면 False)"""
+        if not WARMUP_ENABLED:
+            self._update(state="disabled")
+            return False
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._status = {"state": "pending"}
+            self._thread = threading.Thread(target=self.run, name="index-warmup", daemon=True)
+            self._thread.start()
+        return True
+
+    def run(self):
+        started = time.time()
+        self._update(
+            state="running", started_at=datetime.now(ZoneInfo("Asia/Seoul")).isoformat(),
+            users_total=0, users_done=0, indexes_loaded=0, indexes_skipped=0,
+            bytes_loaded=0, budget_bytes=self.max_bytes, budget_exhausted=False, errors=0,
+        )
+        try:
+            # 임베딩/LLM 클라이언트 생성과 langchain import도 미리 해둠
+            embeddings = self.embeddings()
+            if self.prepare:
+                self.prepare()
+
+            user_ids = self._recent_users()
+            self._update(users_total=len(user_ids))
+            loaded_bytes = 0
+            loaded = skipped = errors = 0
+            for done, user_id in enumerate(user_ids, 1):
+                for kind, index_path in self._targets(user_id):
+                    version = self.cache.version(index_path)
+                    if version is None:
+                        continue
+                    if self.cache.contains(index_path):
+                        skipped += 1
+                        continue
+
+                    size = sum(v.size for v in version)
+                    if loaded_bytes + size > self.max_bytes or self.cache.size + size > self.cache.max_bytes:
+                        self._update(budget_exhausted=True)
+                        break
+                    try:
+                        self.cache.get(index_path, embeddings, kind)
+                        loaded_bytes += size
+                        loaded += 1
+                    except Exception as e:
+                        errors += 1
+                        print(f"인덱스 워밍업 실패 ({user_id}, {kind}): {str(e)}")
+
+                self._update(
+                    users_done=done, indexes_loaded=loaded, indexes_skipped=skipped,
+                    bytes_loaded=loaded_bytes, errors=errors,
+                )
+                if self.progress()["budget_exhausted"]:
+                    print(f"인덱스 워밍업 메모리 한도 도달: {loaded_bytes} bytes")
+                    break
+
+            self._update(state="done")
+            print(f"인덱스 워밍업 완료: 사용자 {self.progress()['users_done']}명, 인덱스 {loaded}개, {time.time() - started:.1f}초")
+        except Exception as e:
+            self._update(state="failed", error=str(e))
+            print(f"인덱스 워밍업 오류: {str(e)}")
+        finally:
+            self._update(
+                finished_at=datetime.now(ZoneInfo("Asia/Seoul")).isoformat(),
+                elapsed_seconds=round(time.time() - started, 3),
+            )
@@ -0,0 +1,36 @@
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+try:
+    from app.metrics import EMBEDDING_SECONDS, EMBEDDING_REQUESTS_TOTAL, EMBEDDING_TEXTS_TOTAL
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import EMBEDDING_SECONDS, EMBEDDING_REQUESTS_TOTAL, EMBEDDING_TEXTS_TOTAL
+
+
+class InstrumentedEmbeddings(Embeddings):
+    """임베딩 클라이언트를 감싸 호출 수/시간을 기록"""
+
+    def __init__(self, embeddings: Embeddings, model: str = "embedding-query"):
+        self.embeddings = embeddings
+        self.model = model
+
+    def _track(self, op: str, count: int, fn, *args):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            return fn(*args)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            EMBEDDING_SECONDS.observe(time.perf_counter() - start, model=self.model, op=op)
+            EMBEDDING_REQUESTS_TOTAL.inc(model=self.model, op=op, status=status)
+            EMBEDDING_TEXTS_TOTAL.inc(count, model=self.model, op=op)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._track("documents", len(texts), self.embeddings.embed_documents, texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._track("query", 1, self.embeddings.embed_query, text)
@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+try:
+    from app.metrics import record_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import record_cache
+
+JSON_CACHE_MAX_ENTRIES = int(os.getenv("JSON_CACHE_MAX_ENTRIES", 512))
+
+
+class FileVersion:
+    """파일의 mtime/크기로 만든 버전 정보 (ETag/Last-Modified 생성용)"""
+
+    def __init__(self, mtime_ns: int, size: int):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.tag = f"{mtime_ns:x}-{size:x}"
+
+    @property
+    def mtime(self) -> float:
+        return self.mtime_ns / 1e9
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime, usegmt=True)
+
+    def etag(self, variant: str = "") -> str:
+        # 같은 파일이라도 엔드포인트/쿼리에 따라 응답이 다르므로 variant를 함께 반영
+        if variant:
+            return f'"{self.tag}-{zlib.crc32(variant.encode("utf-8")):x}"'
+        return f'"{self.tag}"'
+
+    def __eq__(self, other):
+        return isinstance(other, FileVersion) and (self.mtime_ns, self.size) == (other.mtime_ns, other.size)
+
+
+class CachedJson:
+    def __init__(self, data: Any, version: FileVersion):
+        self.data = data
+        self.version = version
+        # variant별 직렬화 결과 (응답 바디 재사용)
+        self.rendered: Dict[str, bytes] = {}
+
+
+class JsonFileCache:
+    """JSON 파일을 파싱한 결과를 파일 버전 기준으로 메모리에 캐시"""
+
+    def __init__(self, max_entries: int = JSON_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedJson]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    @staticmethod
+    def stat(path: str) -> Optional[FileVersion]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return FileVersion(st.st_mtime_ns, st.st_size)
+
+    def get(self, path: str, version: FileVersion = None) -> Optional[CachedJson]:
+        version = version or self.stat(path)
+        if version is None:
+            return None
+
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                record_cache("json_file", True)
+                return entry
+
+        record_cache("json_file", False)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entry = CachedJson(data, version)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._entries.pop(self._key(path), None)
+
+
+def not_modified(headers, version: FileVersion, etag: str) -> bool:
+    """If-None-Match / If-Modified-Since 조건 확인"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP 날짜는 초 단위이므로 초 단위로 비교
+        return int(version.mtime) <= int(since)
+    return False
+
+
+json_cache = JsonFileCache()
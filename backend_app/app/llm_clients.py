@@ -0,0 +1,149 @@
+import os
+import threading
+
+# httpx/openai/langchain 등 무거운 의존성은 클라이언트를 처음 만들 때 import
+# (서버 기동 시 import 시간을 줄이기 위함)
+
+# 모든 LLM 호출에 공통으로 적용하는 타임아웃 정책 (재시도는 RateLimitedTransport에서 처리)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 10))
+# 커넥션 풀 (keep-alive 연결 재사용)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+# 공급자 선택: local이면 API 키 없이 결정적인 로컬 구현 사용 (app/local_providers.py, 부하/성능 테스트용)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "upstage").lower()
+
+
+def _local_providers():
+    try:
+        import app.local_providers as local_providers
+    except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+        import local_providers
+    return local_providers
+
+
+class LLMClientRegistry:
+    """프로세스 전체에서 공유하는 LLM/임베딩 클라이언트 모음
+
+    공급자별로 하나의 httpx 커넥션 풀 위에 OpenAI 클라이언트, 모델 설정별
+    ChatOpenAI, 임베딩 클라이언트를 한 번만 만들어 재사용한다. 요청마다
+    클라이언트를 만들면 매번 새 연결과 TLS 핸드셰이크가 필요하다.
+    모든 요청은 공급자/모델별 한도(rate_limiter)를 거친다.
+    LLM_PROVIDER/EMBEDDING_PROVIDER가 local이면 같은 자리에 로컬 구현을 돌려준다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._http_clients = {}
+        self._openai_client = None
+        self._chat_models = {}
+        self._embeddings = {}
+
+    def http_client(self, provider: str = "openai"):
+        with self._lock:
+            http_client = self._http_clients.get(provider)
+            if http_client is None:
+                import httpx
+                try:
+                    from app.rate_limiter import RateLimitedTransport
+                except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+                    from rate_limiter import RateLimitedTransport
+
+                limits = httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+                )
+                http_client = httpx.Client(
+                    timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                    transport=RateLimitedTransport(httpx.HTTPTransport(limits=limits), provider),
+                )
+                self._http_clients[provider] = http_client
+            return http_client
+
+    def openai_client(self):
+        if LLM_PROVIDER == "local":
+            with self._lock:
+                if self._openai_client is None:
+                    self._openai_client = _local_providers().LocalOpenAIClient()
+                return self._openai_client
+
+        http_client = self.http_client("openai")
+        with self._lock:
+            if self._openai_client is None:
+                from openai import OpenAI
+
+                self._openai_client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=http_client,
+                    timeout=LLM_TIMEOUT,
+                    max_retries=0,
+                )
+            return self._openai_client
+
+    def chat_model(self, model: str, temperature: float = 0.7, max_tokens: int = None):
+        key = (model, temperature, max_tokens)
+        if LLM_PROVIDER == "local":
+            with self._lock:
+                chat_model = self._chat_models.get(key)
+                if chat_model is None:
+                    chat_model = self._chat_models[key] = _local_providers().LocalChatModel(
+                        model_name=model, temperature=temperature, max_tokens=max_tokens
+                    )
+                return chat_model
+
+        http_client = self.http_client("openai")
+        with self._lock:
+            chat_model = self._chat_models.get(key)
+            if chat_model is None:
+                from langchain_openai import ChatOpenAI
+
+                chat_model = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=http_client,
+                    timeout=LLM_TIMEOUT,
+                    max_retries=0,
+                )
+                self._chat_models[key] = chat_model
+            return chat_model
+
+    def embeddings(self, model: str = "embedding-query"):
+        http_client = self.http_client("upstage") if EMBEDDING_PROVIDER != "local" else None
+        with self._lock:
+            embeddings = self._embeddings.get(model)
+            if embeddings is None:
+                try:
+                    from app.instrumented_embeddings import InstrumentedEmbeddings
+                except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+                    from instrumented_embeddings import InstrumentedEmbeddings
+
+                if EMBEDDING_PROVIDER == "local":
+                    client = _local_providers().HashEmbeddings()
+                else:
+                    from langchain_upstage import UpstageEmbeddings
+
+                    client = UpstageEmbeddings(
+                        model=model,
+                        api_key=os.getenv("UPSTAGE_API_KEY"),
+                        http_client=http_client,
+                        max_retries=0,
+                    )
+                embeddings = InstrumentedEmbeddings(client, model=model)
+                self._embeddings[model] = embeddings
+            return embeddings
+
+    def close(self):
+        with self._lock:
+            for http_client in self._http_clients.values():
+                http_client.close()
+            self._http_clients = {}
+            self._openai_client = None
+            self._chat_models = {}
+            self._embeddings = {}
+
+
+llm_clients = LLMClientRegistry()
@@ -1,167 +1,380 @@
-from langchain_community.vectorstores import FAISS
-from langchain_openai import ChatOpenAI
-from langchain.schema import Document
 from fastapi import Request
-from app.vector_store import VectorStore
+from app.vector_store import VectorStore, get_vector_store
+from app.metrics import RETRIEVAL_STAGE_SECONDS, record_cache, track_llm_call
+from app.llm_clients import llm_clients
+from app.daily_agenda import DailyAgenda
+from app.history_writer import HistoryWriteBehind, PartialPersistError
+from app.history_index import HistoryIndexStore, RollingHistoryIndex
+from app.prefetch import PrefetchCache
+from app.prompts import chat_prompt
+from app.response_cache import response_cache
+from app.context_builder import CONTEXT_TOKEN_BUDGET, ContextBuilder, trim_to_tokens
+from app.conversation_log import append_conversations, compact_conversations, compact_record, iter_conversations
 import os
-import shutil
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-import json
 
+# langchain/FAISS는 처음 사용할 때 import (서버 기동 시간 단축)
 
-vector_store = VectorStore()
-embeddings = vector_store.embeddings
-text_splitter = vector_store.text_splitter
+# 대화 맥락 검색 시 오늘 대화와 함께 볼 지난 기간(일), 0이면 오늘만
+HISTORY_SEARCH_DAYS = int(os.getenv("HISTORY_SEARCH_DAYS", 30))
+
+NO_EVENT_MESSAGE = "어제는 특별한 일정이 없었던 것 같네요. 평범한 하루를 어떻게 보내셨나요?"
+
+# 대화 진행 상태(남은 일정/현재 일정/직전 질문)를 메모리에 유지할 최대 사용자 수 (LRU)
+CHAT_SESSION_MAX_USERS = int(os.getenv("CHAT_SESSION_MAX_USERS", 1000))
+
+
+# 미리 검색한 결과는 검색에 쓴 질의(직전 질문)와 실제 답장의 임베딩 유사도가 이 값 이상일 때만 사용
+# (답장과 거리가 먼 질의로 찾은 맥락이 쓰이지 않도록, 1보다 크게 두면 미리 검색한 결과를 쓰지 않음)
+PREFETCH_MIN_SIMILARITY = float(os.getenv("PREFETCH_MIN_SIMILARITY", 0.75))
+
+# 대화 턴의 지난 대화 검색을 일정 검색과 동시에 실행할 스레드 수
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", 8))
+
+# 일정 검색 MMR: 가까운 후보 수와 관련도/다양성 가중치 (기존 retriever 기본값과 같음)
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", 20))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.5))
+
+
+def mmr_select(query_vector, vectors, k: int, lambda_mult: float = MMR_LAMBDA):
+    """MMR로 k개 후보 선택, (선택된 후보 인덱스 목록, 후보별 질의 코사인 유사도) 반환"""
+    import numpy as np
+
+    def normalize(x):
+        norms = np.linalg.norm(x, axis=-1, keepdims=True)
+        return x / np.where(norms == 0, 1, norms)
+
+    unit = normalize(vectors)
+    to_query = unit @ normalize(query_vector)
+    selected = [int(np.argmax(to_query))]
+    # 후보끼리의 유사도는 한 번에 계산해 두고, 이미 고른 것과의 최대 유사도만 갱신
+    redundancy = unit @ unit[selected[0]]
+    while len(selected) < min(k, len(vectors)):
+        scores = lambda_mult * to_query - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, unit @ unit[best])
+    return selected, to_query
 
 class ConversationHistory:
-    def __init__(self, embeddings, text_splitter):
-        self.embeddings = embeddings
-        self.text_splitter = text_splitter
-        self.history = {}
-        self.history_vectorstore = None
+    def __init__(self, vector_store: VectorStore = None):
+        # 임베딩/텍스트 분할기는 일정 VectorStore와 같은 것을 공유
+        self.vector_store = vector_store or get_vector_store()
+        # 사용자별 오늘 대화 (최근 턴 창 + 누적 요약, 사용자 수 제한)
+        self.context = ContextBuilder()
         self.base_index_path = "data/faiss"
         os.makedirs(self.base_index_path, exist_ok=True)
-
-    def get_history(self, user_id: str):
-        history_entries = self.history.get(user_id, [])
-        return " ".join([f"Bot: {entry['bot_question']} User: {entry['user_answer']}" for entry in history_entries])
+        # 임베딩/인덱스/JSON 저장은 응답 후 백그라운드에서 모아서 처리
+        self.writer = HistoryWriteBehind(
+            self._persist_batch, os.path.join(os.path.dirname(self.base_index_path), "spool")
+        )
+        # 사용자별 대화 인덱스 풀 (사용자별 락, 메모리에서 갱신하고 디스크 저장은 모아서 처리)
+        self.index_store = HistoryIndexStore(lambda: self.embeddings)
+        # 이 프로세스에서 대화 로그와 대조한 인덱스 경로 (저장 전 종료로 빠진 턴 복구용)
+        self._reconciled = set()
+        # 지난 날짜 대화는 사용자별 하나의 인덱스로 합쳐 기간으로 검색
+        self.rolling = RollingHistoryIndex(self.base_index_path, lambda: self.embeddings, self.index_store.user_lock)
+
+    @property
+    def embeddings(self):
+        return self.vector_store.embeddings
+
+    @property
+    def text_splitter(self):
+        return self.vector_store.text_splitter
+
+    # 오늘 대화 맥락 (이전 턴 요약 + 최근 턴, budget 토큰 이내)
+    def get_history(self, user_id: str, budget: int = CONTEXT_TOKEN_BUDGET):
+        today = datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d")
+        return self.context.build(user_id, today, budget)
     
     
     #날짜별 대화 저장 경로 생성
-    def _get_user_history_path(self, user_id: str) -> str:
-        date = datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d")
+    def _get_user_history_path(self, user_id: str, date: str = None) -> str:
+        date = date or datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d")
         user_path = os.path.join(self.base_index_path, user_id)
         history_path = os.path.join(user_path, "history", date)  
         os.makedirs(history_path, exist_ok=True)
         return history_path
     
     
-    #현재 날짜의 대화 인덱스 저장
+    #현재 날짜의 대화 인덱스 저장 (메모리에만 반영된 변경을 디스크에 씀)
     def save_index(self, user_id: str):
-        if self.history_vectorstore:
-            index_path = self._get_user_history_path(user_id)
-            self.history_vectorstore.save_local(index_path)
-            print(f"대화 기록이 {index_path}에 저장되었습니다.")
+        self.index_store.flush(self._get_user_history_path(user_id))
+
+
+    # 세션 종료 시 사용자의 미저장 대화 인덱스를 저장
+    def end_session(self, user_id: str):
+        self.index_store.flush(os.path.join(self.base_index_path, user_id, "history"))
    
    
-    #현재 날짜의 대화 인덱스 로드
+    #현재 날짜의 대화 인덱스 로드 (사용자별로 풀에 유지되며, 없으면 None)
     def load_index(self, user_id: str):
         try:
             index_path = self._get_user_history_path(user_id)
-            if os.path.exists(index_path):
-                self.history_vectorstore = FAISS.load_local(
-                    index_path, 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
+            history_index = self.index_store.get(user_id, index_path)
+            if history_index is not None:
                 print(f"사용자 {user_id}의 오늘 대화 기록을 로드했습니다.")
             else:
-                self.history_vectorstore = None
                 print(f"사용자 {user_id}의 오늘 대화 기록이 없습니다.")
+            return history_index
         except Exception as e:
             print(f"대화 기록 로드 중 오류 발생: {str(e)}")
-            self.history_vectorstore = None
+            return None
 
 
-    #대화 내용 저장
+    #대화 내용 저장 (메모리 세션은 바로 갱신하고 디스크/임베딩 저장은 지연)
     def add_conversation(self, user_id: str, bot_question: str, user_answer: str = None, event_info: dict = None, emotion_info: dict = None):
-        try:
-            if user_id not in self.history:
-                self.history[user_id] = []
-            
-            current_time = datetime.now(ZoneInfo("Asia/Seoul")).isoformat()
+        now = datetime.now(ZoneInfo("Asia/Seoul"))
+        record = {
+            "user_id": user_id,
+            "date": now.strftime("%Y%m%d"),
+            "bot_question": bot_question,
+            "user_answer": user_answer,
+            "event_info": event_info,
+            "emotion": emotion_info,
+            "timestamp": now.isoformat(),
+        }
+        with self.index_store.user_lock(user_id):
+            # 메모리 세션에는 오늘 대화의 최근 턴과 요약만 유지
+            self.context.add(user_id, record)
+            # 오늘 대화 폴더는 바로 만들어 /init-chat 판단이 저장 지연과 무관하도록 함
+            self._get_user_history_path(user_id, record["date"])
+        self.writer.submit(record)
+
+
+    # 모인 대화 턴을 사용자/날짜별로 한 번에 저장 (write-behind 스레드에서 호출)
+    # 일부 사용자/날짜만 실패하면 그 턴만 PartialPersistError로 알려 재시도하게 함
+    def _persist_batch(self, records):
+        groups = {}
+        for record in records:
+            groups.setdefault((record["user_id"], record["date"]), []).append(record)
+
+        failed = []
+        error = None
+        for (user_id, date), group in groups.items():
+            try:
+                self._persist_group(user_id, date, group)
+            except Exception as e:
+                print(f"대화 기록 저장 실패 ({user_id}, {date}): {str(e)}")
+                failed += group
+                error = e
+        if failed:
+            raise PartialPersistError(failed, str(error))
+
+
+    def _persist_group(self, user_id: str, date: str, group):
+        # 사용자별 락이므로 다른 사용자의 검색/저장은 기다리지 않음
+        with self.index_store.user_lock(user_id):
+            history_path = self._get_user_history_path(user_id, date)
+
+            if any(record.get("recovered") for record in group):
+                # 재시도/복구한 턴은 이미 로그에 저장됐을 수 있으므로 같은 시각의 턴은 건너뜀
+                # (로그에만 있고 인덱스에 없는 턴은 _index_conversations의 대조 단계에서 채움)
+                saved = {turn.get("timestamp") for turn in iter_conversations(history_path)}
+                unsaved = [record for record in group if record.get("timestamp") not in saved]
+                if len(unsaved) < len(group):
+                    # 로그에만 저장되고 인덱스에는 빠졌을 수 있으므로 대조를 다시 함
+                    self._reconciled.discard(os.path.abspath(history_path))
+                group = unsaved
+
+            # 대화 로그(JSONL)에 추가 (실패하면 이 그룹을 재시도하므로 인덱스보다 먼저 저장)
+            append_conversations(history_path, group)
 
             try:
-                combined_text = f"Bot: {bot_question} \n User: {user_answer}"
-                new_doc = Document(
-                    page_content=combined_text,
-                    metadata={
-                        "type": "conversation",
-                        "user_id": user_id,
-                        "event_info": event_info,
-                        "emotion": emotion_info,
-                        "timestamp": current_time
-                    }
-                )
-                split_docs = self.text_splitter.split_documents([new_doc])
-                if self.history_vectorstore is None:
-                    self.history_vectorstore = FAISS.from_documents(split_docs, self.embeddings)
-                else:
-                    self.history_vectorstore.add_texts(
-                        texts=[doc.page_content for doc in split_docs],
-                        metadatas=[doc.metadata for doc in split_docs]
-                    )
-                self.save_index(user_id)
+                self._index_conversations(user_id, history_path, group)
             except Exception as e:
                 print(f"FAISS 인덱스 업데이트 중 오류 발생 (무시됨): {str(e)}")
-                pass
-            
-            # JSON으로 대화 내용 저장
-            history_path = self._get_user_history_path(user_id)
-            json_path = os.path.join(history_path, "conversations.json")
-            conversations = []
-            if os.path.exists(json_path):
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    conversations = data.get('conversations', [])
-            
-            conversations.append({
-                'bot_question': bot_question,
-                'user_answer': user_answer,
-                'timestamp': current_time,
-                'event_info': event_info,
-                'emotion': emotion_info,
-                'metadata': {
+
+        print(f"✅ 대화 기록 {len(group)}건 저장 완료 ({user_id}, {date})")
+
+
+    def _documents(self, user_id: str, date: str, records):
+        from langchain.schema import Document
+
+        documents = [
+            Document(
+                page_content=f"Bot: {record['bot_question']} \n User: {record['user_answer']}",
+                metadata={
                     "type": "conversation",
                     "user_id": user_id,
-                    "event_info": event_info,
-                    "emotion": emotion_info,
-                    "timestamp": current_time
+                    "event_info": record.get("event_info"),
+                    "emotion": record.get("emotion"),
+                    "timestamp": record.get("timestamp"),
+                    "date": date
                 }
-            })
-            
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'conversations': conversations,
-                    'updated_at': current_time
-                }, f, ensure_ascii=False, indent=2)
-            
-            print(f"✅ 대화 기록 추가 완료")
-                
-        except Exception as e:
-            print(f"❌ 대화 기록 저장 중 오류 발생: {str(e)}")
-            # 주요 오류는 여전히 raise
-            raise e
+            )
+            for record in records
+        ]
+        return self.text_splitter.split_documents(documents)
+
+
+    # 대화 로그에는 있지만 디스크 인덱스에 없는 턴 (인덱스 저장 전에 프로세스가 종료된 경우)
+    def _unindexed_turns(self, user_id: str, history_path: str, records):
+        index = self.index_store.get(user_id, history_path)
+        indexed = set()
+        if index is not None:
+            indexed = {doc.metadata.get("timestamp") for doc in index.docstore._dict.values()}
+        skip = indexed | {record["timestamp"] for record in records}
+        return [turn for turn in iter_conversations(history_path) if turn.get("timestamp") not in skip]
+
+
+    # 대화 턴을 한 번의 임베딩 호출로 해당 날짜 인덱스에 추가 (디스크 저장은 index_store가 모아서 처리)
+    def _index_conversations(self, user_id: str, history_path: str, records):
+        key = os.path.abspath(history_path)
+        if key not in self._reconciled:
+            self._reconciled.add(key)
+            missing = self._unindexed_turns(user_id, history_path, records)
+            if missing:
+                print(f"인덱스에 없는 대화 {len(missing)}건 복구 ({history_path})")
+                records = missing + list(records)
+        if not records:
+            return
+
+        self.index_store.add(
+            user_id,
+            history_path, self._documents(user_id, os.path.basename(history_path), records), len(records)
+        )
+
+
+    # 오늘 대화 + 최근 days일 대화에서 query와 가까운 대화 검색 (날짜별 인덱스를 모두 열지 않음)
+    # with_scores면 (문서, 코사인 유사도) 목록, vector가 있으면 query를 다시 임베딩하지 않음
+    def search(self, user_id: str, query: str, k: int = 1, days: int = HISTORY_SEARCH_DAYS, with_scores: bool = False, vector=None):
+        now = datetime.now(ZoneInfo("Asia/Seoul"))
+        today = now.strftime("%Y%m%d")
+        history_root = os.path.join(self.base_index_path, user_id, "history")
+        paths = [os.path.join(history_root, today)]
+
+        since = None
+        if days > 0:
+            since = (now - timedelta(days=days)).strftime("%Y%m%d")
+            # 아직 합쳐지지 않은 최근 날짜 (보통 야간 작업 전의 어제 하루)
+            merged = self.rolling.merged_days(user_id)
+            if os.path.isdir(history_root):
+                paths += [
+                    os.path.join(history_root, day)
+                    for day in os.listdir(history_root)
+                    if since <= day < today and day not in merged
+                ]
+
+        paths = [
+            path for path in paths
+            if self.index_store.is_dirty(path) or os.path.exists(os.path.join(path, "index.faiss"))
+        ]
+        rolling_path = self.rolling.get_path(user_id)
+        if not paths and (since is None or not os.path.exists(rolling_path)):
+            return []
+
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+        results = []
+        for path in paths:
+            results += self.index_store.search(user_id, path, vector, k)
+        if since is not None:
+            results += self.rolling.search(user_id, vector, k, since)
+        # 같은 임베딩의 코사인 유사도이므로 인덱스가 달라도 점수를 그대로 비교
+        results.sort(key=lambda x: x[1], reverse=True)
+        if with_scores:
+            return results[:k]
+        return [doc for doc, _ in results[:k]]
+
+
+    # 지난 날짜 대화 인덱스를 사용자별 통합 인덱스로 합침 - 야간 작업에서 호출
+    def merge_history_days(self, user_ids, day: str):
+        before = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y%m%d")
+        moved = 0
+        for user_id in user_ids:
+            try:
+                # 메모리에만 있는 변경을 먼저 저장해야 합칠 때 빠지지 않음
+                self.index_store.flush(os.path.join(self.base_index_path, user_id, "history"))
+                moved += self.rolling.merge(user_id, before)
+            except Exception as e:
+                print(f"대화 인덱스 합치기 실패 ({user_id}): {str(e)}")
+        print(f"대화 인덱스 합치기 완료: {before} 이전, {moved}건")
+
+
+    # 하루치 대화 목록 (로그를 한 줄씩 읽고, 아직 저장 대기 중인 턴은 메모리 세션에서 보충)
+    def get_conversations(self, user_id: str, date: str):
+        history_path = os.path.join(self.base_index_path, user_id, "history", date)
+        conversations = list(iter_conversations(history_path))
+        saved = {conversation.get("timestamp") for conversation in conversations}
+        for entry in self.context.turns(user_id, date):
+            if entry["timestamp"] not in saved:
+                conversations.append(compact_record(entry))
+        return conversations
+
+
+    # 지난 날짜 대화 로그 정리 (이전 형식 병합, 손상된 줄 제거) - 야간 작업에서 호출
+    def compact_day(self, user_ids, day: str):
+        date = day.replace("-", "")
+        compacted = 0
+        for user_id in user_ids:
+            history_path = os.path.join(self.base_index_path, user_id, "history", date)
+            try:
+                if os.path.isdir(history_path):
+                    compact_conversations(history_path)
+                    compacted += 1
+            except Exception as e:
+                print(f"대화 로그 압축 실패 ({user_id}, {date}): {str(e)}")
+        print(f"대화 로그 압축 완료: {date}, {compacted}명")
 
 
     def delete_conversation_history(self, user_id: str):
-        try:
-            index_path = self._get_user_history_path(user_id)
-            if os.path.exists(index_path):
-                shutil.rmtree(index_path)
-                self.history_vectorstore = None
-                print(f"사용자 {user_id}의 대화 기록이 삭제되었습니다.")
-            else:
-                print(f"사용자 {user_id}의 대화 기록이 존재하지 않습니다.")
+        # 저장 대기 중인 턴이 삭제 후에 다시 기록되지 않도록 먼저 저장을 마침
+        self.writer.flush(timeout=30)
+        with self.index_store.user_lock(user_id):
+            try:
+                self.context.pop(user_id)
+                index_path = os.path.join(self.base_index_path, user_id, "history", datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d"))
+                self._reconciled.discard(os.path.abspath(index_path))
+                if self.index_store.delete(user_id, index_path):
+                    print(f"사용자 {user_id}의 대화 기록이 삭제되었습니다.")
+                else:
+                    print(f"사용자 {user_id}의 대화 기록이 존재하지 않습니다.")
                 
-        except Exception as e:
-            print(f"대화 기록 삭제 중 오류 발생: {str(e)}")
-            raise e
+            except Exception as e:
+                print(f"대화 기록 삭제 중 오류 발생: {str(e)}")
+                raise e
 
 
     
     
-class LLMService:
+class ChatSession:
+    """사용자 한 명의 대화 진행 상태 (같은 사용자의 요청은 lock으로 한 번에 하나씩 처리)"""
+
     def __init__(self):
-        self.vector_store = vector_store
-        self.embeddings = embeddings
-        self.llm = ChatOpenAI(model="gpt-4", temperature=0.8,openai_api_key=os.getenv("OPENAI_API_KEY"))
         self.remaining_events = []  # 남은 일정 저장
         self.current_event = None   # 현재 대화 중인 일정
+        self.current_question = None  # 사용자가 답할 직전 질문
+        self.lock = threading.RLock()
+
+
+class LLMService:
+    def __init__(self, vector_store: VectorStore = None):
+        self.vector_store = vector_store or get_vector_store()
+        # 사용자별 대화 진행 상태 (여러 사용자의 /chat이 동시에 실행되므로 인스턴스에 두지 않음)
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        # 어제 일정 순서와 첫 질문을 미리 만들어 둔 사용자별 기록
+        self.agenda = DailyAgenda(self.vector_store, self.event_question, NO_EVENT_MESSAGE)
+        # 다음 답장에 쓸 검색 결과를 사용자별로 미리 계산해 두는 캐시
+        self.prefetch = PrefetchCache()
+        # 일정 검색과 동시에 돌릴 지난 대화 검색용
+        self._retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+
+    # 모델 클라이언트는 첫 요청 때 생성
+    @property
+    def embeddings(self):
+        return self.vector_store.embeddings
+
+    @property
+    def llm(self):
+        return llm_clients.chat_model("gpt-4", temperature=0.8)
     
     # 감정점수를 텍스트로 변환
     def get_emotion_text(self, emotion_score: int) -> str:
@@ -175,58 +388,87 @@ class LLMService:
         return emotion_dict.get(emotion_score, "감정을 표현하지 않으셨습니다")
     
     
-    # 다음 일정에 대한 질문 생성
-    def get_next_event_question(self) -> str:
-        if not self.remaining_events:
-            return None
-        
-        event = self.remaining_events.pop(0)
-        self.current_event = event.metadata.get("original_event", {})
-        event_summary = self.current_event.get("summary", "")
-        emotion_score = self.current_event.get("emotion_score", 0)
-        print(f"현재 일정: {event_summary}, 감정 점수: {emotion_score}")  # 디버깅용
-        
+    # 일정에 대한 질문 (감정 점수가 있으면 함께 언급)
+    def event_question(self, event: dict) -> str:
+        event_summary = event.get("summary", "")
+        emotion_score = event.get("emotion_score", 0)
         if emotion_score > 0:
             emotion_text = self.get_emotion_text(emotion_score)
             return f"어제의 {event_summary} 일정에 대해 {emotion_text}고 하셨는데, 왜 그렇게 생각하셨나요?"
         return f"어제의 {event_summary} 일정은 어떠셨나요?"
 
 
+    def session(self, user_id: str) -> ChatSession:
+        """사용자의 대화 진행 상태 (없으면 생성, 오래 안 쓴 사용자부터 제거)"""
+        with self._sessions_lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                session = self._sessions[user_id] = ChatSession()
+            self._sessions.move_to_end(user_id)
+            while len(self._sessions) > CHAT_SESSION_MAX_USERS:
+                self._sessions.popitem(last=False)
+            return session
+
+
+    # 다음 일정에 대한 질문 생성
+    def get_next_event_question(self, session: ChatSession) -> str:
+        if not session.remaining_events:
+            return None
+        
+        session.current_event = session.remaining_events.pop(0)
+        print(f"현재 일정: {session.current_event.get('summary', '')}, 감정 점수: {session.current_event.get('emotion_score', 0)}")  # 디버깅용
+        return self.event_question(session.current_event)
+
+
+
+    @staticmethod
+    def _event_key(event: dict) -> str:
+        return event.get("id") or f"{event.get('summary', '')}@{event.get('start', '')}"
+
 
-    def ask_about_event(self, user_id: str) -> str:
+    # 다음 답장은 지금 질문한 일정에 대한 것이므로, 질문 내용으로 일정/대화 검색을 미리 실행
+    # 답장이 오면 질문과 답장의 임베딩 유사도를 확인한 뒤에만 사용 (generate_prompt_with_similarity)
+    def prefetch_retrieval(self, user_id: str, conversation_history, session: ChatSession):
+        if not session.current_event or not session.current_question:
+            return
+        self.prefetch.schedule(
+            user_id,
+            self._event_key(session.current_event),
+            self._prefetch_job,
+            session.current_question, conversation_history, user_id,
+        )
+
+
+    # (질의 임베딩, 검색 결과) - 답장과 비교할 수 있도록 질의 임베딩도 함께 보관
+    def _prefetch_job(self, question: str, conversation_history, user_id: str):
+        vector = self.embeddings.embed_query(question)
+        return vector, self.contextualized_retrieval_with_similarity(
+            question, conversation_history, user_id, 3, query_vector=vector
+        )
+
+
+
+    def ask_about_event(self, user_id: str, conversation_history=None) -> str:
         try:
-            #일정 저장의 날짜 파싱에 맞게 날짜 지정하기
-            yesterday = (datetime.now(ZoneInfo("Asia/Seoul")) - timedelta(days=1)).strftime("%Y-%m-%d") 
-            schedule_path = os.path.join("data", "faiss", user_id, "schedule")
-            schedule_faiss = FAISS.load_local(schedule_path,self.embeddings,allow_dangerous_deserialization=True)
-            all_events = schedule_faiss.docstore._dict.values()
-            
-            #어제 일정만 가지고 오기
-            self.remaining_events = [
-                event for event in all_events 
-                if event.metadata.get("original_event", {}).get("start", "").startswith(yesterday)
-            ]
-            self.remaining_events.sort(key=lambda x: x.metadata.get("original_event", {}).get("start", ""))
-            
-            if not self.remaining_events:
-                return "어제는 특별한 일정이 없었던 것 같네요. 평범한 하루를 어떻게 보내셨나요?"
-            
-            # 다음 일정 가져오기
-            event = self.remaining_events.pop(0)
-            self.current_event = event.metadata.get("original_event", {})
-            event_summary = self.current_event.get("summary", "")
-            emotion_score = self.current_event.get("emotion_score", 0)
-            print(f"대화에서 사용될 현재 일정: {event_summary}, 감정 점수: {emotion_score}")  # 디버깅용
-            
-            # 감정 점수에 따른 질문 생성
-            if emotion_score > 0:
-                emotion_text = self.get_emotion_text(emotion_score)
-                question = f"어제의 {event_summary} 일정에 대해 {emotion_text}고 하셨는데, 왜 그렇게 생각하셨나요?"
-            else:
-                question = f"어제의 {event_summary} 일정은 어떠셨나요?"
-            
-            self.current_question = question
-            return question
+            # 자정 이후 미리 만들어 둔 어제 일정 기록을 조회 (없거나 일정이 바뀌었으면 지금 생성)
+            agenda = self.agenda.get(user_id)
+            if agenda is None:
+                raise FileNotFoundError(f"사용자 {user_id}의 일정 데이터가 없습니다.")
+
+            session = self.session(user_id)
+            with session.lock:
+                session.remaining_events = list(agenda["events"])
+                if not session.remaining_events:
+                    return agenda["question"]
+                
+                # 다음 일정 가져오기
+                session.current_event = session.remaining_events.pop(0)
+                print(f"대화에서 사용될 현재 일정: {session.current_event.get('summary', '')}, 감정 점수: {session.current_event.get('emotion_score', 0)}")  # 디버깅용
+                
+                session.current_question = agenda["question"]
+                if conversation_history is not None:
+                    self.prefetch_retrieval(user_id, conversation_history, session)
+                return session.current_question
 
         except Exception as e:
             print(f"Error in ask_about_event: {str(e)}")
@@ -238,7 +480,8 @@ class LLMService:
     def retrieve_documents_with_similarity(self, query: str, user_id: str, top_k: int = 1):
         print(f"\n=== 일정 검색 시작 ===")
         print(f"사용자 ID: {user_id}")
-        query_vector = self.embeddings.embed_query(query)
+        import numpy as np
+
         schedule_faiss = self.vector_store.load_index(user_id)
         
         if schedule_faiss is None:
@@ -246,14 +489,21 @@ class LLMService:
             return []
         
         print(f"✅ 일정 데이터 로드 성공")
-        retriever = schedule_faiss.as_retriever(search_type="mmr", search_kwargs={'k': top_k})
-        result_docs = retriever.invoke(query)
+        # 질의 임베딩은 한 번만 하고, 후보 문서 벡터는 인덱스에 저장된 것을 그대로 사용
+        query_vector = np.array(self.embeddings.embed_query(query), dtype=np.float32)
+        fetch_k = min(max(MMR_FETCH_K, top_k), schedule_faiss.index.ntotal)
+        if fetch_k <= 0:
+            return []
+        _, indices = schedule_faiss.index.search(query_vector.reshape(1, -1), fetch_k)
+        candidates = [int(i) for i in indices[0] if i != -1]
+        vectors = np.vstack([schedule_faiss.index.reconstruct(i) for i in candidates])
+        selected, similarities = mmr_select(query_vector, vectors, top_k)
         results_with_similarity = []
 
         print("\n--- 검색된 일정 ---")
-        for doc in result_docs:
-            doc_vector = self.embeddings.embed_query(doc.page_content)
-            similarity = cosine_similarity([query_vector], [doc_vector])[0][0]
+        for position in selected:
+            doc = schedule_faiss.docstore.search(schedule_faiss.index_to_docstore_id[candidates[position]])
+            similarity = float(similarities[position])
             results_with_similarity.append((doc, similarity))
             print(f"일정: {doc.page_content}")
             print(f"유사도: {similarity:.4f}")
@@ -264,196 +514,126 @@ class LLMService:
     
     
 
-    def contextualized_retrieval_with_similarity(self, user_question: str, conversation_history, user_id: str, top_k: int = 1):
-        context = conversation_history.get_history(user_id)
-        if conversation_history.history_vectorstore:
-            relevant_docs = conversation_history.history_vectorstore.similarity_search(user_question, k=top_k)
-            if relevant_docs:
-                context += "\n\n" + "\n".join([doc.page_content for doc in relevant_docs])
+    # 지난 대화 검색과 일정 검색을 동시에 실행하고 유사도 순으로 합침
+    # query_vector는 user_question의 임베딩 (이미 계산했으면 지난 대화 검색에서 재사용)
+    def contextualized_retrieval_with_similarity(self, user_question: str, conversation_history, user_id: str, top_k: int = 1, query_vector=None):
+        with RETRIEVAL_STAGE_SECONDS.time(stage="total"):
+            def search_history():
+                with RETRIEVAL_STAGE_SECONDS.time(stage="history"):
+                    return conversation_history.search(
+                        user_id, user_question, k=top_k, with_scores=True, vector=query_vector
+                    )
+
+            history_future = self._retrieval_pool.submit(search_history)
+
+            # 일정 검색 질의는 오늘 대화 맥락 + 질문 (임베딩 질의 길이는 예산 안으로 유지)
+            context = trim_to_tokens(conversation_history.get_history(user_id), CONTEXT_TOKEN_BUDGET, keep_end=True)
+            with RETRIEVAL_STAGE_SECONDS.time(stage="schedule"):
+                schedule_results = self.retrieve_documents_with_similarity(f"{context} {user_question}", user_id, top_k)
 
-        enhanced_question = f"{context} {user_question}"
-        main_results_with_similarity = self.retrieve_documents_with_similarity(enhanced_question, user_id, top_k)
-        return main_results_with_similarity
+            try:
+                history_results = history_future.result()
+            except Exception as e:
+                # 지난 대화 검색이 실패해도 일정 검색 결과로 답변
+                print(f"지난 대화 검색 실패 (무시됨): {str(e)}")
+                history_results = []
+
+        # 같은 임베딩 모델의 코사인 유사도이므로 그대로 합쳐 정렬
+        fused = {}
+        for doc, similarity in schedule_results + history_results:
+            if doc.page_content not in fused or fused[doc.page_content][1] < similarity:
+                fused[doc.page_content] = (doc, similarity)
+        return sorted(fused.values(), key=lambda x: x[1], reverse=True)
 
 
 
 
     def generate_prompt_with_similarity(self, user_input: str, conversation_history, user_id: str):
-        results_with_similarity = self.contextualized_retrieval_with_similarity(
-            user_input, conversation_history, user_id, top_k=3
-        )
+        current_event = self.session(user_id).current_event
+        # 직전 응답 후 미리 검색해 둔 결과가 있으면 사용 (없거나 만료됐으면 지금 검색)
+        results_with_similarity = None
+        query_vector = None
+        prefetched = self.prefetch.take(user_id, self._event_key(current_event)) if current_event else None
+        if prefetched is not None:
+            import numpy as np
+
+            # 미리 검색한 질의는 직전 질문이므로, 실제 답장과 충분히 가까울 때만 그 결과를 씀
+            prefetch_vector, prefetch_results = prefetched
+            query_vector = self.embeddings.embed_query(user_input)
+            a = np.asarray(query_vector, dtype=np.float32)
+            b = np.asarray(prefetch_vector, dtype=np.float32)
+            norms = float(np.linalg.norm(a) * np.linalg.norm(b))
+            matched = norms > 0 and float(a @ b) / norms >= PREFETCH_MIN_SIMILARITY
+            record_cache("retrieval_prefetch_match", matched)
+            if matched:
+                results_with_similarity = prefetch_results
+        if results_with_similarity is None:
+            results_with_similarity = self.contextualized_retrieval_with_similarity(
+                user_input, conversation_history, user_id, top_k=3, query_vector=query_vector
+            )
         context = "\n\n".join([f"{doc.page_content} (유사도: {similarity:.4f})" for doc, similarity in results_with_similarity])
-        if self.current_event:
-            context += f"\n\n현재 대화 중인 일정: {self.current_event.get('summary')}"
+        if current_event:
+            context += f"\n\n현재 대화 중인 일정: {current_event.get('summary')}"
         
         
         
         
 
-        prompts = ChatPromptTemplate.from_messages([
-            ("system", """
-                # 대화형 회고 AI 심리 상담사 프롬프트
+        # 미리 만든 템플릿 재사용 (고정 지시문이 맨 앞이라 제공자 프리픽스 캐시 적용)
+        return chat_prompt(), context
 
-                ## 핵심 규칙
-                - 한 번에 한 일정만 질문하고 응답 기다리기 
-                - 사용자 응답 후에만 다음 일정으로 넘어가기
-                - 자연스러운 대화 흐름 유지하기 
-                - 사용자의 응답에 진정성 있게 반응하기 
-                
-                ## 대화 흐름
-                1. 간단한 인사 + 첫 번째 일정에 대한 자연스러운 질문 
-                2. (사용자 응답 기다림)
-                3. 공감적 반응과 전환구 + 줄바꿈 + 다음 일정 질문
-                4. (사용자 응답 기다림)
-                5. 이런 식으로 모든 일정을 순차적으로 진행
-                6. 마지막 일정 응답에 대한 반응 + 간단한 마무리
-                
-                ## 가독성 높은 메시지 구조 // 톤앤매너 
-                - 공감적 반응과 전환구는 함께 한 문단으로 작성
-                - 다음 일정에 대한 질문 전에 줄바꿈 넣기
-                - 첫 일정 소개 시에도 인사와 소개 후 줄바꿈 후 질문
-                - 모바일에서 읽기 쉽도록 한 줄당 글자 수 제한 (30-40자)
-                - 마지막 일정 후 회고 요약도 줄바꿈으로 구분
-                
-                ## 메시지 구성 예시
-                ```
-                안녕하세요! 오늘은 2월 18일에 했던 일정들에 대해 얘기해볼게요.
-                
-                아침에 했던 걷기 운동이 정말 즐거웠다고 하셨네요! 어떤 점이 특별히 좋았어요? 🚶‍♀️
-                ```
-                
-                ```
-                산책하면서 들으신 팟캐스트가 재밌었군요! 아침부터 기분 좋게 시작하는 습관이 정말 멋져요.
-                
-                이제 오전에 했던 '유튜브, 클래스, 이메일, 쇼핑몰 확인'에 대해 얘기해볼까요? 어떤 일들이 있었나요? 💻
-                ```
-                
-                ## 자연스러운 질문 가이드
-                - 시간과 감정 정보를 부담스럽지 않게 자연스럽게 언급하기
-                - "~했던 것이라서", "~라고 기록하셨네요"와 같은 형식적 표현 피하기
-                - 짧고 간결한 문장으로 질문하기
-                - 사용자가 자연스럽게 회고할 수 있는 열린 질문하기
-                
-                ## 종료 처리
-                - 마지막 일정에 대한 반응 작성
-                - 줄바꿈 후 전체 회고에 대한 간단한 요약과 긍정적 마무리
-                - 백엔드 전용 데이터는 HTML 주석으로 숨기기: <!-- REFLECTION_COMPLETE -->
-                
-                ## 주의사항
-                - 기계적/형식적 표현 사용하지 않기
-                - 공감적 반응과 전환구는 함께 작성하고, 다음 일정 질문 전에 줄바꿈 사용하기
-                - 한 문단을 너무 길게 쓰지 않기
-                - 자연스러운 대화 흐름 유지하기
-                - 모든 일정 질문 전에 일관되게 줄바꿈 사용하여 가독성 유지하기
-                
-                
-                ### **Interactive Reflection AI Psychological Counselor Prompt**
 
-                ## **Core Rules**
-                - Ask about one event at a time and wait for the user's response.  
-                - Move to the next event only after the user replies.  
-                - Maintain a natural conversation flow.  
-                - Respond genuinely to the user's input.  
-                
-                ## **Conversation Flow**
-                1. Start with a friendly greeting + natural question about the first event.  
-                2. *(Wait for user response)*  
-                3. Provide an empathetic response + smooth transition + line break + next question.  
-                4. *(Wait for user response)*  
-                5. Repeat the process for all events.  
-                6. After the last response, summarize and wrap up the session.  
-                
-                ## **Readable Message Structure // Tone & Manner**
-                - Combine empathetic responses and transitions in a single paragraph.  
-                - Always insert a line break before asking about the next event.  
-                - After the greeting and introduction, add a line break before the first question.  
-                - Keep each line within **30–40 characters** for mobile-friendly readability.  
-                - Clearly separate the summary at the end with a line break.  
-                
-                ## **Message Example**
-                ```
-                Hello! Let's talk about what you did on February 18.  
-                
-                I heard you really enjoyed your morning walk!  
-                What made it particularly special? 🚶‍♀️
-                ```
-                
-                ```
-                Listening to a fun podcast on your walk  
-                sounds like a great way to start the day!  
-                
-                Now, let's talk about your morning tasks:  
-                You checked YouTube, class updates, emails,  
-                and your shopping mall. How did that go? 💻
-                ```
-                
-                ## **Natural Question Guidelines**
-                - Mention time and emotions naturally without making it feel forced.  
-                - Avoid rigid phrases like "**You recorded that you did~**".  
-                - Keep questions short and concise.  
-                - Use open-ended questions to encourage natural reflection.  
-                
-                ## **Closing Process**
-                - Respond to the last event shared.  
-                - Add a line break, then provide a **brief summary** of the reflection.  
-                - End with a **positive closing statement**.  
-                - Hide backend-related data using HTML comments: `<!-- REFLECTION_COMPLETE -->`  
-                
-                ## **Important Notes**
-                - Avoid mechanical or overly formal expressions.  
-                - Keep empathetic responses and transitions in one paragraph,  
-                  but always insert a line break before the next question.  
-                - Ensure each paragraph isn't too long.  
-                - Maintain a **natural** and **engaging** conversation flow.  
-                - Keep **consistent line breaks** before every event question for readability.
 
-                
-                ---
-                CONTEXT:
-                {context}
-            """),
-            ("human", "{input}")
-        ])
-        return prompts, context
 
 
+    def generate_answer_with_similarity(self, user_input: str, conversation_history, user_id: str, current_event: dict = None):
+        session = self.session(user_id)
+        try:
+            # 같은 사용자의 요청은 한 번에 하나씩 (직전 질문/남은 일정이 섞이지 않도록)
+            with session.lock:
+                if session.current_question:
+                    emotion_score = session.current_event.get("emotion_score", 0) if session.current_event else 0
+                    emotion_info = {
+                        "score": emotion_score,
+                        "text": self.get_emotion_text(emotion_score)
+                    }
+                    
+                    conversation_history.add_conversation(
+                        user_id=user_id,
+                        bot_question=session.current_question,
+                        user_answer=user_input,
+                        event_info=session.current_event,
+                        emotion_info=emotion_info
+                    )
 
+                # 다음 응답 생성
+                prompts, context = self.generate_prompt_with_similarity(user_input, conversation_history, user_id)
+                chain = prompts | self.llm
 
+                def call_llm():
+                    with track_llm_call("chat", self.llm.model_name) as call:
+                        message = chain.invoke({"input": user_input, "context": context})
+                        call.record_usage(message)
+                    return message.content
 
-    def generate_answer_with_similarity(self, user_input: str, conversation_history, user_id: str, current_event: dict = None):
-        try:
-            if hasattr(self, 'current_question') and self.current_question:
-                emotion_score = self.current_event.get("emotion_score", 0) if self.current_event else 0
-                emotion_info = {
-                    "score": emotion_score,
-                    "text": self.get_emotion_text(emotion_score)
-                }
-                
-                conversation_history.add_conversation(
-                    user_id=user_id,
-                    bot_question=self.current_question,
-                    user_answer=user_input,
-                    event_info=self.current_event,
-                    emotion_info=emotion_info
+                # 같은 맥락에서 같은(또는 비슷한) 질문이면 이전 응답 재사용 (RESPONSE_CACHE_SITES에 chat이 있을 때만)
+                response = response_cache.get_or_call(
+                    "chat", self.llm.model_name, context, call_llm, scope=user_id, query=user_input
                 )
-
-            # 다음 응답 생성
-            prompts, context = self.generate_prompt_with_similarity(user_input, conversation_history, user_id)
-            chain = prompts | self.llm | StrOutputParser()
-            response = chain.invoke({"input": user_input, "context": context})
-            
-            # 다음 질문 확인 및 저장
-            next_question = self.get_next_event_question()
-            if next_question:
-                response = response + "\n\n" + next_question
-                self.current_question = next_question 
-            elif not next_question :
-                response = response + "\n\n모든 일정에 대해 이야기를 나눴네요. 이제 다른 이야기를 해볼까요?"
-                self.current_question = response
-            else:
-                self.current_question = response
-            
-            return response
+                
+                # 다음 질문 확인 및 저장
+                next_question = self.get_next_event_question(session)
+                if next_question:
+                    response = response + "\n\n" + next_question
+                    session.current_question = next_question 
+                    self.prefetch_retrieval(user_id, conversation_history, session)
+                elif not next_question :
+                    response = response + "\n\n모든 일정에 대해 이야기를 나눴네요. 이제 다른 이야기를 해볼까요?"
+                    session.current_question = response
+                else:
+                    session.current_question = response
+                
+                return response
             
         except Exception as e:
             print(f"Error in generate_answer: {str(e)}")
@@ -0,0 +1,149 @@
+import asyncio
+import itertools
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
+
+try:
+    from app.metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT_SECONDS, LLM_JOBS_RUNNING, LLM_QUEUE_TIMEOUTS_TOTAL
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT_SECONDS, LLM_JOBS_RUNNING, LLM_QUEUE_TIMEOUTS_TOTAL
+
+# 우선순위: 대화(INTERACTIVE)가 리포트/페르소나 생성(BACKGROUND)보다 먼저 실행
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+_PRIORITY_RANK = {INTERACTIVE: 0, BACKGROUND: 1}
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_MAX_PER_USER = int(os.getenv("LLM_MAX_PER_USER", 1))
+# 백그라운드 작업이 동시에 차지할 수 있는 최대 슬롯 수 (나머지는 대화용으로 남겨둠)
+LLM_MAX_BACKGROUND = int(os.getenv("LLM_MAX_BACKGROUND", 4))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 120))
+
+
+class LLMQueueTimeout(Exception):
+    pass
+
+
+class _Waiter:
+    def __init__(self, rank: int, seq: int, user_id: str, priority: str, future: asyncio.Future):
+        self.rank = rank
+        self.seq = seq
+        self.user_id = user_id
+        self.priority = priority
+        self.future = future
+
+
+class LLMScheduler:
+    """LLM 작업 실행 스케줄러
+
+    전체/사용자별 동시 실행 수를 제한하고, 대기 중인 작업은 우선순위와 도착 순서대로
+    실행한다. 슬롯을 받은 작업만 전용 스레드 풀에서 실행하므로 대기 중인 작업이
+    스레드를 점유하지 않는다.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_per_user: int = LLM_MAX_PER_USER,
+        max_background: int = LLM_MAX_BACKGROUND,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.max_background = min(max_background, max_concurrency)
+        self.queue_timeout = queue_timeout
+        self._waiters = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._running_by_priority = defaultdict(int)
+        self._running_by_user = defaultdict(int)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    def _allowed(self, user_id: str, priority: str) -> bool:
+        if self._running >= self.max_concurrency:
+            return False
+        if priority == BACKGROUND and self._running_by_priority[BACKGROUND] >= self.max_background:
+            return False
+        if user_id and self._running_by_user[user_id] >= self.max_per_user:
+            return False
+        return True
+
+    def _dispatch(self):
+        # 우선순위 → 도착 순서로 훑으면서 실행 가능한 작업에 슬롯 배정
+        for waiter in sorted(self._waiters, key=lambda w: (w.rank, w.seq)):
+            if waiter.future.done():
+                continue
+            if self._allowed(waiter.user_id, waiter.priority):
+                self._waiters.remove(waiter)
+                LLM_QUEUE_DEPTH.dec(priority=waiter.priority)
+                self._take(waiter.user_id, waiter.priority)
+                waiter.future.set_result(None)
+
+    def _take(self, user_id: str, priority: str):
+        self._running += 1
+        self._running_by_priority[priority] += 1
+        if user_id:
+            self._running_by_user[user_id] += 1
+        LLM_JOBS_RUNNING.inc(priority=priority)
+
+    def release(self, user_id: str, priority: str):
+        self._running -= 1
+        self._running_by_priority[priority] -= 1
+        if user_id:
+            self._running_by_user[user_id] -= 1
+            if self._running_by_user[user_id] <= 0:
+                del self._running_by_user[user_id]
+        LLM_JOBS_RUNNING.dec(priority=priority)
+        self._dispatch()
+
+    async def acquire(self, user_id: str = None, priority: str = INTERACTIVE):
+        start = time.perf_counter()
+        if not self._waiters and self._allowed(user_id, priority):
+            self._take(user_id, priority)
+            LLM_QUEUE_WAIT_SECONDS.observe(0, priority=priority)
+            return
+
+        waiter = _Waiter(
+            _PRIORITY_RANK[priority], next(self._seq), user_id, priority,
+            asyncio.get_running_loop().create_future(),
+        )
+        self._waiters.append(waiter)
+        LLM_QUEUE_DEPTH.inc(priority=priority)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout or None)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 슬롯을 받은 직후 취소된 경우 슬롯 반납
+                self.release(user_id, priority)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                LLM_QUEUE_DEPTH.dec(priority=priority)
+                self._dispatch()
+            if isinstance(e, asyncio.TimeoutError):
+                LLM_QUEUE_TIMEOUTS_TOTAL.inc(priority=priority)
+                raise LLMQueueTimeout("LLM 요청이 많아 처리 대기 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.")
+            raise
+        finally:
+            LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - start, priority=priority)
+
+    async def run(self, fn: Callable, *args, user_id: str = None, priority: str = INTERACTIVE):
+        """슬롯을 받은 뒤 fn(*args)를 LLM 전용 스레드에서 실행"""
+        await self.acquire(user_id, priority)
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor, partial(fn, *args))
+        except BaseException:
+            self.release(user_id, priority)
+            raise
+        # 요청이 취소돼도 스레드 작업이 끝날 때 슬롯을 반납
+        future.add_done_callback(lambda _: self.release(user_id, priority))
+        return await asyncio.shield(future)
+
+
+llm_scheduler = LLMScheduler()
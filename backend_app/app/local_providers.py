@@ -0,0 +1,144 @@
+import hashlib
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+try:
+    from app.context_builder import count_tokens, trim_to_tokens
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from context_builder import count_tokens, trim_to_tokens
+
+# API 키 없이 결정적으로 동작하는 로컬 LLM/임베딩 (LLM_PROVIDER / EMBEDDING_PROVIDER=local)
+# 실제 모델 대신 코드 경로의 부하/성능을 측정하기 위한 용도
+
+# 임베딩 차원 (Upstage embedding-query와 같음)
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", 4096))
+# 임베딩 호출 한 번의 지연(초)
+LOCAL_EMBEDDING_LATENCY = float(os.getenv("LOCAL_EMBEDDING_LATENCY", 0))
+# 응답 방식: template (LOCAL_LLM_TEMPLATE의 {input}/{model}을 채움) 또는 echo (마지막 사용자 메시지를 그대로 반환)
+LOCAL_LLM_MODE = os.getenv("LOCAL_LLM_MODE", "template").lower()
+LOCAL_LLM_TEMPLATE = os.getenv(
+    "LOCAL_LLM_TEMPLATE", "말씀해 주셔서 고마워요. \"{input}\"에 대해 조금 더 이야기해 주실 수 있을까요?"
+)
+# 호출 한 번의 기본 지연(초)과 응답 토큰당 추가 지연(초)
+LOCAL_LLM_LATENCY = float(os.getenv("LOCAL_LLM_LATENCY", 0))
+LOCAL_LLM_LATENCY_PER_TOKEN = float(os.getenv("LOCAL_LLM_LATENCY_PER_TOKEN", 0))
+# template 모드에서 {input}에 넣을 사용자 메시지 최대 길이(토큰)
+LOCAL_LLM_INPUT_TOKENS = int(os.getenv("LOCAL_LLM_INPUT_TOKENS", 200))
+
+
+class HashEmbeddings(Embeddings):
+    """단어와 글자 3-gram을 해시해 고정 차원에 누적한 결정적 임베딩
+
+    같은 텍스트는 항상 같은 벡터가 되고, 겹치는 단어/글자가 많을수록 코사인
+    유사도가 높아지므로 검색 경로를 실제와 비슷한 모양으로 돌려볼 수 있다.
+    """
+
+    def __init__(self, dimension: int = LOCAL_EMBEDDING_DIM, latency: float = LOCAL_EMBEDDING_LATENCY):
+        self.dimension = dimension
+        self.latency = latency
+
+    def _features(self, text: str) -> List[str]:
+        words = text.lower().split()
+        joined = " ".join(words)
+        return words + [joined[i:i + 3] for i in range(max(len(joined) - 2, 0))]
+
+    def _embed(self, text: str) -> List[float]:
+        import numpy as np
+
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in self._features(text or ""):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimension] += 1.0 if digest >> 63 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm == 0:
+            # 빈 텍스트도 0 벡터가 되지 않도록 (코사인 계산용)
+            vector[0] = norm = 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+
+def local_completion(model: str, messages: List[Tuple[str, str]], max_tokens: Optional[int] = None) -> Tuple[str, int, int]:
+    """(역할, 내용) 메시지 목록에 대한 로컬 응답, (응답, 프롬프트 토큰 수, 응답 토큰 수) 반환"""
+    user_input = next((content for role, content in reversed(messages) if role in ("user", "human")), "")
+    if LOCAL_LLM_MODE == "echo":
+        content = user_input
+    else:
+        content = LOCAL_LLM_TEMPLATE.format(
+            input=trim_to_tokens(" ".join(user_input.split()), LOCAL_LLM_INPUT_TOKENS),
+            model=model,
+        )
+    if max_tokens:
+        content = trim_to_tokens(content, max_tokens)
+
+    prompt_tokens = sum(count_tokens(text) for _, text in messages)
+    completion_tokens = count_tokens(content)
+    latency = LOCAL_LLM_LATENCY + LOCAL_LLM_LATENCY_PER_TOKEN * completion_tokens
+    if latency:
+        time.sleep(latency)
+    return content, prompt_tokens, completion_tokens
+
+
+class LocalChatModel(BaseChatModel):
+    """ChatOpenAI 대신 쓰는 로컬 채팅 모델 (local_completion으로 응답)"""
+
+    model_name: str = "local"
+    temperature: float = 0.7
+    max_tokens: Optional[int] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "local"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        content, prompt_tokens, completion_tokens = local_completion(
+            self.model_name, [(message.type, str(message.content)) for message in messages], self.max_tokens
+        )
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class LocalOpenAIClient:
+    """OpenAI 클라이언트의 chat.completions.create만 흉내 내는 로컬 클라이언트"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model: str, messages: List[dict], max_tokens: int = None, **kwargs):
+        content, prompt_tokens, completion_tokens = local_completion(
+            model, [(message.get("role", ""), str(message.get("content", ""))) for message in messages], max_tokens
+        )
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, finish_reason="stop", message=SimpleNamespace(role="assistant", content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+    def close(self):
+        pass
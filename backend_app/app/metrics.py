@@ -0,0 +1,451 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 프로메테우스 텍스트 포맷(0.0.4)으로 노출하는 프로세스 내 메트릭 저장소
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return f"{int(value)}"
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: 라벨이 일치하지 않습니다 {sorted(labels)} != {sorted(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def items(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, value in sorted(self.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), collect: Callable[[], Dict[Tuple[str, ...], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # collect가 지정되면 렌더링 시점에 값을 계산 (파생 지표용)
+        self._collect = collect
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        if self._collect is not None:
+            values = self._collect()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [버킷별 카운트..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * len(self.buckets) + [0.0, 0]
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += state[i]
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), collect=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, collect=collect))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# HTTP 요청
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "memyself_http_request_duration_seconds", "라우트별 HTTP 요청 처리 시간", ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "memyself_http_requests_in_flight", "라우트별 처리 중인 HTTP 요청 수", ["method", "route"]
+)
+
+# 임베딩 호출
+EMBEDDING_REQUESTS_TOTAL = REGISTRY.counter(
+    "memyself_embedding_requests_total", "임베딩 API 호출 수", ["model", "op", "status"]
+)
+EMBEDDING_SECONDS = REGISTRY.histogram(
+    "memyself_embedding_request_duration_seconds", "임베딩 API 호출 시간", ["model", "op"]
+)
+EMBEDDING_TEXTS_TOTAL = REGISTRY.counter(
+    "memyself_embedding_texts_total", "임베딩한 텍스트 수", ["model", "op"]
+)
+
+# LLM 호출
+LLM_REQUESTS_TOTAL = REGISTRY.counter(
+    "memyself_llm_requests_total", "LLM 호출 수", ["site", "model", "status"]
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "memyself_llm_request_duration_seconds", "LLM 호출 시간", ["site", "model"],
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+LLM_TOKENS_TOTAL = REGISTRY.counter(
+    "memyself_llm_tokens_total", "LLM 토큰 사용량", ["site", "model", "kind"]
+)
+
+# LLM 작업 스케줄러
+LLM_QUEUE_DEPTH = REGISTRY.gauge(
+    "memyself_llm_queue_depth", "LLM 실행 대기 중인 작업 수", ["priority"]
+)
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "memyself_llm_queue_wait_seconds", "LLM 실행 슬롯 대기 시간", ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+LLM_JOBS_RUNNING = REGISTRY.gauge(
+    "memyself_llm_jobs_running", "실행 중인 LLM 작업 수", ["priority"]
+)
+LLM_QUEUE_TIMEOUTS_TOTAL = REGISTRY.counter(
+    "memyself_llm_queue_timeouts_total", "대기 시간 초과로 거절된 LLM 작업 수", ["priority"]
+)
+
+# 외부 AI API 요청/토큰 한도
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram(
+    "memyself_rate_limit_wait_seconds", "요청/토큰 한도 때문에 대기한 시간", ["provider", "model"],
+    buckets=(0.001, 0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+PROVIDER_RETRIES_TOTAL = REGISTRY.counter(
+    "memyself_provider_retries_total", "외부 AI API 재시도 수", ["provider", "status"]
+)
+
+# FAISS 인덱스 입출력
+FAISS_LOAD_SECONDS = REGISTRY.histogram(
+    "memyself_faiss_load_duration_seconds", "FAISS 인덱스 로드 시간", ["kind"]
+)
+FAISS_SAVE_SECONDS = REGISTRY.histogram(
+    "memyself_faiss_save_duration_seconds", "FAISS 인덱스 저장 시간", ["kind"]
+)
+INDEX_CACHE_BYTES = REGISTRY.gauge(
+    "memyself_index_cache_bytes", "메모리에 올라온 FAISS 인덱스 추정 크기(바이트)"
+)
+INDEX_CACHE_EVICTIONS_TOTAL = REGISTRY.counter(
+    "memyself_index_cache_evictions_total", "메모리 한도로 내보낸 FAISS 인덱스 수", ["kind"]
+)
+
+# 대화 기록 지연 저장 (write-behind)
+HISTORY_WRITE_PENDING = REGISTRY.gauge(
+    "memyself_history_write_pending", "저장 대기 중인 대화 턴 수"
+)
+HISTORY_WRITE_BATCH_SECONDS = REGISTRY.histogram(
+    "memyself_history_write_batch_duration_seconds", "대화 기록 배치 저장 시간"
+)
+HISTORY_WRITE_FAILURES_TOTAL = REGISTRY.counter(
+    "memyself_history_write_failures_total", "대화 기록 배치 저장 실패 수"
+)
+RETRIEVAL_STAGE_SECONDS = REGISTRY.histogram(
+    "memyself_retrieval_stage_duration_seconds", "대화 턴 검색 단계별 시간", ["stage"]
+)
+HISTORY_INDEX_DIRTY_TURNS = REGISTRY.gauge(
+    "memyself_history_index_dirty_turns", "대화 기록 인덱스에 반영됐지만 디스크에 저장하지 않은 턴 수"
+)
+
+# 외부 API (Google 캘린더 등)
+UPSTREAM_REQUESTS_TOTAL = REGISTRY.counter(
+    "memyself_upstream_requests_total", "외부 API 호출 수", ["service", "op", "status"]
+)
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "memyself_upstream_request_duration_seconds", "외부 API 호출 시간", ["service", "op"]
+)
+
+# 리포트 생성 단계
+REPORT_STAGE_SECONDS = REGISTRY.histogram(
+    "memyself_report_stage_duration_seconds", "리포트 생성 단계별 소요 시간", ["generator", "stage"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+# 캐시
+CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "memyself_cache_requests_total", "캐시 조회 수", ["cache", "result"]
+)
+RESPONSE_CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "memyself_response_cache_requests_total", "LLM 응답 캐시 조회 수", ["site", "result"]
+)
+RESPONSE_CACHE_BYTES = REGISTRY.gauge(
+    "memyself_response_cache_bytes", "LLM 응답 캐시에 보관 중인 응답 추정 크기(바이트)"
+)
+RESPONSE_CACHE_EVICTIONS_TOTAL = REGISTRY.counter(
+    "memyself_response_cache_evictions_total", "LLM 응답 캐시에서 제거된 항목 수", ["reason"]
+)
+
+
+def _cache_hit_ratio() -> Dict[Tuple[str, ...], float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), value in CACHE_REQUESTS_TOTAL.items():
+        hit_total = totals.setdefault(cache, [0, 0])
+        if result == "hit":
+            hit_total[0] += value
+        hit_total[1] += value
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "memyself_cache_hit_ratio", "캐시 적중률", ["cache"], collect=_cache_hit_ratio
+)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS_TOTAL.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def usage_tokens(result) -> Tuple[int, int]:
+    """LangChain 메시지 또는 OpenAI 응답에서 (프롬프트, 완료) 토큰 수 추출"""
+    usage = getattr(result, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0) or 0, usage.get("output_tokens", 0) or 0
+
+    response_metadata = getattr(result, "response_metadata", None) or {}
+    token_usage = response_metadata.get("token_usage")
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0) or 0, token_usage.get("completion_tokens", 0) or 0
+
+    usage = getattr(result, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+    return 0, 0
+
+
+class LLMCall:
+    def __init__(self, site: str, model: str):
+        self.site = site
+        self.model = model
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record_usage(self, result):
+        prompt_tokens, completion_tokens = usage_tokens(result)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+
+@contextmanager
+def track_llm_call(site: str, model: str):
+    """LLM 호출 한 번의 횟수/시간/토큰 사용량 기록"""
+    call = LLMCall(site, model)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield call
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - start, site=site, model=model)
+        LLM_REQUESTS_TOTAL.inc(site=site, model=model, status=status)
+        if call.prompt_tokens:
+            LLM_TOKENS_TOTAL.inc(call.prompt_tokens, site=site, model=model, kind="prompt")
+        if call.completion_tokens:
+            LLM_TOKENS_TOTAL.inc(call.completion_tokens, site=site, model=model, kind="completion")
+
+
+@contextmanager
+def track_upstream(service: str, op: str):
+    """외부 API 호출 한 번의 횟수/시간 기록"""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, service=service, op=op)
+        UPSTREAM_REQUESTS_TOTAL.inc(service=service, op=op, status=status)
+
+
+def _route_template(scope) -> str:
+    """요청이 매칭될 라우트 템플릿 (라우팅 전이라 scope["route"]가 아직 없을 때 사용)"""
+    from starlette.routing import Match
+
+    partial = None
+    for route in getattr(getattr(scope.get("app"), "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+        if match == Match.PARTIAL and partial is None:
+            # 메서드만 다른 경우 (405 응답)
+            partial = getattr(route, "path", None)
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    """라우트별 요청 지연시간/동시 처리 수를 기록하는 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        # 경로 파라미터로 라벨이 늘어나지 않도록 라우트 템플릿 사용
+        in_flight_route = _route_template(scope)
+        with HTTP_REQUESTS_IN_FLIGHT.track_inprogress(method=method, route=in_flight_route):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                route_path = getattr(route, "path", in_flight_route)
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - start, method=method, route=route_path, status=str(status)
+                )
+
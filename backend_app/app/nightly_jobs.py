@@ -0,0 +1,66 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List
+from zoneinfo import ZoneInfo
+
+KST = ZoneInfo("Asia/Seoul")
+# 매일 이 시각(KST)에 대화 기록 야간 작업(어제 대화 로그 압축, 지난 날짜 인덱스 합치기)을 실행
+HISTORY_NIGHTLY_TIME = os.getenv("HISTORY_NIGHTLY_TIME", "00:10")
+# 어제 일정 기록 생성(AGENDA_PRECOMPUTE_ENABLED)과는 별도로 켜고 끔
+HISTORY_NIGHTLY_ENABLED = os.getenv("HISTORY_NIGHTLY_ENABLED", "true").lower() == "true"
+
+
+class NightlyJobs:
+    """매일 정해진 시각에 등록된 작업 fn(user_ids, day)를 차례로 실행하는 백그라운드 스레드
+
+    day는 어제 날짜(YYYY-MM-DD)이며, 기동 직후에도 한 번 실행해 재시작 전에 놓친
+    작업을 채운다. 한 작업이 실패해도 나머지 작업은 실행한다.
+    """
+
+    def __init__(self, name: str, run_time: str = HISTORY_NIGHTLY_TIME, enabled: bool = HISTORY_NIGHTLY_ENABLED):
+        self.name = name
+        self.run_time = run_time
+        self.enabled = enabled
+        self._jobs = []
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add(self, job: Callable[[List[str], str], None]):
+        self._jobs.append(job)
+
+    def _next_run(self, now: datetime) -> datetime:
+        hour, minute = (int(value) for value in self.run_time.split(":"))
+        run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return run_at
+
+    def run_once(self, user_ids: List[str], day: str = None):
+        day = day or (datetime.now(KST) - timedelta(days=1)).strftime("%Y-%m-%d")
+        for job in self._jobs:
+            try:
+                job(user_ids, day)
+            except Exception as e:
+                print(f"야간 작업 오류 ({self.name}, {getattr(job, '__name__', job)}): {str(e)}")
+
+    def _loop(self, get_user_ids: Callable[[], List[str]]):
+        while not self._stop.is_set():
+            try:
+                self.run_once(get_user_ids())
+            except Exception as e:
+                print(f"야간 작업 오류 ({self.name}): {str(e)}")
+            now = datetime.now(KST)
+            self._stop.wait((self._next_run(now) - now).total_seconds())
+
+    def start(self, get_user_ids: Callable[[], List[str]]) -> bool:
+        """매일 run_time에 실행되는 백그라운드 스레드 시작"""
+        if not self.enabled or not self._jobs or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(get_user_ids,), name=self.name, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
@@ -4,16 +4,50 @@ from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from typing import Dict, List, Any
 from langchain_community.vectorstores import FAISS
-from langchain_upstage import UpstageEmbeddings
-from openai import OpenAI
 import traceback
 
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from user_tendency import UserTendency
 
-
-app = FastAPI()
+try:
+    from app.metrics import REGISTRY, CONTENT_TYPE_LATEST, REPORT_STAGE_SECONDS, track_llm_call
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import REGISTRY, CONTENT_TYPE_LATEST, REPORT_STAGE_SECONDS, track_llm_call
+try:
+    from app.event_store import EventStore
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from event_store import EventStore
+try:
+    from app.responses import FastJSONResponse, CompressionMiddleware
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from responses import FastJSONResponse, CompressionMiddleware
+try:
+    from app.llm_scheduler import llm_scheduler, BACKGROUND
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from llm_scheduler import llm_scheduler, BACKGROUND
+try:
+    from app.llm_clients import llm_clients
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from llm_clients import llm_clients
+try:
+    from app.conversation_log import iter_conversations
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from conversation_log import iter_conversations
+try:
+    from app.response_cache import response_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from response_cache import response_cache
+
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware)
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
 
 class FaissDataLoader:
     """FAISS 벡터 저장소에서 데이터를 로드하고 분석하는 클래스"""
@@ -22,9 +56,7 @@ class FaissDataLoader:
         self.user_id = user_id
         self.base_path = "data\\faiss"
         # 실제 환경에서는 API 키를 환경 변수로 설정
-        self.embeddings = UpstageEmbeddings(
-            model="embedding-query", api_key=os.getenv("UPSTAGE_API_KEY")
-        )
+        self.embeddings = llm_clients.embeddings("embedding-query")
     
     def _get_previous_week_dates(self) -> Dict[str, str]:
         """지난 주의 시작일과 종료일 계산"""
@@ -45,19 +77,26 @@ class FaissDataLoader:
                 self.base_path, self.user_id, "schedule", "events.json"
             )
             
-            if not os.path.exists(calendar_path):
-                print(f"캘린더 파일을 찾을 수 없음: {calendar_path}")
-                return []
-            
-            # 일정 JSON 파일 읽기
-            with open(calendar_path, "r", encoding="utf-8") as f:
-                events_data = json.load(f)
-            
-            # events 키의 데이터 추출
-            if "events" in events_data:
-                events = events_data["events"]
-            else:
-                events = events_data
+            # 기간별 일정 저장소가 있으면 지난 주 일정만 읽기
+            week_dates = self._get_previous_week_dates()
+            events = EventStore(self.base_path).range_texts(
+                self.user_id, week_dates["start_date"], week_dates["end_date"]
+            )
+
+            if events is None:
+                if not os.path.exists(calendar_path):
+                    print(f"캘린더 파일을 찾을 수 없음: {calendar_path}")
+                    return []
+
+                # 일정 JSON 파일 읽기
+                with open(calendar_path, "r", encoding="utf-8") as f:
+                    events_data = json.load(f)
+
+                # events 키의 데이터 추출
+                if "events" in events_data:
+                    events = events_data["events"]
+                else:
+                    events = events_data
             
             # 각 이벤트 파싱
             parsed_events = []
@@ -100,28 +139,22 @@ class FaissDataLoader:
             # 모든 대화 기록 파일 찾기
             chat_histories = []
             for filename in os.listdir(history_path):
-                file_path = os.path.join(history_path, filename, "conversations.json")
-                if os.path.exists(file_path):
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        conversation_data = json.load(f)
-                        conversations = conversation_data.get("conversations", [])
-                        
-                        # 이전 주 일정에 관한 대화만 필터링
-                        filtered_conversations = []
-                        for conv in conversations:
-                            event_info = conv.get("event_info", {})
-                            event_start = event_info.get("start", "")
-                            
-                            # 이벤트 날짜 추출 (YYYY-MM-DD 형식)
-                            event_date = ""
-                            if event_start and isinstance(event_start, str) and "T" in event_start:
-                                event_date = event_start.split("T")[0].replace("-", "")
-                            
-                            # 이전 주 날짜에 해당하는 일정에 관한 대화만 포함
-                            if event_date and start_date <= event_date <= end_date:
-                                filtered_conversations.append(conv)
-                        
-                        chat_histories.extend(filtered_conversations)
+                # 지난 주 일정에 관한 대화는 그 주 시작일 이후 날짜 폴더에만 있음
+                if filename < start_date:
+                    continue
+                # 하루치 대화 로그를 한 줄씩 읽으며 이전 주 일정에 관한 대화만 필터링
+                for conv in iter_conversations(os.path.join(history_path, filename)):
+                    event_info = conv.get("event_info") or {}
+                    event_start = event_info.get("start", "")
+                    
+                    # 이벤트 날짜 추출 (YYYY-MM-DD 형식)
+                    event_date = ""
+                    if event_start and isinstance(event_start, str) and "T" in event_start:
+                        event_date = event_start.split("T")[0].replace("-", "")
+                    
+                    # 이전 주 날짜에 해당하는 일정에 관한 대화만 포함
+                    if event_date and start_date <= event_date <= end_date:
+                        chat_histories.append(conv)
             
             return chat_histories
             
@@ -253,8 +286,8 @@ class PersonaGenerator:
     
     def __init__(self, user_id: str):
         self.user_id = user_id
-        # OpenAI 클라이언트 초기화
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # OpenAI 클라이언트 (프로세스 공용 클라이언트 재사용)
+        self.client = llm_clients.openai_client()
         # FAISS 데이터 로더 초기화
         self.data_loader = FaissDataLoader(user_id)
 
@@ -415,7 +448,8 @@ class PersonaGenerator:
         """페르소나 프롬프트 생성"""
         try:
             # 1단계: 데이터 로드 (FaissDataLoader 사용)
-            data = self.data_loader.get_data_for_persona()
+            with REPORT_STAGE_SECONDS.time(generator="persona", stage="load_data"):
+                data = self.data_loader.get_data_for_persona()
             
             # 2단계: 직접 데이터 구조화
             formatted_data = {}
@@ -563,19 +597,28 @@ class PersonaGenerator:
             print("====== 최종 쿼리 프롬프트 ======")
             print(query_prompt)
 
-            analysis_response = self.client.chat.completions.create(
-                # model="gpt-4o",
-                model="gpt-4.5-preview",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": query_prompt},
-                ],
-                max_tokens=800,
-                temperature=0.1,
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": query_prompt},
+            ]
+
+            def generate():
+                with track_llm_call("persona", "gpt-4.5-preview") as call:
+                    analysis_response = self.client.chat.completions.create(
+                        # model="gpt-4o",
+                        model="gpt-4.5-preview",
+                        messages=messages,
+                        max_tokens=800,
+                        temperature=0.1,
+                    )
+                    call.record_usage(analysis_response)
+                return analysis_response.choices[0].message.content.strip()
+
+            # 입력 데이터가 그대로면 이전 결과 재사용 (RESPONSE_CACHE_SITES에 persona가 있을 때만)
+            prompt_content = response_cache.get_or_call(
+                "persona", "gpt-4.5-preview", messages, generate, scope=self.user_id
             )
 
-            prompt_content = analysis_response.choices[0].message.content.strip()
-
             ret = self.data_loader.save_persona_prompt(prompt_content)
             if not ret:
                 print("Save Fail: Can't save persona prompt")
@@ -597,4 +640,4 @@ async def generate_persona_prompt(request: Request):
         raise HTTPException(status_code=400, detail="사용자 ID가 필요합니다.")
 
     report_generator = PersonaGenerator(user_id)
-    return report_generator.generate_persona_prompt()
+    return await llm_scheduler.run(report_generator.generate_persona_prompt, user_id=user_id, priority=BACKGROUND)
@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional
+
+try:
+    from app.metrics import record_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import record_cache
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+# 미리 가져온 결과의 유효 시간(초)
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", 300))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 4))
+# 답장이 왔을 때 아직 진행 중인 prefetch를 기다리는 최대 시간(초)
+PREFETCH_WAIT = float(os.getenv("PREFETCH_WAIT", 10))
+
+
+class _Prefetched:
+    def __init__(self, key: str, future, expires_at: float):
+        self.key = key
+        self.future = future
+        self.expires_at = expires_at
+
+
+class PrefetchCache:
+    """세션별로 다음 턴에 쓸 결과를 미리 계산해 두는 캐시
+
+    세션마다 가장 최근에 요청한 하나만 보관하며, key가 같고 TTL 안일 때만
+    한 번 사용된다. 아직 계산 중이면 같은 작업을 다시 하지 않고 결과를 기다린다.
+    """
+
+    def __init__(self, ttl: float = PREFETCH_TTL, workers: int = PREFETCH_WORKERS):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+
+    def schedule(self, session: str, key: str, fn: Callable, *args):
+        """fn(*args)를 백그라운드에서 실행하고 결과를 session에 보관 (이전 결과는 버림)"""
+        if not PREFETCH_ENABLED:
+            return
+        future = self._executor.submit(fn, *args)
+        with self._lock:
+            self._entries[session] = _Prefetched(key, future, time.monotonic() + self.ttl)
+
+    def take(self, session: str, key: str) -> Optional[object]:
+        """session의 key 결과를 꺼냄 (없거나 만료/실패면 None)"""
+        with self._lock:
+            entry = self._entries.get(session)
+            if entry is None or entry.key != key or entry.expires_at < time.monotonic():
+                entry = None
+            else:
+                del self._entries[session]
+        if entry is None:
+            record_cache("retrieval_prefetch", False)
+            return None
+
+        try:
+            result = entry.future.result(timeout=PREFETCH_WAIT)
+        except FutureTimeoutError:
+            result = None
+        except Exception as e:
+            print(f"prefetch 결과 사용 불가: {str(e)}")
+            result = None
+        record_cache("retrieval_prefetch", result is not None)
+        return result
+
+    def discard(self, session: str):
+        with self._lock:
+            self._entries.pop(session, None)
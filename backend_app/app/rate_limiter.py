@@ -0,0 +1,222 @@
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+try:
+    import fcntl  # 여러 프로세스가 한도를 공유할 때만 사용 (Unix)
+except ImportError:
+    fcntl = None
+
+try:
+    from app.metrics import RATE_LIMIT_WAIT_SECONDS, PROVIDER_RETRIES_TOTAL
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import RATE_LIMIT_WAIT_SECONDS, PROVIDER_RETRIES_TOTAL
+
+# "공급자:모델" 또는 "공급자:*" 별 분당 요청 수(rpm)/토큰 수(tpm), 0이면 제한 없음
+# 예) RATE_LIMITS='{"openai:gpt-4": {"rpm": 500, "tpm": 10000}}'
+DEFAULT_RATE_LIMITS = {
+    "openai:*": {"rpm": 500, "tpm": 200000},
+    "upstage:*": {"rpm": 300, "tpm": 0},
+}
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.getenv("RATE_LIMITS", "{}"))}
+# 지정하면 같은 디렉터리를 쓰는 프로세스끼리 버킷 상태를 공유
+RATE_LIMIT_STATE_DIR = os.getenv("RATE_LIMIT_STATE_DIR")
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 1.0))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 30.0))
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """지수 백오프 + full jitter (Retry-After가 있으면 그 이상 대기)"""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+    if retry_after:
+        delay = max(delay, min(retry_after, RETRY_MAX_DELAY))
+    return delay
+
+
+class TokenBucketLimiter:
+    """공급자/모델별 요청 수와 토큰 수를 함께 제한하는 토큰 버킷
+
+    버킷 크기는 분당 한도, 초당 한도/60씩 채워진다. 429를 받으면 해당 버킷을
+    잠시 막아 모든 호출자가 같이 물러나도록 한다.
+    """
+
+    def __init__(self, limits: Dict = None, state_dir: str = RATE_LIMIT_STATE_DIR):
+        self.limits = limits or RATE_LIMITS
+        self.state_dir = state_dir if fcntl is not None else None
+        if self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def _limits_for(self, provider: str, model: str) -> Tuple[float, float]:
+        limit = self.limits.get(f"{provider}:{model}") or self.limits.get(f"{provider}:*") or {}
+        return float(limit.get("rpm", 0)), float(limit.get("tpm", 0))
+
+    def _refill(self, state: Dict, rpm: float, tpm: float, now: float):
+        elapsed = max(0.0, now - state["updated"])
+        state["requests"] = min(rpm, state["requests"] + elapsed * rpm / 60)
+        state["tokens"] = min(tpm, state["tokens"] + elapsed * tpm / 60)
+        state["updated"] = now
+
+    def _update(self, key: str, rpm: float, tpm: float, fn):
+        """버킷 상태를 잠금 하에 읽고 fn으로 갱신 (프로세스 간 공유 시 파일 잠금)"""
+        with self._lock:
+            if not self.state_dir:
+                state = self._states.get(key)
+                if state is None:
+                    state = self._states[key] = {"requests": rpm, "tokens": tpm, "updated": time.time(), "blocked_until": 0}
+                return fn(state)
+
+            path = os.path.join(self.state_dir, key.replace(":", "__").replace("/", "_") + ".json")
+            with open(path, "a+", encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read()
+                    state = json.loads(raw) if raw else {"requests": rpm, "tokens": tpm, "updated": time.time(), "blocked_until": 0}
+                    result = fn(state)
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                    return result
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def acquire(self, provider: str, model: str, tokens: int = 0):
+        """요청 1건과 tokens만큼의 한도를 확보할 때까지 대기"""
+        rpm, tpm = self._limits_for(provider, model)
+        if not rpm and not tpm:
+            return
+        key = f"{provider}:{model}"
+        # 한 번에 분당 한도보다 큰 요청은 버킷이 가득 찼을 때 보내도록 조정
+        tokens = min(tokens, tpm) if tpm else 0
+        start = time.perf_counter()
+
+        def take(state):
+            now = time.time()
+            self._refill(state, rpm, tpm, now)
+            if state["blocked_until"] > now:
+                return state["blocked_until"] - now
+            wait = 0.0
+            if rpm and state["requests"] < 1:
+                wait = max(wait, (1 - state["requests"]) * 60 / rpm)
+            if tpm and state["tokens"] < tokens:
+                wait = max(wait, (tokens - state["tokens"]) * 60 / tpm)
+            if wait > 0:
+                return wait
+            if rpm:
+                state["requests"] -= 1
+            if tpm:
+                state["tokens"] -= tokens
+            return 0.0
+
+        while True:
+            wait = self._update(key, rpm, tpm, take)
+            if wait <= 0:
+                break
+            # 여러 대기자가 동시에 깨어나지 않도록 약간의 지터 추가
+            time.sleep(wait + random.uniform(0, 0.05))
+        RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - start, provider=provider, model=model)
+
+    def penalize(self, provider: str, model: str, seconds: float) -> bool:
+        """429 응답 후 해당 버킷 전체를 seconds 동안 멈춤 (한도가 없는 버킷이면 False)"""
+        rpm, tpm = self._limits_for(provider, model)
+        if not rpm and not tpm:
+            return False
+
+        def block(state):
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
+
+        self._update(f"{provider}:{model}", rpm, tpm, block)
+        return True
+
+
+rate_limiter = TokenBucketLimiter()
+
+
+def _estimate_request(request: httpx.Request) -> Tuple[str, int]:
+    """요청 바디에서 모델명과 예상 토큰 수 추출 (한글 기준 대략 2자당 1토큰 + 최대 출력 토큰)"""
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return "unknown", 0
+    if not isinstance(body, dict):
+        return "unknown", 0
+
+    chars = 0
+    for message in body.get("messages", []):
+        content = message.get("content")
+        chars += len(content) if isinstance(content, str) else len(json.dumps(content, ensure_ascii=False))
+    inputs = body.get("input")
+    if isinstance(inputs, str):
+        chars += len(inputs)
+    elif isinstance(inputs, list):
+        chars += sum(len(text) for text in inputs if isinstance(text, str))
+    completion = body.get("max_completion_tokens") or body.get("max_tokens") or 0
+    return str(body.get("model", "unknown")), chars // 2 + int(completion)
+
+
+def _retry_after(headers) -> Optional[float]:
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """요청 전 한도를 확보하고, 429/5xx/연결 오류는 지터가 섞인 지수 백오프로 재시도"""
+
+    def __init__(self, transport: httpx.BaseTransport, provider: str,
+                 limiter: TokenBucketLimiter = rate_limiter, max_retries: int = LLM_MAX_RETRIES):
+        self.transport = transport
+        self.provider = provider
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = _estimate_request(request)
+        attempt = 0
+        while True:
+            self.limiter.acquire(self.provider, model, tokens)
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                PROVIDER_RETRIES_TOTAL.inc(provider=self.provider, status="transport_error")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                return response
+
+            delay = backoff_delay(attempt, _retry_after(response.headers))
+            response.close()
+            PROVIDER_RETRIES_TOTAL.inc(provider=self.provider, status=str(response.status_code))
+            print(f"{self.provider} API {response.status_code} 응답, {delay:.1f}초 후 재시도 ({attempt + 1}/{self.max_retries})")
+            # 429면 버킷을 막아 다음 acquire에서 다른 호출자와 함께 대기
+            if response.status_code != 429 or not self.limiter.penalize(self.provider, model, delay):
+                time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
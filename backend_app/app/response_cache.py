@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+try:
+    from app.metrics import (
+        RESPONSE_CACHE_BYTES,
+        RESPONSE_CACHE_EVICTIONS_TOTAL,
+        RESPONSE_CACHE_REQUESTS_TOTAL,
+        record_cache,
+    )
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import (
+        RESPONSE_CACHE_BYTES,
+        RESPONSE_CACHE_EVICTIONS_TOTAL,
+        RESPONSE_CACHE_REQUESTS_TOTAL,
+        record_cache,
+    )
+
+# 응답을 캐시할 LLM 호출 지점 (쉼표 구분, 예: "chat,report_analysis,persona", 비우면 사용 안 함)
+RESPONSE_CACHE_SITES = os.getenv("RESPONSE_CACHE_SITES", "")
+# 캐시한 응답의 유효 시간(초)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+# 보관할 최대 응답 수 / 총 크기 (넘으면 가장 오래 안 쓴 응답부터 제거)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 2000))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+# 질의 임베딩 유사도가 이 값 이상이면 같은 질의로 보고 재사용 (0이면 정규화한 프롬프트가 같을 때만)
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0))
+
+
+def _normalize_text(text) -> str:
+    # 공백/줄바꿈 차이는 같은 프롬프트로 봄
+    return " ".join(str(text or "").split())
+
+
+def normalize_prompt(prompt) -> str:
+    """문자열, LangChain 메시지, OpenAI 메시지(dict) 목록을 비교용 문자열로 변환"""
+    if prompt is None:
+        return ""
+    if isinstance(prompt, str):
+        return _normalize_text(prompt)
+    if isinstance(prompt, dict):
+        return f"{prompt.get('role', '')}:{_normalize_text(prompt.get('content'))}"
+    if isinstance(prompt, (list, tuple)):
+        return "\n".join(normalize_prompt(part) for part in prompt)
+    if hasattr(prompt, "content"):
+        return f"{getattr(prompt, 'type', '')}:{_normalize_text(prompt.content)}"
+    return _normalize_text(prompt)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    def __init__(self, key: str, group: str, response: str, vector, expires_at: float):
+        self.key = key
+        self.group = group
+        self.response = response
+        self.vector = vector
+        self.expires_at = expires_at
+        self.size = len(response.encode("utf-8")) + (len(vector) * 4 if vector is not None else 0)
+
+
+class ResponseCache:
+    """LLM 응답 캐시 (호출 지점별로 켜는 방식, TTL + LRU 크기 제한)
+
+    키는 호출 지점, 모델, 범위(보통 사용자 ID), 정규화한 프롬프트의 해시다.
+    호출하는 쪽이 query(질문처럼 표현만 달라질 수 있는 부분)를 따로 넘기고
+    RESPONSE_CACHE_SIMILARITY가 0보다 크면, 나머지 프롬프트가 같은 응답 중
+    query 임베딩의 코사인 유사도가 임계값 이상인 것도 재사용한다.
+    데이터가 바뀌면 프롬프트도 바뀌므로 새로 호출한다.
+    """
+
+    def __init__(
+        self,
+        sites: str = RESPONSE_CACHE_SITES,
+        ttl: float = RESPONSE_CACHE_TTL,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        similarity: float = RESPONSE_CACHE_SIMILARITY,
+        embed: Callable[[str], List[float]] = None,
+    ):
+        self.sites = {site.strip() for site in sites.split(",") if site.strip()}
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.similarity = similarity
+        self._embed = embed
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # 유사도 비교 대상 (query를 뺀 나머지 프롬프트가 같은 응답들의 키)
+        self._groups: Dict[str, List[str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def enabled(self, site: str) -> bool:
+        return site in self.sites or "*" in self.sites
+
+    def embed(self, text: str) -> List[float]:
+        if self._embed is None:
+            try:
+                from app.llm_clients import llm_clients
+            except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+                from llm_clients import llm_clients
+            self._embed = llm_clients.embeddings("embedding-query").embed_query
+        return self._embed(text)
+
+    def get_or_call(self, site: str, model: str, prompt, call: Callable[[], str], scope: str = "", query: str = None) -> str:
+        """캐시된 응답을 반환하고, 없으면 call()로 생성해 저장
+
+        prompt는 응답을 결정하는 프롬프트 전체(query 제외), query는 유사도로 비교할 부분이다.
+        """
+        if not self.enabled(site):
+            return call()
+
+        group = _digest(site, model, scope or "", normalize_prompt(prompt))
+        key = _digest(group, normalize_prompt(query))
+        response = self._get(key)
+        if response is not None:
+            self._record(site, "hit")
+            return response
+
+        vector = None
+        if query is not None and self.similarity > 0:
+            try:
+                vector = self.embed(query)
+            except Exception as e:
+                print(f"응답 캐시 질의 임베딩 실패: {str(e)}")
+            if vector is not None:
+                response = self._get_similar(group, vector)
+                if response is not None:
+                    self._record(site, "similar")
+                    return response
+
+        self._record(site, "miss")
+        response = call()
+        if response:
+            self._put(key, group, response, vector)
+        return response
+
+    def _record(self, site: str, result: str):
+        RESPONSE_CACHE_REQUESTS_TOTAL.inc(site=site, result=result)
+        record_cache("llm_response", result != "miss")
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._remove(key, "ttl")
+                return None
+            self._entries.move_to_end(key)
+            return entry.response
+
+    def _get_similar(self, group: str, vector) -> Optional[str]:
+        import numpy as np
+
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            for key in list(self._groups.get(group, ())):
+                entry = self._entries[key]
+                if entry.expires_at < now:
+                    self._remove(key, "ttl")
+                elif entry.vector is not None:
+                    candidates.append(entry)
+            if not candidates:
+                return None
+
+            query = np.asarray(vector, dtype=np.float32)
+            vectors = np.asarray([entry.vector for entry in candidates], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+            scores = vectors @ query / np.where(norms == 0, 1, norms)
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity:
+                return None
+            entry = candidates[best]
+            self._entries.move_to_end(entry.key)
+            return entry.response
+
+    def _put(self, key: str, group: str, response: str, vector):
+        entry = _Entry(key, group, response, vector, time.monotonic() + self.ttl)
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, None)
+            self._entries[key] = entry
+            self._groups.setdefault(group, []).append(key)
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest, "ttl" if self._entries[oldest].expires_at < time.monotonic() else "size")
+            RESPONSE_CACHE_BYTES.set(self._bytes)
+
+    def _remove(self, key: str, reason: Optional[str]):
+        # _lock을 잡은 상태에서 호출
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        keys = self._groups.get(entry.group)
+        if keys is not None:
+            keys.remove(key)
+            if not keys:
+                del self._groups[entry.group]
+        if reason:
+            RESPONSE_CACHE_EVICTIONS_TOTAL.inc(reason=reason)
+        RESPONSE_CACHE_BYTES.set(self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self._bytes = 0
+            RESPONSE_CACHE_BYTES.set(0)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,141 @@
+import gzip
+import json
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+# orjson/brotli는 설치되어 있을 때만 사용 (없으면 표준 json/gzip으로 동작)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 이 크기(바이트) 이상인 응답만 압축
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/")
+
+
+def json_dumps(data: Any) -> bytes:
+    """응답용 JSON 직렬화 (한글은 이스케이프하지 않음)"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson이 있으면 orjson으로 직렬화하는 JSONResponse"""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+def _choose_encoding(accept_encoding: str):
+    accepted = {}
+    for item in accept_encoding.split(","):
+        parts = item.strip().split(";")
+        name = parts[0].strip().lower()
+        q = 1.0
+        for param in parts[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name] = q
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Accept-Encoding에 따라 br/gzip으로 응답을 압축하는 ASGI 미들웨어
+
+    한 번에 전송되는 응답 중 COMPRESS_MIN_SIZE 이상인 JSON/텍스트만 압축하고,
+    스트리밍 응답은 그대로 통과시킨다.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = _choose_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = list(start.get("headers", []))
+            header_names = {name.lower() for name, _ in headers}
+            content_type = next((value for name, value in headers if name.lower() == b"content-type"), b"")
+
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or b"content-encoding" in header_names
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            new_headers = []
+            for name, value in headers:
+                lower = name.lower()
+                if lower == b"content-length":
+                    continue
+                # 압축 결과는 바이트가 달라지므로 약한 ETag로 변경
+                if lower == b"etag" and not value.startswith(b"W/"):
+                    value = b"W/" + value
+                new_headers.append((name, value))
+            new_headers.append((b"content-encoding", encoding.encode("latin-1")))
+            new_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            new_headers.append((b"vary", b"Accept-Encoding"))
+
+            await send({**start, "headers": new_headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -5,18 +5,52 @@ from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from typing import Dict, List, Any, Tuple
 from langchain_community.vectorstores import FAISS
-from langchain_upstage import UpstageEmbeddings
-from openai import OpenAI
 import traceback
 
-from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
-from langchain_core.runnables import RunnablePassthrough, RunnableConfig
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
-app = FastAPI()
+try:
+    from app.metrics import REGISTRY, CONTENT_TYPE_LATEST, REPORT_STAGE_SECONDS, track_llm_call
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import REGISTRY, CONTENT_TYPE_LATEST, REPORT_STAGE_SECONDS, track_llm_call
+try:
+    from app.event_store import EventStore
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from event_store import EventStore
+try:
+    from app.responses import FastJSONResponse, CompressionMiddleware
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from responses import FastJSONResponse, CompressionMiddleware
+try:
+    from app.llm_scheduler import llm_scheduler, BACKGROUND
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from llm_scheduler import llm_scheduler, BACKGROUND
+try:
+    from app.llm_clients import llm_clients
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from llm_clients import llm_clients
+try:
+    from app.conversation_log import iter_conversations
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from conversation_log import iter_conversations
+try:
+    from app.prompts import report_messages
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from prompts import report_messages
+try:
+    from app.response_cache import response_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from response_cache import response_cache
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware)
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
 
 class FaissDataLoader:
     """FAISS 벡터 저장소에서 데이터를 로드하고 분석하는 클래스"""
@@ -25,9 +59,7 @@ class FaissDataLoader:
         self.user_id = user_id
         self.base_path = "data/faiss"
         # 실제 환경에서는 API 키를 환경 변수로 설정
-        self.embeddings = UpstageEmbeddings(
-            model="embedding-query", api_key=os.getenv("UPSTAGE_API_KEY")
-        )
+        self.embeddings = llm_clients.embeddings("embedding-query")
     def create_vector_index(self, documents: List[Dict]) -> None:
         """문서를 벡터화하여 FAISS 인덱스 생성"""
         try:
@@ -100,19 +132,26 @@ class FaissDataLoader:
                 self.base_path, self.user_id, "schedule", "events.json"
             )
             
-            if not os.path.exists(calendar_path):
-                print(f"캘린더 파일을 찾을 수 없음: {calendar_path}")
-                return []
-            
-            # 일정 JSON 파일 읽기
-            with open(calendar_path, "r", encoding="utf-8") as f:
-                events_data = json.load(f)
-            
-            # events 키의 데이터 추출
-            if "events" in events_data:
-                events = events_data["events"]
-            else:
-                events = events_data
+            # 기간별 일정 저장소가 있으면 지난 주 일정만 읽기
+            week_dates = self._get_previous_week_dates()
+            events = EventStore(self.base_path).range_texts(
+                self.user_id, week_dates["start_date"], week_dates["end_date"]
+            )
+
+            if events is None:
+                if not os.path.exists(calendar_path):
+                    print(f"캘린더 파일을 찾을 수 없음: {calendar_path}")
+                    return []
+
+                # 일정 JSON 파일 읽기
+                with open(calendar_path, "r", encoding="utf-8") as f:
+                    events_data = json.load(f)
+
+                # events 키의 데이터 추출
+                if "events" in events_data:
+                    events = events_data["events"]
+                else:
+                    events = events_data
             
             # 각 이벤트 파싱
             parsed_events = []
@@ -178,28 +217,22 @@ class FaissDataLoader:
             # 모든 대화 기록 파일 찾기
             chat_histories = []
             for filename in os.listdir(history_path):
-                file_path = os.path.join(history_path, filename, "conversations.json")
-                if os.path.exists(file_path):
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        conversation_data = json.load(f)
-                        conversations = conversation_data.get("conversations", [])
-                        
-                        # 이전 주 일정에 관한 대화만 필터링
-                        filtered_conversations = []
-                        for conv in conversations:
-                            event_info = conv.get("event_info", {})
-                            event_start = event_info.get("start", "")
-                            
-                            # 이벤트 날짜 추출 (YYYY-MM-DD 형식)
-                            event_date = ""
-                            if event_start and isinstance(event_start, str) and "T" in event_start:
-                                event_date = event_start.split("T")[0].replace("-", "")
-                            
-                            # 이전 주 날짜에 해당하는 일정에 관한 대화만 포함
-                            if event_date and start_date <= event_date <= end_date:
-                                filtered_conversations.append(conv)
-                        
-                        chat_histories.extend(filtered_conversations)
+                # 지난 주 일정에 관한 대화는 그 주 시작일 이후 날짜 폴더에만 있음
+                if filename < start_date:
+                    continue
+                # 하루치 대화 로그를 한 줄씩 읽으며 이전 주 일정에 관한 대화만 필터링
+                for conv in iter_conversations(os.path.join(history_path, filename)):
+                    event_info = conv.get("event_info") or {}
+                    event_start = event_info.get("start", "")
+                    
+                    # 이벤트 날짜 추출 (YYYY-MM-DD 형식)
+                    event_date = ""
+                    if event_start and isinstance(event_start, str) and "T" in event_start:
+                        event_date = event_start.split("T")[0].replace("-", "")
+                    
+                    # 이전 주 날짜에 해당하는 일정에 관한 대화만 포함
+                    if event_date and start_date <= event_date <= end_date:
+                        chat_histories.append(conv)
             
             return chat_histories
             
@@ -1099,11 +1132,26 @@ class RetrospectiveReportGenerator:
     
     def __init__(self, user_id: str):
         self.user_id = user_id
-        # OpenAI 클라이언트 초기화
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # OpenAI 클라이언트 (프로세스 공용 클라이언트 재사용)
+        self.client = llm_clients.openai_client()
         # FAISS 데이터 로더 초기화
         self.data_loader = FaissDataLoader(user_id)
 
+    def _complete(self, site: str, model: str, messages: List[Dict], max_tokens: int, temperature: float) -> str:
+        """OpenAI 호출 (RESPONSE_CACHE_SITES에 site가 있으면 같은 프롬프트의 이전 응답 재사용)"""
+        def call_llm():
+            with track_llm_call(site, model) as call:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                )
+                call.record_usage(response)
+            return response.choices[0].message.content.strip()
+
+        return response_cache.get_or_call(site, model, messages, call_llm, scope=self.user_id)
+
     def _generate_data_analysis_prompt(self, data: Dict) -> str:
         """데이터 분석 프롬프트 생성"""
         events = data["events"]
@@ -1388,9 +1436,10 @@ One shot은 예시일 뿐이니 형식은 그대로 하되, 반드시 실제 내
             
         try:
             print("\n=== 사용자 성향 기반 맞춤형 리포트 생성 중... ===\n")
-            response = self.client.chat.completions.create(
-                model="gpt-4.5-preview",
-                messages=[
+            return self._complete(
+                "report_personalize",
+                "gpt-4.5-preview",
+                [
                     {
                         "role": "system",
                         "content": "당신은 사용자의 성향과 심리적 특성을 이해하고 이를 반영한 회고 리포트를 수정하는 전문가입니다. 기존 회고 리포트의 구조와 형식은 유지하면서, 사용자의 성향에 맞게 내용과 톤을 자연스럽게 조정해주세요."
@@ -1414,8 +1463,6 @@ One shot은 예시일 뿐이니 형식은 그대로 하되, 반드시 실제 내
                 max_tokens=1500,
                 temperature=0.6,
             )
-            
-            return response.choices[0].message.content.strip()
         except Exception as e:
             print(f"사용자 성향 반영 중 오류: {e}")
             return report_content
@@ -1428,26 +1475,27 @@ One shot은 예시일 뿐이니 형식은 그대로 하되, 반드시 실제 내
             
                     # 데이터 준비 및 인덱스 생성 (GraphRAGDataLoader인 경우에만)
             if hasattr(self.data_loader, 'prepare_data'):
-              self.data_loader.prepare_data()
+              with REPORT_STAGE_SECONDS.time(generator="retrospective", stage="prepare_data"):
+                self.data_loader.prepare_data()
             # 1단계: 데이터 로드 (FaissDataLoader 사용)
-            data = self.data_loader.get_data_for_report()
+            with REPORT_STAGE_SECONDS.time(generator="retrospective", stage="load_data"):
+                data = self.data_loader.get_data_for_report()
             
             # 2단계: 데이터 분석 프롬프트 생성
             data_analysis_prompt = self._generate_data_analysis_prompt(data)
             
             # 3단계: 데이터 분석 LLM 호출
             print("\n=== 데이터 분석 진행 중... ===\n")
-            analysis_response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
+            data_analysis_result = self._complete(
+                "report_analysis",
+                "gpt-4o",
+                [
                     {"role": "system", "content": "당신은 데이터 분석 전문가입니다. 사용자의 일정, 대화, 감정 데이터를 객관적으로 분석하여 정확하고 통찰력 있는 결과를 제공합니다."},
                     {"role": "user", "content": data_analysis_prompt},
                 ],
                 max_tokens=800,
                 temperature=0.1,
             )
-            
-            data_analysis_result = analysis_response.choices[0].message.content.strip()
             print("\n=== 데이터 분석 결과 ===\n")
             print(data_analysis_result)
             print("\n========================\n")
@@ -1457,9 +1505,10 @@ One shot은 예시일 뿐이니 형식은 그대로 하되, 반드시 실제 내
             
             # 5단계: 회고 리포트 LLM 호출
             print("\n=== 회고 리포트 생성 중... ===\n")
-            report_response = self.client.chat.completions.create(
-                model="gpt-4.5-preview",
-                messages=[
+            initial_report_content = self._complete(
+                "report_write",
+                "gpt-4.5-preview",
+                [
                     {
                         "role": "system",
                         "content": "당신은 개인 맞춤형 회고 리포트 생성 전문가입니다. 데이터 분석가가 제공한 분석 결과를 바탕으로 개인화된 회고 리포트를 작성합니다. 형식을 준수하면서도 내용은 사용자의 실제 데이터를 반영한 맞춤형 내용으로 작성해주세요. 또한 심리 전문가로서 저장된 사용자 페르소나 데이터와 지난주의 일정, 감정 기록, 챗봇 회고 데이터를 바탕으로 사용자의 현재 목표 및 고민과 직접 연관된 개인 맞춤형 주간 회고 리포트를 작성합니다.",
@@ -1469,8 +1518,6 @@ One shot은 예시일 뿐이니 형식은 그대로 하되, 반드시 실제 내
                 max_tokens=1200,
                 temperature=0.75,
             )
-
-            initial_report_content = report_response.choices[0].message.content.strip()
             print("\n=== 회고 리포트 생성 완료 ===\n")
             
             # 6단계: 사용자 성향 반영 리포트 생성
@@ -1640,24 +1687,21 @@ class GraphRAGRetrospectiveReportGenerator(RetrospectiveReportGenerator):
         """
         try:
             # 1단계: GraphRAG 데이터 로드
-            data = self.data_loader.get_data_for_report()
+            with REPORT_STAGE_SECONDS.time(generator="graphrag", stage="load_data"):
+                data = self.data_loader.get_data_for_report()
             
             # 2단계: 데이터 분석 프롬프트 생성 (GraphRAG 정보 포함)
             data_analysis_prompt = self._generate_data_analysis_prompt(data)
             
             # 3단계: 데이터 분석 LLM 호출 (GraphRAG 정보 활용)
             print("\n=== GraphRAG 기반 데이터 분석 진행 중... ===\n")
-            analysis_response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "당신은 네트워크 그래프 분석과 데이터 분석에 전문성을 갖춘 분석가입니다. 사용자의 일정, 대화, 감정 데이터와 그래프 구조를 객관적으로 분석하여 정확하고 통찰력 있는 결과를 제공합니다."},
-                    {"role": "user", "content": data_analysis_prompt},
-                ],
+            data_analysis_result = self._complete(
+                "report_analysis",
+                "gpt-4o",
+                report_messages("graph_analysis", data_analysis_prompt=data_analysis_prompt),
                 max_tokens=1000,
                 temperature=0.1,
             )
-            
-            data_analysis_result = analysis_response.choices[0].message.content.strip()
             print("\n=== GraphRAG 기반 데이터 분석 결과 ===\n")
             print(data_analysis_result)
             print("\n========================\n")
@@ -1667,20 +1711,13 @@ class GraphRAGRetrospectiveReportGenerator(RetrospectiveReportGenerator):
             
             # 5단계: 회고 리포트 LLM 호출
             print("\n=== GraphRAG 기반 회고 리포트 생성 중... ===\n")
-            report_response = self.client.chat.completions.create(
-                model="gpt-4.5-preview",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "당신은 네트워크 그래프 분석과 심리 분석에 전문성을 갖춘 개인 맞춤형 회고 리포트 생성 전문가입니다. 그래프 기반 데이터 분석가가 제공한 분석 결과를 바탕으로 개인화된 회고 리포트를 작성합니다. 사용자의 행동, 감정, 관심사 간의 관계에 주목하여 더 심층적인 분석과 통찰력을 제공합니다.",
-                    },
-                    {"role": "user", "content": report_prompt},
-                ],
+            initial_report_content = self._complete(
+                "report_write",
+                "gpt-4.5-preview",
+                report_messages("graph_report", report_prompt=report_prompt),
                 max_tokens=1200,
                 temperature=0.7,
             )
-
-            initial_report_content = report_response.choices[0].message.content.strip()
             print("\n=== GraphRAG 기반 회고 리포트 생성 완료 ===\n")
             
             # 6단계: 사용자 성향 반영 리포트 생성
@@ -1897,234 +1934,18 @@ One shot은 예시일 뿐이니 형식은 그대로 하되, 반드시 실제 내
             
         try:
             print("\n=== 사용자 성향 기반 맞춤형 리포트 생성 중... ===\n")
-            response = self.client.chat.completions.create(
-                model="gpt-4.5-preview",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "당신은 사용자의 성향과 심리적 특성을 이해하고 이를 반영한 회고 리포트를 수정하는 전문가입니다. 기존 회고 리포트의 구조와 형식은 유지하면서, 사용자의 성향에 맞게 내용과 톤을 자연스럽게 조정해주세요."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"""
-다음은 사용자를 위해 생성된 회고 리포트입니다:
-
-{report_content}
-
-다음은 이 사용자의 성향과 특성에 대한 정보입니다:
-
-{tendency_prompt}
-
-위 회고 리포트를 사용자의 성향과 특성에 맞게 수정해주세요. 리포트의 구조와 주요 내용은 그대로 유지하되, 사용자가 더 공감하고 동기부여 받을 수 있도록 톤, 표현 방식, 조언 등을 사용자 성향에 맞게 자연스럽게 조정해주세요. 
-형식은 변경하지 말고 내용만 수정해주세요.
-"""
-                    }
-                ],
+            return self._complete(
+                "report_personalize",
+                "gpt-4.5-preview",
+                report_messages("graph_personalization", initial_report=report_content, tendency_prompt=tendency_prompt),
                 max_tokens=1500,
                 temperature=0.6,
             )
-            
-            return response.choices[0].message.content.strip()
         except Exception as e:
             print(f"사용자 성향 반영 중 오류: {e}")
             return report_content
 
 
-def generate_retrospective_report(self) -> Dict[str, Any]:
-    """
-    LangChain을 활용한 GraphRAG 기반 회고 리포트 생성
-    """
-    try:
-        # 1단계: GraphRAG 데이터 로드
-        data = self.data_loader.get_data_for_report()
-        
-        # 2단계: 데이터 분석 프롬프트 생성 (GraphRAG 정보 포함)
-        data_analysis_prompt = self._generate_data_analysis_prompt(data)
-        
-        # 3단계: 데이터 분석 LLM 체인 설정 및 호출
-        print("\n=== GraphRAG 기반 데이터 분석 진행 중... ===\n")
-        
-        # 데이터 분석을 위한 프롬프트 템플릿 생성
-        analysis_prompt = ChatPromptTemplate.from_messages([
-            SystemMessagePromptTemplate.from_template(
-                "당신은 네트워크 그래프 분석과 데이터 분석에 전문성을 갖춘 분석가입니다. "
-                "사용자의 일정, 대화, 감정 데이터와 그래프 구조를 객관적으로 분석하여 정확하고 통찰력 있는 결과를 제공합니다."
-                 "하루 중 시간대와 부정적 감정 사이에 패턴이 있는지 확인하세요"
-                 "각 카테고리에 대해 3-5개의 글머리 기호를 제공하세요 또는 식별된 각 패턴에 대해 다음을 설명하세요: (1) 패턴, (2) 지원 데이터, (3) 가능한 의미"
-            ),
-            HumanMessagePromptTemplate.from_template("{data_analysis_prompt}")
-        ])
-        
-        # 데이터 분석 LLM 모델 설정
-        analysis_model = ChatOpenAI(
-            model="gpt-4o",
-            api_key=os.getenv("OPENAI_API_KEY"),
-            max_tokens=1000,
-            temperature=0.1
-        )
-        
-        # 데이터 분석 체인 구성
-        analysis_chain = (
-            {"data_analysis_prompt": RunnablePassthrough()}
-            | analysis_prompt
-            | analysis_model
-            | StrOutputParser()
-        )
-        
-        # 체인 실행
-        analysis_config = RunnableConfig(
-            tags=["graphrag_analysis"],
-            metadata={"user_id": self.user_id}
-        )
-        data_analysis_result = analysis_chain.invoke(data_analysis_prompt, config=analysis_config)
-        
-        print("\n=== GraphRAG 기반 데이터 분석 결과 ===\n")
-        print(data_analysis_result)
-        print("\n========================\n")
-        
-        # 4단계: 회고 리포트 프롬프트 생성
-        report_prompt = self._generate_report_prompt(data_analysis_result, data)
-        
-        # 5단계: 회고 리포트 LLM 체인 설정 및 호출
-        print("\n=== GraphRAG 기반 회고 리포트 생성 중... ===\n")
-        
-        # 회고 리포트 생성을 위한 프롬프트 템플릿
-        report_template = ChatPromptTemplate.from_messages([
-            SystemMessagePromptTemplate.from_template(
-                "당신은 네트워크 그래프 분석과 심리 분석에 전문성을 갖춘 개인 맞춤형 회고 리포트 생성 전문가입니다. "
-                "그래프 기반 데이터 분석가가 제공한 분석 결과를 바탕으로 개인화된 회고 리포트를 작성합니다. "
-                "사용자의 행동, 감정, 관심사 간의 관계에 주목하여 더 심층적인 분석과 통찰력을 제공합니다."
-                "제공된 각 통찰력에 대해 이를 뒷받침하는 특정 데이터 포인트를 하나 이상 참조하세요."
-                "감정 데이터 패턴을 기반으로 [특정 활동]에서 확인된 부정적 감정을 관리하는 데 도움이 될 수 있는 3가지 구체적인 기술을 제공하세요"
-                "먼저 데이터에서 상위 3개의 감정 트리거를 식별하세요. 그런 다음 각 트리거에 대해 사용자의 패턴을 기반으로 어떤 실용적인 조언이 가장 도움이 될지 고려하세요"
-            ),
-            HumanMessagePromptTemplate.from_template("{report_prompt}")
-        ])
-        
-        # 회고 리포트 LLM 모델 설정
-        report_model = ChatOpenAI(
-            model="gpt-4.5-preview",
-            api_key=os.getenv("OPENAI_API_KEY"),
-            max_tokens=1200,
-            temperature=0.7
-        )
-        
-        # 회고 리포트 생성 체인 구성
-        report_chain = (
-            {"report_prompt": RunnablePassthrough()}
-            | report_template
-            | report_model
-            | StrOutputParser()
-        )
-        
-        # 체인 실행
-        report_config = RunnableConfig(
-            tags=["graphrag_report"],
-            metadata={"user_id": self.user_id, "report_type": "graphrag"}
-        )
-        initial_report_content = report_chain.invoke(report_prompt, config=report_config)
-        
-        print("\n=== GraphRAG 기반 회고 리포트 생성 완료 ===\n")
-        
-        # 6단계: 사용자 성향 반영 체인 설정 및 호출
-        tendency_prompt = self._get_latest_user_tendency_prompt()
-        
-        if tendency_prompt:
-            print("\n=== 사용자 성향 기반 맞춤형 리포트 생성 중... ===\n")
-            
-            # 사용자 성향 반영을 위한 프롬프트 템플릿
-            tendency_template = ChatPromptTemplate.from_messages([
-                SystemMessagePromptTemplate.from_template(
-                    "당신은 사용자의 성향과 심리적 특성을 이해하고 이를 반영한 회고 리포트를 수정하는 전문가입니다. "
-                    "기존 회고 리포트의 구조와 형식은 유지하면서, 사용자의 성향에 맞게 내용과 톤을 자연스럽게 조정해주세요."
-                ),
-                HumanMessagePromptTemplate.from_template(
-                    """
-                    다음은 사용자를 위해 생성된 회고 리포트입니다:
-                    
-                    {initial_report}
-                    
-                    다음은 이 사용자의 성향과 특성에 대한 정보입니다:
-                    
-                    {tendency_prompt}
-                    
-                    위 회고 리포트를 사용자의 성향과 특성에 맞게 수정해주세요. 리포트의 구조와 주요 내용은 그대로 유지하되, 
-                    보고서를 다음과 같은 특정 방식으로 수정하세요: 
-                    (1) 사용자 커뮤니케이션 스타일에 따라 언어 격식을 조정, 
-                    (2) 성향 데이터에서 식별된 사용자 관심사에 맞게 예제 사용자 지정, 
-                    (3) 사용자의 성격 유형에 맞는 동기 부여 기술에 초점 맞추기
-                    형식은 변경하지 말고 내용만 수정해주세요.
-                    """
-                )
-            ])
-            
-            # 사용자 성향 반영 LLM 모델 설정
-            tendency_model = ChatOpenAI(
-                model="gpt-4.5-preview",
-                api_key=os.getenv("OPENAI_API_KEY"),
-                max_tokens=1500,
-                temperature=0.6
-            )
-            
-            # 사용자 성향 반영 체인 구성
-            tendency_chain = (
-                tendency_template
-                | tendency_model
-                | StrOutputParser()
-            )
-            
-            # 체인 실행
-            tendency_config = RunnableConfig(
-                tags=["tendency_adaptation"],
-                metadata={"user_id": self.user_id}
-            )
-            final_report_content = tendency_chain.invoke(
-                {
-                    "initial_report": initial_report_content,
-                    "tendency_prompt": tendency_prompt
-                },
-                config=tendency_config
-            )
-        else:
-            final_report_content = initial_report_content
-            
-        print("\n=== 사용자 성향 반영 리포트 생성 완료 ===\n")
-        
-        # 7단계: 리포트 저장
-        report_path = os.path.join(
-            self.data_loader.base_path,
-            self.user_id,
-            "retrospective_reports",
-            f"graphrag_{datetime.now(ZoneInfo('Asia/Seoul')).strftime('%Y%m%d_%H%M%S')}_report.json",
-        )
-        os.makedirs(os.path.dirname(report_path), exist_ok=True)
-        
-        with open(report_path, "w", encoding="utf-8") as f:
-            json.dump(
-                {
-                    "generated_at": datetime.now(ZoneInfo("Asia/Seoul")).isoformat(),
-                    "data_analysis": data_analysis_result,
-                    "initial_report": initial_report_content,
-                    "final_report": final_report_content,
-                    "tendency_prompt": tendency_prompt,
-                    "graph_stats": data.get("graph_stats", {}),
-                },
-                f,
-                ensure_ascii=False,
-                indent=2,
-            )
-        
-        # 사용자에게 최종 리포트만 반환
-        return {
-            "message": "GraphRAG 기반 회고 리포트 생성 성공",
-            "report": final_report_content
-        }
-        
-    except Exception as e:
-        print(f"GraphRAG 기반 회고 리포트 생성 중 오류: {e}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"GraphRAG 기반 회고 리포트 생성 실패: {e}")
-        
 # API 엔드포인트
 # API 엔드포인트 업데이트
 @app.post("/generate-graphrag-report")
@@ -2138,7 +1959,9 @@ async def generate_graphrag_report(request: Request):
 
     try:
         report_generator = GraphRAGRetrospectiveReportGenerator(user_id)
-        return report_generator.generate_retrospective_report()
+        return await llm_scheduler.run(
+            report_generator.generate_retrospective_report, user_id=user_id, priority=BACKGROUND
+        )
     except Exception as e:
         print(f"GraphRAG 리포트 생성 중 오류: {e}")
         traceback.print_exc()
@@ -5,18 +5,58 @@ from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from typing import Dict, List, Any, Tuple
 from langchain_community.vectorstores import FAISS
-from langchain_upstage import UpstageEmbeddings
-from openai import OpenAI
 import traceback
 
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnablePassthrough, RunnableConfig
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
-app = FastAPI()
+try:
+    from app.metrics import REGISTRY, CONTENT_TYPE_LATEST, REPORT_STAGE_SECONDS, track_llm_call
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import REGISTRY, CONTENT_TYPE_LATEST, REPORT_STAGE_SECONDS, track_llm_call
+try:
+    from app.event_store import EventStore
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from event_store import EventStore
+try:
+    from app.responses import FastJSONResponse, CompressionMiddleware
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from responses import FastJSONResponse, CompressionMiddleware
+try:
+    from app.llm_scheduler import llm_scheduler, BACKGROUND
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from llm_scheduler import llm_scheduler, BACKGROUND
+try:
+    from app.llm_clients import LLM_PROVIDER, llm_clients
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from llm_clients import LLM_PROVIDER, llm_clients
+try:
+    from app.conversation_log import iter_conversations
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from conversation_log import iter_conversations
+try:
+    from app.prompts import compile_prompts, report_prompt
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from prompts import compile_prompts, report_prompt
+try:
+    from app.response_cache import response_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from response_cache import response_cache
+
+# 리포트 프롬프트 템플릿은 기동 시 한 번만 생성
+compile_prompts()
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware)
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
 
 # 1. 기본 데이터 로더 인터페이스
 class DataLoader:
@@ -34,19 +74,26 @@ class DataLoader:
                 self.base_path, self.user_id, "schedule", "events.json"
             )
             
-            if not os.path.exists(calendar_path):
-                print(f"캘린더 파일을 찾을 수 없음: {calendar_path}")
-                return []
-            
-            # 일정 JSON 파일 읽기
-            with open(calendar_path, "r", encoding="utf-8") as f:
-                events_data = json.load(f)
-            
-            # events 키의 데이터 추출
-            if "events" in events_data:
-                events = events_data["events"]
-            else:
-                events = events_data
+            # 기간별 일정 저장소가 있으면 지난 주 일정만 읽기
+            week_dates = self._get_previous_week_dates()
+            events = EventStore(self.base_path).range_texts(
+                self.user_id, week_dates["start_date"], week_dates["end_date"]
+            )
+
+            if events is None:
+                if not os.path.exists(calendar_path):
+                    print(f"캘린더 파일을 찾을 수 없음: {calendar_path}")
+                    return []
+
+                # 일정 JSON 파일 읽기
+                with open(calendar_path, "r", encoding="utf-8") as f:
+                    events_data = json.load(f)
+
+                # events 키의 데이터 추출
+                if "events" in events_data:
+                    events = events_data["events"]
+                else:
+                    events = events_data
             
             # 각 이벤트 파싱
             parsed_events = []
@@ -111,28 +158,22 @@ class DataLoader:
             # 모든 대화 기록 파일 찾기
             chat_histories = []
             for filename in os.listdir(history_path):
-                file_path = os.path.join(history_path, filename, "conversations.json")
-                if os.path.exists(file_path):
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        conversation_data = json.load(f)
-                        conversations = conversation_data.get("conversations", [])
-                        
-                        # 이전 주 일정에 관한 대화만 필터링
-                        filtered_conversations = []
-                        for conv in conversations:
-                            event_info = conv.get("event_info", {})
-                            event_start = event_info.get("start", "")
-                            
-                            # 이벤트 날짜 추출 (YYYY-MM-DD 형식)
-                            event_date = ""
-                            if event_start and isinstance(event_start, str) and "T" in event_start:
-                                event_date = event_start.split("T")[0].replace("-", "")
-                            
-                            # 이전 주 날짜에 해당하는 일정에 관한 대화만 포함
-                            if event_date and start_date <= event_date <= end_date:
-                                filtered_conversations.append(conv)
-                        
-                        chat_histories.extend(filtered_conversations)
+                # 지난 주 일정에 관한 대화는 그 주 시작일 이후 날짜 폴더에만 있음
+                if filename < start_date:
+                    continue
+                # 하루치 대화 로그를 한 줄씩 읽으며 이전 주 일정에 관한 대화만 필터링
+                for conv in iter_conversations(os.path.join(history_path, filename)):
+                    event_info = conv.get("event_info") or {}
+                    event_start = event_info.get("start", "")
+                    
+                    # 이벤트 날짜 추출 (YYYY-MM-DD 형식)
+                    event_date = ""
+                    if event_start and isinstance(event_start, str) and "T" in event_start:
+                        event_date = event_start.split("T")[0].replace("-", "")
+                    
+                    # 이전 주 날짜에 해당하는 일정에 관한 대화만 포함
+                    if event_date and start_date <= event_date <= end_date:
+                        chat_histories.append(conv)
             
             return chat_histories
             
@@ -375,9 +416,7 @@ class VectorRAGDataLoader(DataLoader):
         super().__init__(user_id)
         try:
             # 벡터 검색 모델 초기화 (UpstageEmbeddings 등)
-            self.embeddings = UpstageEmbeddings(
-                model="embedding-query", api_key=os.getenv("UPSTAGE_API_KEY")
-            )
+            self.embeddings = llm_clients.embeddings("embedding-query")
         except Exception as e:
             print(f"임베딩 모델 초기화 오류: {str(e)}")
             # 폴백 임베딩 모델 사용 시도
@@ -1598,30 +1637,13 @@ class LLMReportGenerator:
         try:
             # 환경 변수 확인
             api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
+            if not api_key and LLM_PROVIDER != "local":
                 raise ValueError("OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.")
             
-            # LLM 모델 초기화
-            self.llm1 = ChatOpenAI(
-                model="gpt-3.5-turbo",
-                api_key=api_key,
-                max_tokens=1000,
-                temperature=0.1
-            )
-            
-            self.llm2 = ChatOpenAI(
-                model="gpt-4.5-preview",
-                api_key=api_key,
-                max_tokens=1200,
-                temperature=0.7
-            )
-            
-            self.llm3 = ChatOpenAI(
-                model="gpt-4.5-preview",
-                api_key=api_key,
-                max_tokens=1500,
-                temperature=0.6
-            )
+            # LLM 모델 초기화 (프로세스 공용 클라이언트 재사용)
+            self.llm1 = llm_clients.chat_model("gpt-3.5-turbo", temperature=0.1, max_tokens=1000)
+            self.llm2 = llm_clients.chat_model("gpt-4.5-preview", temperature=0.7, max_tokens=1200)
+            self.llm3 = llm_clients.chat_model("gpt-4.5-preview", temperature=0.6, max_tokens=1500)
         except Exception as e:
             print(f"LLM 모델 초기화 중 오류: {str(e)}")
             traceback.print_exc()
@@ -2348,31 +2370,16 @@ One shot은 예시일 뿐이니 형식은 그대로 하되, 반드시 실제 내
             return structured_report
 
     def _get_analysis_prompt_template(self):
-        """데이터 분석 프롬프트 템플릿 생성"""
-        return ChatPromptTemplate.from_messages([
-            SystemMessagePromptTemplate.from_template(
-                "당신은 하이브리드 RAG 분석 전문가입니다. 벡터 검색과 그래프 구조 분석을 결합한 하이브리드 분석 결과를 바탕으로 사용자의 일정, 대화, 감정 데이터를 심층적으로 분석하여 통찰력 있는 결과를 제공합니다."
-            ),
-            HumanMessagePromptTemplate.from_template("{analysis_prompt}")
-        ])
+        """데이터 분석 프롬프트 템플릿 (기동 시 한 번 생성)"""
+        return report_prompt("hybrid_analysis")
     
     def _get_report_prompt_template(self):
-        """리포트 생성 프롬프트 템플릿 생성"""
-        return ChatPromptTemplate.from_messages([
-            SystemMessagePromptTemplate.from_template(
-                "당신은 하이브리드 RAG 분석과 심리 분석에 전문성을 갖춘 개인 맞춤형 회고 리포트 생성 전문가입니다. 벡터 검색과 그래프 분석이 결합된 하이브리드 RAG 분석 결과를 바탕으로 개인화된 회고 리포트를 작성합니다. 사용자의 행동, 감정, 관심사 간의 다층적 관계를 파악하여 더 심층적인 분석과 통찰력을 제공합니다."
-            ),
-            HumanMessagePromptTemplate.from_template("{report_prompt}")
-        ])
+        """리포트 생성 프롬프트 템플릿 (기동 시 한 번 생성)"""
+        return report_prompt("hybrid_report")
     
     def _get_personalization_prompt_template(self):
-        """개인화 프롬프트 템플릿 생성"""
-        return ChatPromptTemplate.from_messages([
-            SystemMessagePromptTemplate.from_template(
-                "당신은 사용자의 성향과 심리적 특성을 이해하고 이를 반영한 회고 리포트를 수정하는 전문가입니다. 기존 회고 리포트의 구조와 형식은 유지하면서, 사용자의 성향에 맞게 내용과 톤을 자연스럽게 조정해주세요."
-            ),
-            HumanMessagePromptTemplate.from_template("{personalization_prompt}")
-        ])
+        """개인화 프롬프트 템플릿 (기동 시 한 번 생성)"""
+        return report_prompt("personalization")
     
     def _get_default_tendency_prompt(self):
         """기본 성향 프롬프트 생성"""
@@ -2446,10 +2453,17 @@ MBTI: {user_tendency.get('mbti', 'N/A')}
                 {"analysis_prompt": RunnablePassthrough()}
                 | analysis_prompt_template
                 | self.llm1
-                | StrOutputParser()
             )
             
-            analysis_result = analysis_chain.invoke(analysis_prompt)
+            def call_llm():
+                with track_llm_call("report_analysis", self.llm1.model_name) as call:
+                    message = analysis_chain.invoke(analysis_prompt)
+                    call.record_usage(message)
+                return message.content
+
+            analysis_result = response_cache.get_or_call(
+                "report_analysis", self.llm1.model_name, ["hybrid_analysis", analysis_prompt], call_llm, scope=self.user_id
+            )
             return analysis_result
         except Exception as e:
             print(f"데이터 분석 중 오류 발생: {str(e)}")
@@ -2469,10 +2483,17 @@ MBTI: {user_tendency.get('mbti', 'N/A')}
                 {"report_prompt": RunnablePassthrough()}
                 | report_prompt_template
                 | self.llm2
-                | StrOutputParser()
             )
             
-            structured_report = report_chain.invoke(report_prompt)
+            def call_llm():
+                with track_llm_call("report_write", self.llm2.model_name) as call:
+                    message = report_chain.invoke(report_prompt)
+                    call.record_usage(message)
+                return message.content
+
+            structured_report = response_cache.get_or_call(
+                "report_write", self.llm2.model_name, ["hybrid_report", report_prompt], call_llm, scope=self.user_id
+            )
             return structured_report
         except Exception as e:
             print(f"구조화된 리포트 생성 중 오류 발생: {str(e)}")
@@ -2492,10 +2513,17 @@ MBTI: {user_tendency.get('mbti', 'N/A')}
                 {"personalization_prompt": RunnablePassthrough()}
                 | tendency_prompt_template
                 | self.llm3
-                | StrOutputParser()
             )
             
-            final_report = tendency_chain.invoke(personalization_prompt)
+            def call_llm():
+                with track_llm_call("report_personalize", self.llm3.model_name) as call:
+                    message = tendency_chain.invoke(personalization_prompt)
+                    call.record_usage(message)
+                return message.content
+
+            final_report = response_cache.get_or_call(
+                "report_personalize", self.llm3.model_name, ["personalization", personalization_prompt], call_llm, scope=self.user_id
+            )
             return final_report
         except Exception as e:
             print(f"리포트 개인화 중 오류 발생: {str(e)}")
@@ -2612,16 +2640,20 @@ async def generate_report(request: ReportRequest):
         hybrid_system = HybridRAGSystem(user_id)
         
         # 데이터 준비 (벡터 및 그래프 인덱스 구축)
-        hybrid_system.prepare_data()
+        with REPORT_STAGE_SECONDS.time(generator="hybrid_rag_advanced", stage="prepare_data"):
+            hybrid_system.prepare_data()
         
         # 하이브리드 데이터 가져오기
-        hybrid_data = hybrid_system.get_data_for_report()
+        with REPORT_STAGE_SECONDS.time(generator="hybrid_rag_advanced", stage="load_data"):
+            hybrid_data = hybrid_system.get_data_for_report()
         
         # LLM 리포트 생성기 초기화
         report_generator = LLMReportGenerator(user_id)
         
         # 완전한 리포트 생성
-        report_result = report_generator.generate_complete_report(hybrid_data)
+        report_result = await llm_scheduler.run(
+            report_generator.generate_complete_report, hybrid_data, user_id=user_id, priority=BACKGROUND
+        )
         
         # 실패 상태 확인
         if "error" in report_result and report_result["error"]:
@@ -1,21 +1,39 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_upstage import UpstageEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.schema import Document
 from typing import List, Dict
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import os
 import json
 
+try:
+    from app.metrics import FAISS_SAVE_SECONDS
+    from app.json_cache import json_cache
+    from app.llm_clients import llm_clients
+    from app.index_cache import index_cache
+except ModuleNotFoundError:  # app 디렉터리에서 스크립트로 실행하는 경우
+    from metrics import FAISS_SAVE_SECONDS
+    from json_cache import json_cache
+    from llm_clients import llm_clients
+    from index_cache import index_cache
+
 class UserTendency:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000,chunk_overlap=100)
-        self.embeddings = UpstageEmbeddings(model='embedding-query', api_key=os.getenv('UPSTAGE_API_KEY'))
+        self._text_splitter = None
         self.vectorstore = None
         self.base_index_path = "data/faiss"  
         os.makedirs(self.base_index_path, exist_ok=True)
 
+    # 임베딩 클라이언트와 텍스트 분할기는 처음 쓸 때 생성 (langchain import 지연)
+    @property
+    def embeddings(self):
+        return llm_clients.embeddings('embedding-query')
+
+    @property
+    def text_splitter(self):
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000,chunk_overlap=100)
+        return self._text_splitter
+
     # user 성향
     def _get_user_tendency_path(self, user_id: str) -> str:
         return os.path.join(self.base_index_path, f"{user_id}", "tendency")
@@ -46,7 +64,9 @@ class UserTendency:
     def save_index(self, user_id: str):
         if self.vectorstore:
             index_path = self._get_user_tendency_path(user_id)
-            self.vectorstore.save_local(index_path)
+            with FAISS_SAVE_SECONDS.time(kind="tendency"):
+                self.vectorstore.save_local(index_path)
+            index_cache.put(index_path, self.vectorstore, "tendency")
             print(f"인덱스가 {index_path}에 저장되었습니다.")
 
     # 성향 데이터 로드
@@ -54,11 +74,7 @@ class UserTendency:
         try:
             index_path = self._get_user_tendency_path(user_id)
             if os.path.exists(index_path):
-                return FAISS.load_local(
-                    index_path, 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
+                return index_cache.get(index_path, self.embeddings, "tendency")
             return None
         except Exception as e:
             print(f"인덱스 로드 중 에러: {str(e)}")
@@ -85,6 +101,9 @@ class UserTendency:
 
     # 유저 성향 데이터 저장
     def add_tendency_events(self, user_id: str, events: List[dict]):
+        from langchain_community.vectorstores import FAISS
+        from langchain.schema import Document
+
         try:
             # 1. 기존 인덱스 삭제
             index_path = self._get_user_tendency_path(user_id)
@@ -119,6 +138,7 @@ class UserTendency:
             
             with open(json_path, 'w', encoding='utf-8') as f:
                 json.dump(json_data, f, ensure_ascii=False, indent=2)
+            json_cache.invalidate(json_path)
             print(f"JSON 파일 저장 완료: {json_path}")
             
             # 4. FAISS 인덱스 생성 및 저장
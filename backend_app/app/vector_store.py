@@ -1,33 +1,52 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_upstage import UpstageEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.schema import Document
 from typing import List, Dict
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import os
 import json
+import threading
 
 from dotenv import load_dotenv
 
+from app.metrics import FAISS_LOAD_SECONDS, FAISS_SAVE_SECONDS
+from app.llm_clients import llm_clients
+from app.json_cache import json_cache
+from app.calendar_changes import CalendarChangeFeed
+from app.event_store import EventStore
+from app.index_cache import index_cache
+
 load_dotenv()  # .env 파일을 로드합니다
 
 
 class VectorStore:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000, chunk_overlap=100
-        )
-        self.embeddings = UpstageEmbeddings(
-            model="embedding-query", api_key=os.getenv("UPSTAGE_API_KEY")
-        )
+        self._text_splitter = None
         self.vectorstore = None
         self.base_index_path = "data/faiss"
         os.makedirs(self.base_index_path, exist_ok=True)
+        self.change_feed = CalendarChangeFeed(self.base_index_path)
+        self.event_store = EventStore(self.base_index_path)
+
+    # 임베딩 클라이언트와 텍스트 분할기는 처음 쓸 때 생성 (langchain import 지연)
+    @property
+    def embeddings(self):
+        return llm_clients.embeddings("embedding-query")
+
+    @property
+    def text_splitter(self):
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=2000, chunk_overlap=100
+            )
+        return self._text_splitter
+
+    def _schedule_path(self, user_id: str) -> str:
+        # 디렉터리를 만들지 않고 경로만 계산 (읽기 전용 조회용)
+        return os.path.join(self.base_index_path, user_id, "schedule")
 
     def _get_user_index_path(self, user_id: str) -> str:
-        user_path = os.path.join(self.base_index_path, user_id)
-        schedule_path = os.path.join(user_path, "schedule")
+        schedule_path = self._schedule_path(user_id)
         os.makedirs(schedule_path, exist_ok=True)
         return schedule_path
 
@@ -45,7 +64,9 @@ class VectorStore:
     def save_index(self, user_id: str):
         if self.vectorstore:
             index_path = self._get_user_index_path(user_id)
-            self.vectorstore.save_local(index_path)
+            with FAISS_SAVE_SECONDS.time(kind="schedule"):
+                self.vectorstore.save_local(index_path)
+            index_cache.put(index_path, self.vectorstore, "schedule")
             print(f"인덱스가 {index_path}에 저장되었습니다.")
 
     def load_index(self, user_id: str):
@@ -59,18 +80,17 @@ class VectorStore:
                 print(f"No schedule index found for user {user_id}")
                 return None
 
-            faiss_index = FAISS.load_local(
-                index_path,
-                self.embeddings,
-                allow_dangerous_deserialization=True,  # pickle 접근 허용
-            )
-            return faiss_index
+            # 파일이 바뀌지 않았으면 메모리에 올라와 있는 인덱스를 재사용 (읽기 전용으로 사용)
+            return index_cache.get(index_path, self.embeddings, "schedule")
 
         except Exception as e:
             print(f"Error loading schedule index: {str(e)}")
             return None
 
     def add_events(self, user_id: str, events: List[dict]):
+        from langchain_community.vectorstores import FAISS
+        from langchain.schema import Document
+
         try:
             index_path = self._get_user_index_path(user_id)
             if os.path.exists(index_path):
@@ -111,8 +131,14 @@ class VectorStore:
 
             with open(json_path, "w", encoding="utf-8") as f:
                 json.dump(json_data, f, ensure_ascii=False, indent=2)
+            json_cache.invalidate(json_path)
             print(f"JSON 파일 저장 완료: {json_path}")
 
+            # 변경 이력 반영
+            revision = self.change_feed.record_sync(user_id, sorted_events)
+            print(f"일정 리비전 갱신: {revision}")
+            self.event_store.build(user_id, sorted_events, formatted_events)
+
             split_docs = self.text_splitter.split_documents(documents)
             self.vectorstore = FAISS.from_documents(split_docs, self.embeddings)
             self.save_index(user_id)
@@ -131,10 +157,6 @@ class VectorStore:
         emotion_score: int,
     ) -> bool:
         try:
-            index_path = self._get_user_index_path(user_id)
-            if not os.path.exists(index_path):
-                return False
-
             event_time = event_time.split(".")[0]
             if event_time.endswith("Z"):
                 event_time = event_time[:-1]
@@ -142,58 +164,102 @@ class VectorStore:
                 f"찾는 일정: date={event_date}, time={event_time}, summary={event_summary}"
             )
 
-            # FAISS 인덱스 로드
-            schedule_faiss = FAISS.load_local(
-                index_path, self.embeddings, allow_dangerous_deserialization=True
+            result = self.update_event_emotions(
+                user_id,
+                [{"event_date": event_date, "event_summary": event_summary, "emotion_score": emotion_score}],
             )
+            return result is not None and result["updated"] > 0
 
-            # 모든 문서 가져오기
-            all_docs = list(schedule_faiss.docstore._dict.values())
-            updated_docs = []
-            found = False
-
-            for doc in all_docs:
-                event = doc.metadata.get("original_event", {})
-                event_start = event.get("start", "")
-
-                if (
-                    event_start.startswith(event_date)
-                    and event.get("summary") == event_summary
-                ):
-                    event["emotion_score"] = emotion_score
-                    doc.metadata["original_event"] = event
-                    doc.metadata["emotion_score"] = emotion_score
-                    found = True
-                    print(f"일정 찾음: {event_summary}")
-
-                updated_docs.append(doc)
-
-            if not found:
-                print("일정을 찾지 못했습니다")
-                return False
-
-            # 업데이트된 문서로 새 FAISS 인덱스 생성
-            texts = [doc.page_content for doc in updated_docs]
-            metadatas = [doc.metadata for doc in updated_docs]
+        except Exception as e:
+            print(f"감정 점수 업데이트 중 오류 발생: {str(e)}")
+            return False
 
-            new_faiss = FAISS.from_texts(texts, self.embeddings, metadatas=metadatas)
-            new_faiss.save_local(index_path)
+    def update_event_emotions(self, user_id: str, updates: List[Dict]):
+        """여러 일정의 감정 점수를 한 번에 반영하고 인덱스/JSON은 한 번만 저장
 
-            # JSON으로도 저장
-            json_path = os.path.join(index_path, "events.json")
-            events_data = {
-                "events": [
-                    doc.metadata.get("original_event", {}) for doc in updated_docs
-                ],
-                "updated_at": datetime.now(ZoneInfo("Asia/Seoul")).isoformat(),
-            }
+        각 update는 event_id(구글 일정 id 또는 변경 이력 id) 또는
+        event_date + event_summary로 일정을 찾는다.
+        """
+        index_path = self._schedule_path(user_id)
+        if not os.path.exists(os.path.join(index_path, "index.faiss")):
+            return None
 
-            with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(events_data, f, ensure_ascii=False, indent=2)
+        from langchain_community.vectorstores import FAISS
 
-            print(f"감정 점수 업데이트 완료: {event_summary}")
-            return True
+        # FAISS 인덱스 로드
+        with FAISS_LOAD_SECONDS.time(kind="schedule"):
+            schedule_faiss = FAISS.load_local(
+                index_path, self.embeddings, allow_dangerous_deserialization=True
+            )
 
-        except Exception as e:
-            print(f"감정 점수 업데이트 중 오류 발생: {str(e)}")
-            return False
+        # 모든 문서 가져오기 + id/날짜·제목 기준 조회 테이블 구성
+        all_docs = list(schedule_faiss.docstore._dict.values())
+        docs_by_id = {}
+        docs_by_day = {}
+        for doc in all_docs:
+            event = doc.metadata.get("original_event", {})
+            if event.get("id"):
+                docs_by_id.setdefault(event["id"], []).append(doc)
+                docs_by_id.setdefault(self.change_feed.event_key(event), []).append(doc)
+            day_key = (event.get("start", "")[:10], event.get("summary"))
+            docs_by_day.setdefault(day_key, []).append(doc)
+
+        changed_events = {}
+        not_found = []
+        for i, update in enumerate(updates):
+            if update.get("event_id"):
+                docs = docs_by_id.get(update["event_id"], [])
+            else:
+                docs = docs_by_day.get((update.get("event_date", "")[:10], update.get("event_summary")), [])
+
+            if not docs:
+                not_found.append(i)
+                continue
+
+            for doc in docs:
+                event = doc.metadata.get("original_event", {})
+                event["emotion_score"] = update["emotion_score"]
+                doc.metadata["original_event"] = event
+                doc.metadata["emotion_score"] = update["emotion_score"]
+                changed_events[id(event)] = event
+            print(f"일정 찾음: {update.get('event_summary') or update.get('event_id')}")
+
+        if not changed_events:
+            print("일정을 찾지 못했습니다")
+            return {"updated": 0, "not_found": not_found}
+
+        # 문서 본문은 그대로이므로 재임베딩 없이 메타데이터만 바꿔 저장
+        with FAISS_SAVE_SECONDS.time(kind="schedule"):
+            schedule_faiss.save_local(index_path)
+        index_cache.put(index_path, schedule_faiss, "schedule")
+
+        # JSON으로도 저장
+        events = [doc.metadata.get("original_event", {}) for doc in all_docs]
+        json_path = os.path.join(index_path, "events.json")
+        events_data = {
+            "events": events,
+            "updated_at": datetime.now(ZoneInfo("Asia/Seoul")).isoformat(),
+        }
+
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(events_data, f, ensure_ascii=False, indent=2)
+        json_cache.invalidate(json_path)
+        self.change_feed.record_upserts(user_id, list(changed_events.values()))
+        self.event_store.build(user_id, events, [self._format_event_text(event) for event in events])
+
+        print(f"감정 점수 업데이트 완료: {len(updates) - len(not_found)}건")
+        return {"updated": len(updates) - len(not_found), "not_found": not_found}
+
+
+_vector_store = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """프로세스 전체에서 공유하는 VectorStore (처음 호출할 때 생성)"""
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = VectorStore()
+    return _vector_store
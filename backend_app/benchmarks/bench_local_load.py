@@ -0,0 +1,147 @@
+"""로컬 공급자로 일정 동기화 + 대화 턴 부하 벤치마크 (API 키/네트워크 불필요)
+
+LLM_PROVIDER=local, EMBEDDING_PROVIDER=local(app/local_providers.py)로 실제 코드 경로를
+그대로 실행한다. 임시 디렉터리에 가상 사용자들의 어제 일정을 동기화(VectorStore.add_events)한 뒤
+서버처럼 하나의 LLMService에 사용자마다 스레드 하나로 첫 질문 + 대화 턴
+(LLMService.generate_answer_with_similarity)을 동시에 보내고 다음을 출력한다.
+  - 일정 동기화 시간
+  - 대화 턴 지연시간 (p50/p95/최대) 과 초당 처리 턴 수
+  - LLM/임베딩 호출 수
+  - 저장된 대화 턴이 모두 해당 사용자의 일정에 대한 것인지 (사용자 간 상태 섞임 확인)
+
+외부 API 지연을 흉내 내려면 LOCAL_LLM_LATENCY, LOCAL_LLM_LATENCY_PER_TOKEN,
+LOCAL_EMBEDDING_LATENCY(초)를 설정한다.
+
+사용법: python benchmarks/bench_local_load.py [사용자 수] [사용자당 턴 수] [사용자당 일정 수]
+예) LOCAL_LLM_LATENCY=0.5 python benchmarks/bench_local_load.py 20 5 8
+"""
+import os
+import sys
+# 백엔드 디렉토리를 Python 경로에 추가합니다
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# app 모듈을 import하기 전에 공급자를 정해야 함
+os.environ.setdefault("LLM_PROVIDER", "local")
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
+
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+SUMMARIES = ["아침 산책", "팀 회의", "점심 약속", "헬스", "영상 편집", "친구와 저녁", "독서", "병원 진료", "장보기", "온라인 강의"]
+ANSWERS = [
+    "생각보다 괜찮았어요. 날씨가 좋아서 기분이 좋았어요.",
+    "조금 지쳤어요. 해야 할 일이 많아서 정신이 없었어요.",
+    "재미있었어요! 오랜만에 이야기를 많이 나눴어요.",
+    "그냥 그랬어요. 특별한 일은 없었어요.",
+    "힘들었지만 끝내고 나니 뿌듯했어요.",
+]
+
+
+def make_events(user_index: int, count: int):
+    yesterday = (datetime.now(ZoneInfo("Asia/Seoul")) - timedelta(days=1)).strftime("%Y-%m-%d")
+    events = []
+    for i in range(count):
+        hour = 7 + i
+        events.append({
+            "id": f"bench-{user_index}-{i}",
+            "summary": SUMMARIES[(user_index + i) % len(SUMMARIES)],
+            "start": f"{yesterday}T{hour:02d}:00:00+09:00",
+            "end": f"{yesterday}T{hour:02d}:50:00+09:00",
+            "calendar_info": {"summary": "기본"},
+            "emotion_score": (user_index + i) % 6,
+        })
+    return events
+
+
+def percentile(values, ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+def metric_total(counter, **labels) -> float:
+    return sum(
+        value for key, value in counter.items()
+        if all(dict(zip(counter.labelnames, key)).get(name) == expected for name, expected in labels.items())
+    )
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    events_per_user = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+
+    # data/faiss 등 상대 경로 데이터는 임시 디렉터리에 생성
+    workdir = tempfile.mkdtemp(prefix="bench_local_load_")
+    os.chdir(workdir)
+
+    from app.conversation_log import iter_conversations
+    from app.llm_rag import ConversationHistory, LLMService
+    from app.metrics import EMBEDDING_REQUESTS_TOTAL, LLM_REQUESTS_TOTAL
+    from app.vector_store import VectorStore
+
+    print(f"공급자: LLM={os.environ['LLM_PROVIDER']}, 임베딩={os.environ['EMBEDDING_PROVIDER']}")
+    print(f"사용자 {users}명 x 턴 {turns}회, 사용자당 일정 {events_per_user}개 (작업 디렉터리 {workdir})")
+
+    vector_store = VectorStore()
+    history = ConversationHistory(vector_store)
+    service = LLMService(vector_store)
+    user_ids = [f"bench{i}@example.com" for i in range(users)]
+
+    try:
+        start = time.perf_counter()
+        for index, user_id in enumerate(user_ids):
+            vector_store.add_events(user_id, make_events(index, events_per_user))
+        sync_seconds = time.perf_counter() - start
+
+        def run_user(user_id):
+            latencies = []
+            started = time.perf_counter()
+            service.ask_about_event(user_id, history)
+            latencies.append(("init", time.perf_counter() - started))
+            for turn in range(turns):
+                started = time.perf_counter()
+                service.generate_answer_with_similarity(ANSWERS[turn % len(ANSWERS)], history, user_id)
+                latencies.append(("turn", time.perf_counter() - started))
+            return latencies
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            results = list(executor.map(run_user, user_ids))
+        chat_seconds = time.perf_counter() - start
+        history.writer.close()
+        history.index_store.close()
+
+        # 각 사용자의 대화 기록에 다른 사용자의 일정이 섞이지 않았는지 확인
+        mixed = 0
+        for index, user_id in enumerate(user_ids):
+            for turn in iter_conversations(history._get_user_history_path(user_id)):
+                event_id = (turn.get("event_info") or {}).get("id", "")
+                if not event_id.startswith(f"bench-{index}-"):
+                    mixed += 1
+    finally:
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    init_latencies = [seconds for result in results for kind, seconds in result if kind == "init"]
+    turn_latencies = [seconds for result in results for kind, seconds in result if kind == "turn"]
+
+    print(f"\n일정 동기화: {sync_seconds:.3f}s ({sync_seconds / users * 1e3:.1f}ms/사용자)")
+    for name, values in (("첫 질문", init_latencies), ("대화 턴", turn_latencies)):
+        if not values:
+            continue
+        print(
+            f"{name}: p50 {percentile(values, 0.5) * 1e3:8.1f}ms  p95 {percentile(values, 0.95) * 1e3:8.1f}ms"
+            f"  최대 {max(values) * 1e3:8.1f}ms  ({len(values)}회)"
+        )
+    print(f"처리량: {len(turn_latencies) / chat_seconds:.1f}턴/s (전체 {chat_seconds:.3f}s)")
+    print(f"LLM 호출: {metric_total(LLM_REQUESTS_TOTAL):.0f}회 (오류 {metric_total(LLM_REQUESTS_TOTAL, status='error'):.0f})")
+    print(f"임베딩 호출: {metric_total(EMBEDDING_REQUESTS_TOTAL):.0f}회 (오류 {metric_total(EMBEDDING_REQUESTS_TOTAL, status='error'):.0f})")
+    print(f"다른 사용자 일정으로 저장된 턴: {mixed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""미들웨어 요청당 오버헤드 벤치마크
+
+/chat과 같은 형태의 POST 요청을 ASGI 앱에 직접 넣어(네트워크 없이) 다음 구성을
+비교한다.
+  - none   : 미들웨어 없음
+  - legacy : 이전 구성 (본문을 다시 파싱하는 BaseHTTPMiddleware 기반 UserMiddleware
+             + BaseHTTPMiddleware 기반 MetricsMiddleware)
+  - current: 현재 구성 (순수 ASGI MetricsMiddleware, user_id는 요청 모델에서 사용)
+
+사용법: python benchmarks/bench_middleware.py [요청 수]
+"""
+import os
+import sys
+# 백엔드 디렉토리를 Python 경로에 추가합니다
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+from pydantic import BaseModel
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT, MetricsMiddleware
+
+BODY = json.dumps({"user_id": "bench@example.com", "message": "오늘 회의는 어땠어?" * 10}, ensure_ascii=False).encode("utf-8")
+
+
+class ChatRequest(BaseModel):
+    user_id: str
+    message: str = None
+
+
+# 이전 구성 재현
+class LegacyUserMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in ["/sync-calendar", "/chat", "/init-chat", "/emotion", "/sync-tendency"]:
+            body = await request.json()
+            request.state.user_id = body.get("user_id")
+        return await call_next(request)
+
+
+class LegacyMetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        method = request.method
+        start = time.perf_counter()
+        status = 500
+        with HTTP_REQUESTS_IN_FLIGHT.track_inprogress(method=method, route=request.url.path):
+            try:
+                response = await call_next(request)
+                status = response.status_code
+                return response
+            finally:
+                route = request.scope.get("route")
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - start, method=method,
+                    route=getattr(route, "path", "unmatched"), status=str(status)
+                )
+
+
+def build_app(mode: str) -> FastAPI:
+    app = FastAPI()
+
+    if mode == "legacy":
+        @app.post("/chat")
+        async def chat_legacy(chat_request: ChatRequest, request: Request):
+            return {"message": request.state.user_id}
+
+        app.add_middleware(LegacyUserMiddleware)
+        app.add_middleware(LegacyMetricsMiddleware)
+    else:
+        @app.post("/chat")
+        async def chat(chat_request: ChatRequest):
+            return {"message": chat_request.user_id}
+
+        if mode == "current":
+            app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def call(app):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat",
+        "raw_path": b"/chat",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(BODY)).encode())],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 8000),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": BODY, "more_body": False}
+
+    status = None
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    assert status == 200, status
+
+
+async def run(mode: str, count: int) -> float:
+    app = build_app(mode)
+    for _ in range(200):  # 워밍업
+        await call(app)
+    start = time.perf_counter()
+    for _ in range(count):
+        await call(app)
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    results = {mode: asyncio.run(run(mode, count)) for mode in ("none", "legacy", "current")}
+
+    print(f"요청 수: {count}")
+    for mode, elapsed in results.items():
+        overhead = elapsed - results["none"]
+        print(f"{mode:<8} {elapsed * 1e6:8.1f}us/req  (미들웨어 오버헤드 {overhead * 1e6:7.1f}us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""대화 프롬프트 템플릿 생성 시간 / 턴당 프롬프트 토큰 벤치마크
+
+다음 두 방식을 비교한다.
+  - 매 턴 생성: 턴마다 ChatPromptTemplate.from_messages로 상담사 지시문 템플릿을 새로 만듦
+  - 미리 생성: app.prompts.chat_prompt()로 한 번 만든 템플릿을 재사용
+
+그리고 예시 턴들로 실제 메시지를 만들어 턴당 토큰 수(고정 지시문 / 맥락 / 입력)와
+고정 지시문이 매 턴 바이트 단위로 같은지(제공자 프리픽스 캐시 적용 조건)를 출력한다.
+토큰 수는 tiktoken을 쓸 수 있으면 cl100k_base 기준, 아니면 글자 수 추정치다.
+
+사용법: python benchmarks/bench_prompts.py [반복 횟수]
+"""
+import os
+import sys
+# 백엔드 디렉토리를 Python 경로에 추가합니다
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import hashlib
+import time
+
+from app.context_builder import count_tokens
+from app.prompts import COUNSELOR_SYSTEM_PROMPT, chat_prompt
+
+SAMPLE_TURNS = [
+    ("아침에 산책했는데 기분이 좋았어요", "일정: 아침 산책 (07:00) (유사도: 0.8123)"),
+    ("회의가 길어져서 좀 지쳤어요", "일정: 팀 회의 (10:00) (유사도: 0.7712)\n\nBot: 어제 회의는 어땠어요? \n User: 길었어요 (유사도: 0.6421)"),
+    ("저녁엔 친구랑 밥 먹었어요", "일정: 친구와 저녁 (19:00) (유사도: 0.8455)\n\n현재 대화 중인 일정: 친구와 저녁"),
+]
+
+
+def build_per_turn():
+    from langchain_core.prompts import ChatPromptTemplate
+
+    # 이전 방식: 고정 지시문과 맥락을 한 system 템플릿으로 매 턴 생성
+    return ChatPromptTemplate.from_messages([
+        ("system", COUNSELOR_SYSTEM_PROMPT + "\n---\nCONTEXT:\n{context}"),
+        ("human", "{input}"),
+    ])
+
+
+def timed(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    # langchain import 시간은 제외
+    build_per_turn()
+    first = time.perf_counter()
+    chat_prompt()
+    compile_once = time.perf_counter() - first
+
+    per_turn = timed(build_per_turn, iterations)
+    cached = timed(chat_prompt, iterations)
+    print(f"템플릿 생성 (반복 {iterations}회 평균)")
+    print(f"  매 턴 생성:  {per_turn * 1e6:10.1f}us/턴")
+    print(f"  미리 생성:   {cached * 1e6:10.1f}us/턴 (최초 1회 {compile_once * 1e3:.2f}ms)")
+
+    user_input, context = SAMPLE_TURNS[0]
+    format_old = timed(lambda: build_per_turn().format_messages(input=user_input, context=context), iterations)
+    format_new = timed(lambda: chat_prompt().format_messages(input=user_input, context=context), iterations)
+    print(f"템플릿 생성 + 메시지 포맷")
+    print(f"  매 턴 생성:  {format_old * 1e6:10.1f}us/턴")
+    print(f"  미리 생성:   {format_new * 1e6:10.1f}us/턴")
+
+    print("\n턴당 프롬프트 토큰")
+    print(f"  {'턴':>2}  {'고정 지시문':>10}  {'맥락':>6}  {'입력':>6}  {'합계':>6}  고정 지시문 해시")
+    prefixes = set()
+    for turn, (user_input, context) in enumerate(SAMPLE_TURNS, 1):
+        messages = chat_prompt().format_messages(input=user_input, context=context)
+        static, variable, human = (message.content for message in messages)
+        digest = hashlib.sha256(static.encode("utf-8")).hexdigest()[:12]
+        prefixes.add(digest)
+        tokens = [count_tokens(static), count_tokens(variable), count_tokens(human)]
+        print(f"  {turn:>2}  {tokens[0]:>10}  {tokens[1]:>6}  {tokens[2]:>6}  {sum(tokens):>6}  {digest}")
+
+    static_tokens = count_tokens(COUNSELOR_SYSTEM_PROMPT)
+    print(f"\n고정 지시문이 모든 턴에서 동일: {'예' if len(prefixes) == 1 else '아니오'}")
+    print(f"프리픽스 캐시 대상 토큰(턴당): {static_tokens} (OpenAI는 1024토큰 이상일 때 적용)")
+
+
+if __name__ == "__main__":
+    main()
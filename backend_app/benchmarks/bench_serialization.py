@@ -0,0 +1,84 @@
+"""응답 직렬화/압축 벤치마크
+
+backend_app/faiss의 샘플 JSON(일정, 대화 기록, 회고 리포트 등)을 대상으로
+기본 JSONResponse 방식(json.dumps)과 FastJSONResponse(orjson) 방식의
+직렬화 시간, 그리고 원본/gzip/brotli 응답 크기를 비교한다.
+
+사용법: python benchmarks/bench_serialization.py [샘플 디렉터리]
+"""
+import os
+import sys
+# 백엔드 디렉토리를 Python 경로에 추가합니다
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import glob
+import gzip
+import json
+import timeit
+
+from app.responses import json_dumps, orjson, brotli, GZIP_LEVEL, BROTLI_QUALITY
+
+REPEAT = 5
+
+
+def default_dumps(data) -> bytes:
+    # starlette JSONResponse.render와 동일한 설정
+    return json.dumps(
+        data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def best_time(func, data) -> float:
+    number = max(1, int(2000 / max(1, len(default_dumps(data)) // 1000 + 1)))
+    return min(timeit.repeat(lambda: func(data), number=number, repeat=REPEAT)) / number
+
+
+def main():
+    sample_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "faiss")
+    paths = sorted(glob.glob(os.path.join(sample_dir, "**", "*.json"), recursive=True))
+    if not paths:
+        print(f"샘플 JSON을 찾을 수 없음: {sample_dir}")
+        return
+
+    print(f"serializer: {'orjson' if orjson else 'json (orjson 미설치)'}, brotli: {'사용' if brotli else '미설치'}")
+    print(f"{'file':<48} {'raw':>8} {'gzip':>8} {'br':>8} {'json.dumps':>11} {'fast':>9} {'x':>5}")
+
+    totals = {"raw": 0, "gzip": 0, "br": 0, "default": 0.0, "fast": 0.0}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        body = json_dumps(data)
+        gz_size = len(gzip.compress(body, compresslevel=GZIP_LEVEL))
+        br_size = len(brotli.compress(body, quality=BROTLI_QUALITY)) if brotli else "-"
+        default_time = best_time(default_dumps, data)
+        fast_time = best_time(json_dumps, data)
+
+        totals["raw"] += len(body)
+        totals["gzip"] += gz_size
+        totals["br"] += br_size if brotli else 0
+        totals["default"] += default_time
+        totals["fast"] += fast_time
+
+        name = os.path.relpath(path, sample_dir)
+        if len(name) > 48:
+            name = "..." + name[-45:]
+        print(
+            f"{name:<48} {len(body):>8} {gz_size:>8} {br_size:>8} "
+            f"{default_time * 1e6:>9.1f}us {fast_time * 1e6:>7.1f}us {default_time / fast_time:>5.1f}"
+        )
+
+    print("-" * 104)
+    print(
+        f"{'total (' + str(len(paths)) + ' files)':<48} {totals['raw']:>8} {totals['gzip']:>8} {totals['br'] if brotli else '-':>8} "
+        f"{totals['default'] * 1e6:>9.1f}us {totals['fast'] * 1e6:>7.1f}us {totals['default'] / totals['fast']:>5.1f}"
+    )
+    print(f"gzip: 원본 대비 {totals['gzip'] / totals['raw']:.1%}", end="")
+    if brotli:
+        print(f", brotli: 원본 대비 {totals['br'] / totals['raw']:.1%}")
+    else:
+        print()
+
+
+if __name__ == "__main__":
+    main()
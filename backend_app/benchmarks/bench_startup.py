@@ -0,0 +1,78 @@
+"""서버 기동(import) 시간 벤치마크
+
+새 파이썬 프로세스에서 `python -X importtime -c "import app.backend"`를 실행해
+다음을 출력한다.
+  - 전체 실행 시간 / import 누적 시간
+  - 누적 import 시간이 긴 상위 모듈
+  - app.* 모듈별 import 시간
+
+첫 실행은 .pyc 생성 때문에 느리므로 여러 번 실행해 가장 빠른 결과를 사용한다.
+
+사용법: python benchmarks/bench_startup.py [모듈] [실행 횟수] [상위 N개]
+예) python benchmarks/bench_startup.py app.backend 5 20
+"""
+import os
+import sys
+# 백엔드 디렉토리를 Python 경로에 추가합니다
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import subprocess
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def measure(module: str):
+    """(전체 실행 시간 초, {모듈: (자체 us, 누적 us)}) 반환"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"{module} import 실패:\n" + "\n".join(errors[-10:]))
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # 형식: "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return wall, timings
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "app.backend"
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    top = int(sys.argv[3]) if len(sys.argv) > 3 else 15
+
+    results = [measure(module) for _ in range(runs)]
+    wall, timings = min(results, key=lambda r: r[0])
+    total_import = timings.get(module, (0, 0))[1]
+
+    print(f"모듈: {module} (실행 {runs}회 중 최소)")
+    print(f"전체 실행 시간: {wall * 1000:8.1f}ms")
+    print(f"import 누적 시간: {total_import / 1000:8.1f}ms")
+    print(f"로드된 모듈 수: {len(timings)}")
+
+    print(f"\n--- 누적 import 시간 상위 {top}개 (최상위 패키지 기준) ---")
+    packages = {}
+    for name, (_, cumulative) in timings.items():
+        package = name.split(".")[0]
+        if package == "app":
+            continue
+        packages[package] = max(packages.get(package, 0), cumulative)
+    for package, cumulative in sorted(packages.items(), key=lambda x: x[1], reverse=True)[:top]:
+        print(f"{package:<40} {cumulative / 1000:8.1f}ms")
+
+    print("\n--- app 모듈별 import 시간 ---")
+    for name, (self_us, cumulative) in sorted(timings.items(), key=lambda x: x[1][1], reverse=True):
+        if name == "app" or name.startswith("app."):
+            print(f"{name:<40} 자체 {self_us / 1000:7.1f}ms  누적 {cumulative / 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""pytest 공통 설정
+
+app 모듈을 import하기 전에 로컬 공급자(app/local_providers.py)를 지정해 API 키/네트워크
+없이 실제 코드 경로를 실행한다.
+"""
+import os
+import sys
+# 백엔드 디렉토리를 Python 경로에 추가합니다
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault("LLM_PROVIDER", "local")
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
@@ -0,0 +1,109 @@
+import os
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def _event(event_id: str, summary: str, start: str) -> dict:
+    return {
+        "id": event_id,
+        "summary": summary,
+        "start": start,
+        "end": start.replace("T10", "T11"),
+        "calendar_info": {"id": "primary", "summary": "기본"},
+    }
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from app import backend
+
+    # lifespan(워밍업/스케줄러)은 띄우지 않고 라우트만 호출
+    return backend
+
+
+@pytest.fixture
+def user_id():
+    return f"user-{uuid.uuid4().hex[:8]}"
+
+
+def test_get_calendar_conditional_get(backend, user_id):
+    client = TestClient(backend.app)
+    backend.vector_store.add_events(user_id, [_event("a", "팀 회의", "2025-01-01T10:00:00+09:00")])
+
+    first = client.get("/get-calendar", params={"user_id": user_id})
+    assert first.status_code == 200
+    assert first.json()["message"] == "일정 조회 성공"
+    etag = first.headers["etag"]
+    assert first.headers["last-modified"]
+
+    cached = client.get("/get-calendar", params={"user_id": user_id}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    weak = client.get("/get-calendar", params={"user_id": user_id}, headers={"If-None-Match": f"W/{etag}"})
+    assert weak.status_code == 304
+
+    since = client.get(
+        "/get-calendar", params={"user_id": user_id},
+        headers={"If-Modified-Since": first.headers["last-modified"]},
+    )
+    assert since.status_code == 304
+
+    # 다시 동기화해 파일이 바뀌면 새 ETag로 전체 응답
+    time.sleep(0.01)
+    backend.vector_store.add_events(user_id, [
+        _event("a", "팀 회의", "2025-01-01T10:00:00+09:00"),
+        _event("b", "점심 약속", "2025-01-01T12:00:00+09:00"),
+    ])
+    changed = client.get("/get-calendar", params={"user_id": user_id}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()["events"]) == 2
+
+
+def test_etag_differs_per_query(backend, user_id):
+    client = TestClient(backend.app)
+    backend.vector_store.add_events(user_id, [_event("a", "팀 회의", "2025-01-01T10:00:00+09:00")])
+
+    etag = client.get("/get-calendar", params={"user_id": user_id}).headers["etag"]
+    path = os.path.join("data", "faiss", user_id, "schedule", "events.json")
+    version = backend.json_cache.stat(path)
+    # 같은 파일이어도 다른 쿼리의 응답에는 그 ETag가 맞지 않음
+    assert etag != version.etag()
+    assert etag == version.etag(f"/get-calendar?user_id={user_id}")
+
+
+def test_get_calendar_since_returns_only_changes(backend, user_id):
+    client = TestClient(backend.app)
+    backend.vector_store.add_events(user_id, [
+        _event("a", "팀 회의", "2025-01-01T10:00:00+09:00"),
+        _event("b", "점심 약속", "2025-01-01T12:00:00+09:00"),
+    ])
+    full = client.get("/get-calendar", params={"user_id": user_id, "since": 0}).json()
+    assert full["full"] is True
+    assert [item["id"] for item in full["events"]] == ["primary:a", "primary:b"]
+    revision = full["revision"]
+
+    # a 수정, b 삭제, c 추가
+    backend.vector_store.add_events(user_id, [
+        _event("a", "팀 회의 (연기)", "2025-01-01T10:00:00+09:00"),
+        _event("c", "헬스", "2025-01-01T19:00:00+09:00"),
+    ])
+    delta = client.get("/get-calendar", params={"user_id": user_id, "since": revision}).json()
+    assert delta["full"] is False
+    assert delta["revision"] > revision
+    assert sorted(item["id"] for item in delta["events"]) == ["primary:a", "primary:c"]
+    assert delta["deleted"] == ["primary:b"]
+
+    latest = client.get("/get-calendar", params={"user_id": user_id, "since": delta["revision"]}).json()
+    assert latest["events"] == [] and latest["deleted"] == []
+
+    # 알 수 없는 (미래) 리비전이면 전체 일정을 다시 내려줌
+    ahead = client.get("/get-calendar", params={"user_id": user_id, "since": delta["revision"] + 100}).json()
+    assert ahead["full"] is True
+    assert sorted(item["id"] for item in ahead["events"]) == ["primary:a", "primary:c"]
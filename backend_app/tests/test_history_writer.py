@@ -0,0 +1,188 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from app import history_writer as hw
+from app.history_writer import HistoryWriteBehind, PartialPersistError
+
+
+@pytest.fixture(autouse=True)
+def fast_writer(monkeypatch):
+    monkeypatch.setattr(hw, "HISTORY_WRITE_INTERVAL", 0.01)
+    monkeypatch.setattr(hw, "HISTORY_WRITE_RETRY_DELAY", 0.01)
+    monkeypatch.setattr(hw, "HISTORY_SPOOL_FSYNC", False)
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _turn(user_id: str, n: int) -> dict:
+    return {
+        "user_id": user_id,
+        "date": "20250101",
+        "bot_question": f"질문 {n}",
+        "user_answer": f"답변 {n}",
+        "event_info": None,
+        "emotion": None,
+        "timestamp": f"2025-01-01T10:00:{n:02d}+09:00",
+    }
+
+
+def _read_spool(path: str):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_spool_of_dead_process_is_replayed_as_recovered(tmp_path):
+    spool_dir = str(tmp_path / "spool")
+    os.makedirs(spool_dir)
+    dead_path = os.path.join(spool_dir, f"history_spool.{_dead_pid()}.jsonl")
+    with open(dead_path, "w", encoding="utf-8") as f:
+        for n in range(3):
+            f.write(json.dumps(_turn("alice", n), ensure_ascii=False) + "\n")
+        f.write("{손상된 줄\n")
+
+    persisted = []
+    writer = HistoryWriteBehind(persisted.extend, spool_dir)
+    writer.start()
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert [record["timestamp"] for record in persisted] == [_turn("alice", n)["timestamp"] for n in range(3)]
+    assert all(record["recovered"] for record in persisted)
+    assert not os.path.exists(dead_path)
+    assert _read_spool(writer.spool_path) == []
+
+
+def test_spool_of_live_process_is_left_alone(tmp_path):
+    spool_dir = str(tmp_path / "spool")
+    os.makedirs(spool_dir)
+    # pytest를 실행 중인 부모 프로세스는 살아 있으므로 다른 프로세스의 스풀로 취급됨
+    live_path = os.path.join(spool_dir, f"history_spool.{os.getppid()}.jsonl")
+    with open(live_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(_turn("alice", 0), ensure_ascii=False) + "\n")
+
+    persisted = []
+    writer = HistoryWriteBehind(persisted.extend, spool_dir)
+    writer.start()
+    writer.close()
+
+    assert persisted == []
+    assert len(_read_spool(live_path)) == 1
+
+
+def test_partial_failure_retries_only_failed_turns(tmp_path):
+    calls = []
+    failed_once = threading.Event()
+
+    def persist(records):
+        calls.append([dict(record) for record in records])
+        if not failed_once.is_set():
+            failed_once.set()
+            raise PartialPersistError([record for record in records if record["user_id"] == "bob"], "bob 저장 실패")
+
+    writer = HistoryWriteBehind(persist, str(tmp_path / "spool"))
+    writer.start()
+    # 한 배치로 모이도록 저장 스레드가 큐를 비우기 전에 한꺼번에 넣음
+    with writer._lock:
+        for n in range(2):
+            for user_id in ("alice", "bob"):
+                record = _turn(user_id, n)
+                line = json.dumps(record, ensure_ascii=False) + "\n"
+                writer._spool([line])
+                writer._add(record, line)
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert len(calls) == 2
+    assert len(calls[0]) == 4
+    # 재시도에는 실패한 사용자의 턴만, 이미 저장됐을 수 있다는 표시와 함께 들어감
+    assert [record["user_id"] for record in calls[1]] == ["bob", "bob"]
+    assert all(record["recovered"] for record in calls[1])
+    assert _read_spool(writer.spool_path) == []
+
+
+def test_failed_turns_stay_in_spool_until_saved(tmp_path):
+    release = threading.Event()
+
+    def persist(records):
+        if not release.is_set():
+            raise RuntimeError("디스크 오류")
+
+    writer = HistoryWriteBehind(persist, str(tmp_path / "spool"))
+    writer.submit(_turn("alice", 0))
+    assert not writer.flush(timeout=0.2)
+    assert [record["timestamp"] for record in _read_spool(writer.spool_path)] == [_turn("alice", 0)["timestamp"]]
+
+    release.set()
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert _read_spool(writer.spool_path) == []
+
+
+def _history(tmp_path, monkeypatch):
+    from app.llm_rag import ConversationHistory
+
+    monkeypatch.chdir(tmp_path)
+    return ConversationHistory()
+
+
+def _indexed_timestamps(history, user_id: str, date: str):
+    path = os.path.join(history.base_index_path, user_id, "history", date)
+    index = history.index_store.get(user_id, path)
+    if index is None:
+        return []
+    return sorted(doc.metadata["timestamp"] for doc in index.docstore._dict.values())
+
+
+def test_retry_does_not_duplicate_groups_that_were_saved(tmp_path, monkeypatch):
+    from app import llm_rag
+    from app.conversation_log import append_conversations, iter_conversations
+
+    history = _history(tmp_path, monkeypatch)
+    failures = {"bob": 1}
+
+    def flaky_append(history_path, records):
+        user_id = records[0]["user_id"] if records else None
+        if failures.get(user_id):
+            failures[user_id] -= 1
+            raise OSError("디스크 오류")
+        append_conversations(history_path, records)
+
+    monkeypatch.setattr(llm_rag, "append_conversations", flaky_append)
+
+    batch = [_turn(user_id, n) for n in range(3) for user_id in ("alice", "bob")]
+    with pytest.raises(PartialPersistError) as error:
+        history._persist_batch(batch)
+    assert {record["user_id"] for record in error.value.failed} == {"bob"}
+
+    # 배치 전체가 다시 들어와도 (스풀 복구) 이미 저장된 턴은 건너뜀
+    history._persist_batch([dict(record, recovered=True) for record in batch])
+
+    expected = sorted(_turn("alice", n)["timestamp"] for n in range(3))
+    for user_id in ("alice", "bob"):
+        path = os.path.join(history.base_index_path, user_id, "history", "20250101")
+        assert sorted(turn["timestamp"] for turn in iter_conversations(path)) == expected
+        assert _indexed_timestamps(history, user_id, "20250101") == expected
+
+
+def test_replayed_turns_missing_from_index_are_reindexed(tmp_path, monkeypatch):
+    from app.conversation_log import append_conversations
+
+    history = _history(tmp_path, monkeypatch)
+    turns = [_turn("alice", n) for n in range(2)]
+    # 로그에만 저장되고 인덱스 반영 전에 프로세스가 종료된 상황
+    append_conversations(history._get_user_history_path("alice", "20250101"), turns)
+
+    history._persist_batch([dict(record, recovered=True) for record in turns])
+
+    assert _indexed_timestamps(history, "alice", "20250101") == sorted(turn["timestamp"] for turn in turns)
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import pytest
+
+from app.llm_scheduler import BACKGROUND, INTERACTIVE, LLMQueueTimeout, LLMScheduler
+
+
+def test_waiters_run_by_priority_then_arrival():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, max_per_user=1, max_background=1, queue_timeout=5)
+        await scheduler.acquire("holder", INTERACTIVE)
+        order = []
+
+        async def job(user_id, priority):
+            await scheduler.acquire(user_id, priority)
+            order.append(user_id)
+            scheduler.release(user_id, priority)
+
+        tasks = [
+            asyncio.create_task(job("bg-1", BACKGROUND)),
+            asyncio.create_task(job("chat-1", INTERACTIVE)),
+            asyncio.create_task(job("bg-2", BACKGROUND)),
+            asyncio.create_task(job("chat-2", INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        scheduler.release("holder", INTERACTIVE)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["chat-1", "chat-2", "bg-1", "bg-2"]
+
+
+def test_background_cap_leaves_slots_for_chat():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=3, max_per_user=1, max_background=1, queue_timeout=5)
+        await scheduler.acquire("bg-1", BACKGROUND)
+        blocked = asyncio.create_task(scheduler.acquire("bg-2", BACKGROUND))
+        await asyncio.sleep(0)
+        # 백그라운드 한도에 걸린 작업이 앞에 있어도 대화는 바로 슬롯을 받음
+        await asyncio.wait_for(scheduler.acquire("chat-1", INTERACTIVE), 1)
+        assert not blocked.done()
+
+        scheduler.release("bg-1", BACKGROUND)
+        await asyncio.wait_for(blocked, 1)
+        return scheduler._running, dict(scheduler._running_by_priority)
+
+    running, by_priority = asyncio.run(scenario())
+    assert running == 2
+    assert by_priority == {BACKGROUND: 1, INTERACTIVE: 1}
+
+
+def test_per_user_limit_does_not_block_other_users():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=4, max_per_user=1, max_background=4, queue_timeout=5)
+        await scheduler.acquire("alice", INTERACTIVE)
+        second = asyncio.create_task(scheduler.acquire("alice", INTERACTIVE))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(scheduler.acquire("bob", INTERACTIVE), 1)
+        assert not second.done()
+
+        scheduler.release("alice", INTERACTIVE)
+        await asyncio.wait_for(second, 1)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_queue_without_taking_a_slot():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, max_per_user=1, max_background=1, queue_timeout=5)
+        await scheduler.acquire("holder", INTERACTIVE)
+        cancelled = asyncio.create_task(scheduler.acquire("gone", INTERACTIVE))
+        waiting = asyncio.create_task(scheduler.acquire("next", INTERACTIVE))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert len(scheduler._waiters) == 1
+
+        scheduler.release("holder", INTERACTIVE)
+        await asyncio.wait_for(waiting, 1)
+        return dict(scheduler._running_by_user)
+
+    assert asyncio.run(scenario()) == {"next": 1}
+
+
+def test_cancel_after_grant_returns_the_slot():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, max_per_user=1, max_background=1, queue_timeout=5)
+        await scheduler.acquire("holder", INTERACTIVE)
+        granted = asyncio.create_task(scheduler.acquire("late", INTERACTIVE))
+        await asyncio.sleep(0)
+
+        # 슬롯을 배정받았지만 태스크가 재개되기 전에 취소
+        scheduler.release("holder", INTERACTIVE)
+        granted.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await granted
+        return scheduler._running, dict(scheduler._running_by_user)
+
+    assert asyncio.run(scenario()) == (0, {})
+
+
+def test_queue_timeout_raises_and_drops_waiter():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, max_per_user=1, max_background=1, queue_timeout=0.05)
+        await scheduler.acquire("holder", INTERACTIVE)
+        with pytest.raises(LLMQueueTimeout):
+            await scheduler.acquire("late", INTERACTIVE)
+        return scheduler._waiters
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_run_releases_slot_when_caller_is_cancelled():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, max_per_user=1, max_background=1, queue_timeout=5)
+        started = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def work():
+            loop.call_soon_threadsafe(started.set)
+            time.sleep(0.1)
+            return "done"
+
+        task = asyncio.create_task(scheduler.run(work, user_id="alice"))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # 스레드 작업이 끝나면 슬롯이 반납되어 다음 작업이 실행됨
+        result = await asyncio.wait_for(scheduler.run(lambda: "next", user_id="alice"), 2)
+        return result
+
+    assert asyncio.run(scenario()) == "next"
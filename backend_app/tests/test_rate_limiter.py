@@ -0,0 +1,143 @@
+import multiprocessing
+
+import httpx
+import pytest
+
+from app import rate_limiter as rl
+from app.rate_limiter import RateLimitedTransport, TokenBucketLimiter
+
+
+class FakeClock:
+    """time.time/time.sleep 대체: sleep하면 시계만 앞으로 감"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rl.time, "time", fake.time)
+    monkeypatch.setattr(rl.time, "sleep", fake.sleep)
+    monkeypatch.setattr(rl.random, "uniform", lambda low, high: 0.0)
+    return fake
+
+
+def test_request_bucket_refills_at_rpm_per_second(clock):
+    limiter = TokenBucketLimiter({"openai:*": {"rpm": 60, "tpm": 0}}, state_dir=None)
+    for _ in range(60):
+        limiter.acquire("openai", "gpt-4")
+    assert clock.sleeps == []
+
+    # 버킷이 비면 1건이 채워지는 1초(60/rpm)만큼 대기
+    limiter.acquire("openai", "gpt-4")
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+    # 30초가 지나면 30건이 다시 채워짐
+    clock.now += 30
+    for _ in range(30):
+        limiter.acquire("openai", "gpt-4")
+    assert len(clock.sleeps) == 1
+
+
+def test_token_bucket_waits_for_missing_tokens(clock):
+    limiter = TokenBucketLimiter({"openai:*": {"rpm": 0, "tpm": 600}}, state_dir=None)
+    limiter.acquire("openai", "gpt-4", tokens=500)
+    assert clock.sleeps == []
+
+    # 남은 100 토큰으로는 부족하므로 200 토큰이 채워질 20초 대기
+    limiter.acquire("openai", "gpt-4", tokens=300)
+    assert clock.sleeps == [pytest.approx(20.0)]
+
+
+def test_oversized_request_is_capped_to_bucket_size(clock):
+    limiter = TokenBucketLimiter({"openai:*": {"rpm": 0, "tpm": 100}}, state_dir=None)
+    limiter.acquire("openai", "gpt-4", tokens=10_000)
+    assert clock.sleeps == []
+
+
+def test_unlimited_provider_never_waits(clock):
+    limiter = TokenBucketLimiter({"openai:*": {"rpm": 1, "tpm": 0}}, state_dir=None)
+    for _ in range(5):
+        limiter.acquire("local", "model")
+    assert clock.sleeps == []
+    assert limiter.penalize("local", "model", 10) is False
+
+
+def test_penalize_blocks_the_bucket(clock):
+    limiter = TokenBucketLimiter({"openai:*": {"rpm": 600, "tpm": 0}}, state_dir=None)
+    assert limiter.penalize("openai", "gpt-4", 5) is True
+    limiter.acquire("openai", "gpt-4")
+    assert clock.sleeps == [pytest.approx(5.0)]
+
+
+def _drain(state_dir: str, count: int):
+    limiter = TokenBucketLimiter({"openai:*": {"rpm": 1000, "tpm": 0}}, state_dir=state_dir)
+
+    def take(state):
+        state["taken"] = state.get("taken", 0) + 1
+
+    for _ in range(count):
+        limiter._update("openai:gpt-4", 1000, 0, take)
+
+
+def test_state_dir_is_shared_across_processes(tmp_path):
+    state_dir = str(tmp_path / "buckets")
+    TokenBucketLimiter({}, state_dir=state_dir)
+    # 스레드가 떠 있는 테스트 프로세스에서 fork하지 않도록 spawn 사용
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_drain, args=(state_dir, 50)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+
+    limiter = TokenBucketLimiter({"openai:*": {"rpm": 1000, "tpm": 0}}, state_dir=state_dir)
+    taken = limiter._update("openai:gpt-4", 1000, 0, lambda state: state.get("taken", 0))
+    # 파일 잠금 덕분에 네 프로세스의 갱신이 하나도 빠지지 않고 반영됨
+    assert taken == 200
+
+
+def test_transport_retries_429_through_the_bucket(clock):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"retry-after": "3"})
+        return httpx.Response(200, json={"ok": True})
+
+    limiter = TokenBucketLimiter({"openai:*": {"rpm": 600, "tpm": 0}}, state_dir=None)
+    transport = RateLimitedTransport(httpx.MockTransport(handler), "openai", limiter, max_retries=2)
+    with httpx.Client(transport=transport) as client:
+        response = client.post("https://api.test/v1/chat/completions", json={"model": "gpt-4", "messages": []})
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+    # Retry-After만큼 버킷이 막혀 다음 acquire에서 대기
+    assert clock.sleeps == [pytest.approx(3.0)]
+
+
+def test_transport_returns_last_response_after_max_retries(clock):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    limiter = TokenBucketLimiter({"openai:*": {"rpm": 600, "tpm": 0}}, state_dir=None)
+    transport = RateLimitedTransport(httpx.MockTransport(handler), "openai", limiter, max_retries=2)
+    with httpx.Client(transport=transport) as client:
+        response = client.post("https://api.test/v1/chat/completions", json={"model": "gpt-4", "messages": []})
+
+    assert response.status_code == 503
+    assert len(calls) == 3
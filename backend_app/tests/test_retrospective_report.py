@@ -0,0 +1,49 @@
+import json
+import os
+
+from app import retrospective_report
+from app.llm_clients import llm_clients
+from app.local_providers import LocalOpenAIClient
+from app.metrics import LLM_REQUESTS_TOTAL
+
+
+def _site_counts():
+    counts = {}
+    for (site, _, status), value in LLM_REQUESTS_TOTAL.items():
+        if status == "ok":
+            counts[site] = counts.get(site, 0) + value
+    return counts
+
+
+def test_graphrag_report_runs_on_local_provider(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    created = []
+    openai_client = llm_clients.openai_client
+
+    def tracked_client(*args, **kwargs):
+        client = openai_client(*args, **kwargs)
+        created.append(client)
+        return client
+
+    # 리포트 생성기는 공급자 팩토리에서만 클라이언트를 받아야 함
+    monkeypatch.setattr(llm_clients, "openai_client", tracked_client)
+    assert not hasattr(retrospective_report, "ChatOpenAI")
+    before = _site_counts()
+
+    generator = retrospective_report.GraphRAGRetrospectiveReportGenerator("user@test")
+    result = generator.generate_retrospective_report()
+
+    assert created and generator.client is created[-1]
+    assert isinstance(generator.client, LocalOpenAIClient)
+    assert result["message"] == "GraphRAG 기반 회고 리포트 생성 성공"
+    assert result["report"]
+
+    after = _site_counts()
+    for site in ("report_analysis", "report_write"):
+        assert after.get(site, 0) == before.get(site, 0) + 1
+
+    report_dir = os.path.join(generator.data_loader.base_path, "user@test", "retrospective_reports")
+    [report_file] = os.listdir(report_dir)
+    with open(os.path.join(report_dir, report_file), encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["final_report"] == result["report"]